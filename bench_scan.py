@@ -0,0 +1,510 @@
+# bench_scan.py
+"""
+Banc de performance des chemins critiques, sur la boucle locale uniquement :
+  - scan de ports (moteur threads et moteur asyncio) contre des services factices
+    sur 127.0.0.0/8 : ports ouverts (bannière immédiate), refusés, muets, lents
+  - scan UDP multiplexé (ICMP port unreachable, un service qui répond)
+  - découverte sur 127.0.0.0/22 (une adresse vivante sur 8, les autres refusent)
+  - matcher de vulns sur une grosse DB synthétique, et index binaire
+    (build-vuln-index) : construction, ouverture, recherche par bannière
+  - export json / ndjson / csv d'un gros jeu de résultats synthétique
+  - démarrage du CLI (--help) : surcoût sur un interpréteur nu, et aucun
+    sous-système lourd importé (budget STARTUP_BUDGET_MS, hors tolérance ;
+    vérifié aussi par tests/test_startup.py à chaque `python -m pytest`)
+Mesures : connects/s, temps par hôte, pic mémoire (tracemalloc), octets exportés.
+Comparaison avec bench_baseline.json : code retour 1 si une mesure régresse
+au-delà de la tolérance. Les baselines dépendent de la machine : les régénérer
+avec --update-baseline sur la machine de référence.
+
+  python bench_scan.py                   # tout, compare à la baseline
+  python bench_scan.py --quick --only vuln_match,export_csv
+  python bench_scan.py --update-baseline
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import random
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+TOLERANCE = 0.30            # écart relatif toléré avant de signaler une régression
+SLOW_BANNER_DELAY = 0.3     # < NULL_PROBE : la bannière lente doit quand même être lue
+STAND_IN_BANNER = b"SSH-2.0-OpenSSH_7.4p1 bench\r\n"
+REFUSED_BASE_PORT = 20000   # plage supposée libre sur la boucle locale
+STARTUP_BUDGET_MS = 100     # surcoût max de `cli_scan_main.py --help` sur `python -c pass`
+STARTUP_RUNS = 7            # médiane sur N lancements
+# importés seulement par les commandes qui en ont besoin, jamais pour --help
+LAZY_MODULES = ("asyncio", "ssl", "sqlite3", "psutil", "port_scan_win", "vuln_match",
+                "host_discovery_win", "scan_pipeline", "scan_history", "sharded_scan", "udp_scan",
+                "syn_scan", "scapy", "vuln_index")
+
+# sens de chaque mesure, d'après son suffixe
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER = ("_s", "_kb", "_bytes")
+
+# ---------------------------------------------------------------------------
+# Services factices
+# ---------------------------------------------------------------------------
+
+class StandInServices:
+    """Écouteurs locaux servis par un seul thread (selectors) : open, silent, slow."""
+
+    def __init__(self):
+        self.sel = selectors.DefaultSelector()
+        self.ports: Dict[str, List[int]] = {"open": [], "silent": [], "slow": []}
+        self._listeners: List[socket.socket] = []
+        self._delayed: List[Tuple[float, socket.socket]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def listen(self, kind: str, ip: str = "127.0.0.1", port: int = 0) -> int:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((ip, port))
+        s.listen(512)
+        s.setblocking(False)
+        self.sel.register(s, selectors.EVENT_READ, ("listen", kind))
+        self._listeners.append(s)
+        port = s.getsockname()[1]
+        self.ports.setdefault(kind, []).append(port)
+        return port
+
+    def start(self, open_n: int = 0, silent_n: int = 0, slow_n: int = 0) -> "StandInServices":
+        for kind, n in (("open", open_n), ("silent", silent_n), ("slow", slow_n)):
+            for _ in range(n):
+                self.listen(kind)
+        self._thread = threading.Thread(target=self._loop, name="bench-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            due = [c for t, c in self._delayed if t <= now]
+            if due:
+                self._delayed = [(t, c) for t, c in self._delayed if t > now]
+                for c in due:
+                    self._send(c)
+            for key, _ in self.sel.select(0.02):
+                role, kind = key.data
+                if role == "listen":
+                    try:
+                        conn, _ = key.fileobj.accept()
+                    except OSError:
+                        continue
+                    conn.setblocking(False)
+                    self.sel.register(conn, selectors.EVENT_READ, ("conn", kind))
+                    if kind == "open":
+                        self._send(conn)
+                    elif kind == "slow":
+                        self._delayed.append((now + SLOW_BANNER_DELAY, conn))
+                else:
+                    try:
+                        data = key.fileobj.recv(4096)
+                    except OSError:
+                        data = b""
+                    if not data:
+                        self._drop(key.fileobj)
+
+    def _send(self, conn: socket.socket):
+        try:
+            conn.send(STAND_IN_BANNER)
+        except OSError:
+            self._drop(conn)
+
+    def _drop(self, conn: socket.socket):
+        try:
+            self.sel.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        for key in list(self.sel.get_map().values()):
+            key.fileobj.close()
+        self.sel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def refused_ports(n: int, taken: List[int]) -> List[int]:
+    taken = set(taken)
+    return [p for p in range(REFUSED_BASE_PORT, REFUSED_BASE_PORT + n + len(taken)) if p not in taken][:n]
+
+# ---------------------------------------------------------------------------
+# Cas de bench : chacun retourne ses mesures (hors pic mémoire, ajouté par run_case)
+# ---------------------------------------------------------------------------
+
+def _scan_ports(services: StandInServices, refused_n: int) -> List[int]:
+    listening = services.ports["open"] + services.ports["silent"] + services.ports["slow"]
+    return listening + refused_ports(refused_n, listening)
+
+def bench_scan_sync(scale: float) -> Dict:
+    import port_scan_win
+    with StandInServices().start(open_n=20, silent_n=5, slow_n=5) as services:
+        ports = _scan_ports(services, int(1000 * scale))
+        start = time.perf_counter()
+        res = port_scan_win.scan_host_ports("127.0.0.1", ports, realtime_print=False)
+        wall = time.perf_counter() - start
+    open_n = sum(1 for _ in res.open_services())
+    return {"connects_per_s": len(ports) / wall, "wall_per_host_s": wall, "open_found": open_n}
+
+def bench_scan_async(scale: float) -> Dict:
+    import port_scan_win
+    with StandInServices().start(open_n=20, silent_n=5, slow_n=5) as services:
+        ports = _scan_ports(services, int(1000 * scale))
+        with port_scan_win.AsyncScanEngine(500) as engine:
+            start = time.perf_counter()
+            res = engine.scan_host_ports("127.0.0.1", ports, realtime_print=False)
+            wall = time.perf_counter() - start
+    open_n = sum(1 for _ in res.open_services())
+    return {"connects_per_s": len(ports) / wall, "wall_per_host_s": wall, "open_found": open_n}
+
+def bench_scan_many(scale: float) -> Dict:
+    """Plusieurs hôtes 127.0.0.x en parallèle (seul 127.0.0.1 a des services)."""
+    import port_scan_win
+    hosts = [f"127.0.0.{i}" for i in range(1, 1 + max(2, int(16 * scale)))]
+    with StandInServices().start(open_n=10, silent_n=2, slow_n=2) as services:
+        ports = _scan_ports(services, 200)
+        start = time.perf_counter()
+        res = port_scan_win.scan_many(hosts, ports, max_sockets=1000, realtime_print=False)
+        wall = time.perf_counter() - start
+    total = sum(len(r) for r in res.values())
+    return {"connects_per_s": total / wall, "wall_per_host_s": wall / len(hosts)}
+
+def bench_scan_udp(scale: float) -> Dict:
+    """Scan UDP multiplexé de quelques hôtes 127.0.0.x (ICMP port unreachable + un service qui répond)."""
+    from udp_scan import UdpScanEngine
+    echo = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    echo.bind(("127.0.0.1", 0))
+    echo.settimeout(0.2)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                data, addr = echo.recvfrom(2048)
+                echo.sendto(b"pong", addr)
+            except OSError:
+                pass
+
+    hosts = [f"127.0.0.{i}" for i in range(1, 1 + max(2, int(8 * scale)))]
+    port = echo.getsockname()[1]
+    ports = [port] + [p for p in range(40000, 40000 + int(500 * scale) + 1) if p != port]
+    t = threading.Thread(target=serve, daemon=True)
+    t.start()
+    try:
+        with UdpScanEngine() as engine, concurrent.futures.ThreadPoolExecutor(len(hosts)) as ex:
+            start = time.perf_counter()
+            res = list(ex.map(lambda ip: engine.scan_host_ports(ip, ports, realtime_print=False), hosts))
+            wall = time.perf_counter() - start
+    finally:
+        stop.set()
+        t.join()
+        echo.close()
+    probes = len(hosts) * len(ports)
+    return {"probes_per_s": probes / wall, "wall_per_host_s": wall / len(hosts),
+            "open_found": sum(1 for r in res for s in r.interesting() if s["state"] == "open")}
+
+def bench_discover(scale: float) -> Dict:
+    import ipaddress
+    import host_discovery_win
+    import name_resolution
+    from ttl_cache import TtlCache
+    # cache de noms vide et non persisté : on mesure des lookups réels
+    name_resolution._resolver = name_resolution.NameResolver(cache=TtlCache())
+    network = ipaddress.ip_network("127.0.0.0/22" if scale >= 1 else "127.0.0.0/24")
+    alive = [str(ip) for i, ip in enumerate(network.hosts()) if i % 8 == 0]
+    services = StandInServices()
+    port = services.listen("open", alive[0])
+    for ip in alive[1:]:
+        services.listen("open", ip, port)
+    with services.start():
+        start = time.perf_counter()
+        hosts = host_discovery_win.discover_hosts(network, quick_probe_ports=(port,))
+        wall = time.perf_counter() - start
+    return {"hosts_per_s": network.num_addresses / wall, "wall_s": wall, "alive_found": len(hosts)}
+
+def synthetic_vuln_db(n: int) -> Dict:
+    rnd = random.Random(1)
+    specs = ["{a}.{b}", "<{a}.{b}.5", ">={a}.{b},<{a}.{c}", "{a}.0.1-{a}.0.9", "=={a}.{b}.{c}"]
+    db = {}
+    for i in range(n):
+        a, b, c = rnd.randint(0, 9), rnd.randint(0, 9), rnd.randint(10, 20)
+        db[f"Product{i}"] = {"vulnerable_versions": [s.format(a=a, b=b, c=c) for s in rnd.sample(specs, 2)],
+                             "notes": f"synthetic {i}"}
+    return db
+
+def bench_vuln_match(scale: float) -> Dict:
+    import vuln_match
+    from port_scan_win import check_vulns_from_banner
+    n_products = int(5000 * scale)
+    db = synthetic_vuln_db(n_products)
+    rnd = random.Random(2)
+    banners = [f"Server: Product{rnd.randrange(n_products)}/{rnd.randint(0, 9)}.{rnd.randint(0, 9)}.{rnd.randint(0, 20)}"
+               for _ in range(int(20000 * scale))]
+    start = time.perf_counter()
+    vuln_match.get_matcher(db)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    hits = sum(1 for b in banners if check_vulns_from_banner(b, db))
+    wall = time.perf_counter() - start
+    return {"build_s": build, "matches_per_s": len(banners) / wall, "hits": hits}
+
+def bench_vuln_index(scale: float) -> Dict:
+    import vuln_index
+    n_products = int(20000 * scale)
+    rnd = random.Random(2)
+    banners = [f"Server: Product{rnd.randrange(n_products)}/{rnd.randint(0, 9)}.{rnd.randint(0, 9)}.{rnd.randint(0, 20)}"
+               for _ in range(int(20000 * scale))]
+    with tempfile.TemporaryDirectory() as d:
+        feed, path = os.path.join(d, "feed.json"), os.path.join(d, "vuln.idx")
+        with open(feed, "w", encoding="utf-8") as f:
+            json.dump(synthetic_vuln_db(n_products), f)
+        start = time.perf_counter()
+        vuln_index.build_index([feed], path)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        index = vuln_index.VulnIndex(path)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        hits = sum(1 for b in banners if index.match(b))
+        wall = time.perf_counter() - start
+        index.close()
+    return {"build_s": build, "open_s": opened, "matches_per_s": len(banners) / wall, "hits": hits}
+
+def synthetic_results(n_hosts: int, ports_per_host: int = 1024, open_per_host: int = 20) -> List[Dict]:
+    from result_store import HostServices
+    rnd = random.Random(3)
+    hosts = []
+    for h in range(n_hosts):
+        ip = f"10.{h // 65536 % 256}.{h // 256 % 256}.{h % 256}"
+        svc = HostServices(ip)
+        opened = set(rnd.sample(range(1, ports_per_host + 1), open_per_host))
+        for p in range(1, ports_per_host + 1):
+            if p in opened:
+                svc.add({"ip": ip, "port": p, "state": "open", "rtt_ms": 0.5,
+                         "banner": "SSH-2.0-OpenSSH_7.4p1", "vulns": [{"product": "OpenSSH", "version": "7.4", "notes": "x"}],
+                         "service": {"name": "ssh", "product": "OpenSSH", "version": "7.4p1"}})
+            else:
+                svc.add({"ip": ip, "port": p, "state": "closed"})
+        hosts.append({"ip": ip, "mac": "00:11:22:33:44:55", "hostname": None,
+                      "os": {"os_guess": "Linux/Unix", "ttl": 64}, "services": svc.compact()})
+    return hosts
+
+def _bench_export(fmt: str, scale: float) -> Dict:
+    from result_export import export_results_flat
+    hosts = synthetic_results(max(1, int(100 * scale)))
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, f"bench.{fmt}")
+        start = time.perf_counter()
+        export_results_flat(hosts, path, fmt)
+        wall = time.perf_counter() - start
+        size = os.path.getsize(path)
+    return {"wall_s": wall, "exported_bytes": size}
+
+def _median_wall(argv: List[str], runs: int) -> float:
+    walls = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=HERE, check=False)
+        walls.append(time.perf_counter() - start)
+    return statistics.median(walls)
+
+def _eager_modules(cli: str, cli_args: List[str]) -> List[str]:
+    """Modules de LAZY_MODULES chargés par `cli cli_args` (exécuté dans un sous-processus)."""
+    code = ("import json, runpy, sys\n"
+            f"sys.path.insert(0, {HERE!r}); sys.argv = [{cli!r}] + {cli_args!r}\n"
+            "try:\n"
+            f"    runpy.run_path({cli!r}, run_name='__main__')\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            f"sys.stderr.write(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))\n")
+    p = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=HERE, check=False)
+    return json.loads(p.stderr.strip().splitlines()[-1])
+
+def bench_startup(scale: float) -> Dict:
+    cli = os.path.join(HERE, "cli_scan_main.py")
+    runs = max(3, int(STARTUP_RUNS * scale))
+    _median_wall([sys.executable, cli, "--help"], 1)     # caches disque/pyc chauds
+    bare = _median_wall([sys.executable, "-c", "pass"], runs)
+    wall = _median_wall([sys.executable, cli, "--help"], runs)
+    eager = sorted(set(_eager_modules(cli, ["--help"]) + _eager_modules(cli, ["query", "--help"])))
+    return {"help_wall_s": wall, "help_overhead_s": wall - bare, "eager_modules": eager}
+
+def check_budgets(results: Dict[str, Dict]) -> List[str]:
+    """Budgets absolus (indépendants de la baseline)."""
+    out = []
+    startup = results.get("startup")
+    if startup:
+        overhead_ms = startup["help_overhead_s"] * 1000
+        if overhead_ms > STARTUP_BUDGET_MS:
+            out.append(f"startup: --help coûte {overhead_ms:.0f} ms > budget {STARTUP_BUDGET_MS} ms")
+        if startup["eager_modules"]:
+            out.append(f"startup: importés dès --help : {', '.join(startup['eager_modules'])}")
+    return out
+
+CASES: Dict[str, Callable[[float], Dict]] = {
+    "scan_sync": bench_scan_sync,
+    "scan_async": bench_scan_async,
+    "scan_many": bench_scan_many,
+    "scan_udp": bench_scan_udp,
+    "discover": bench_discover,
+    "vuln_match": bench_vuln_match,
+    "vuln_index": bench_vuln_index,
+    "export_json": lambda scale: _bench_export("json", scale),
+    "export_ndjson": lambda scale: _bench_export("ndjson", scale),
+    "export_csv": lambda scale: _bench_export("csv", scale),
+    "startup": bench_startup,
+}
+# mesurés dans des sous-processus : pas de passe tracemalloc
+NO_MEMORY_CASES = ("startup",)
+
+# ---------------------------------------------------------------------------
+# Exécution, baseline
+# ---------------------------------------------------------------------------
+
+def run_case(name: str, scale: float, memory: bool = True) -> Dict:
+    """
+    Exécute un cas (sorties du scanner masquées). tracemalloc ralentit fortement
+    les allocations : le pic mémoire Python vient d'une seconde passe, à part.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = CASES[name](scale)
+        if memory and name not in NO_MEMORY_CASES:
+            tracemalloc.start()
+            try:
+                CASES[name](scale)
+                metrics["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+    return metrics
+
+def metric_direction(key: str) -> int:
+    """+1 : plus haut = mieux, -1 : plus bas = mieux, 0 : informatif."""
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Liste des régressions au-delà de `tolerance` (écart relatif)."""
+    out = []
+    for case, metrics in results.items():
+        ref = baseline.get(case) or {}
+        for key, value in metrics.items():
+            base = ref.get(key)
+            sign = metric_direction(key)
+            if not sign or not base:
+                continue
+            delta = (value - base) / base
+            if sign * delta < -tolerance:
+                out.append(f"{case}.{key}: {value:.4g} vs baseline {base:.4g} ({delta:+.0%})")
+    return out
+
+def load_baseline(path: str, scale: float) -> Dict:
+    """Mesures de référence par cas ({} si absentes ou prises à une autre échelle)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[!] Baseline illisible ({path}): {e}")
+        return {}
+    if data.get("scale") != scale:
+        print(f"[!] Baseline prise à l'échelle {data.get('scale')} : pas de comparaison")
+        return {}
+    return data.get("cases", {})
+
+def save_baseline(path: str, results: Dict[str, Dict], scale: float):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"_comment": "python bench_scan.py --update-baseline", "scale": scale,
+                   "python": sys.version.split()[0], "platform": sys.platform,
+                   "cases": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"[+] Baseline écrite: {path}")
+
+def print_results(results: Dict[str, Dict], baseline: Dict[str, Dict]):
+    for case, metrics in results.items():
+        print(f"\n=== {case} ===")
+        ref = baseline.get(case) or {}
+        for key, value in metrics.items():
+            if isinstance(value, list):
+                print(f"  {key:<16} {', '.join(value) or '-':>12}")
+                continue
+            base = ref.get(key)
+            cmp = f"  (baseline {base:.4g}, {(value - base) / base:+.0%})" if base else ""
+            print(f"  {key:<16} {value:>12.4g}{cmp}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bench loopback des chemins critiques du scanner")
+    parser.add_argument("--only", help="Cas à exécuter, séparés par des virgules (" + ",".join(CASES) + ")")
+    parser.add_argument("--quick", action="store_true", help="Jeux de données réduits (x0.2)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Fichier de baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Écrit les résultats comme nouvelle baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Écart relatif toléré (défaut 0.30)")
+    parser.add_argument("--no-memory", action="store_true", help="Sans la passe tracemalloc (pic mémoire)")
+    parser.add_argument("--json", help="Écrit aussi les résultats bruts dans ce fichier")
+    args = parser.parse_args(argv)
+
+    scale = 0.2 if args.quick else 1.0
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"cas inconnu(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"[+] {name} ...")
+        try:
+            results[name] = run_case(name, scale, memory=not args.no_memory)
+        except Exception as e:
+            print(f"[!] {name} en erreur: {e}")
+
+    baseline = load_baseline(args.baseline, scale)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        # --only : seuls les cas exécutés sont remplacés
+        save_baseline(args.baseline, {**baseline, **results}, scale)
+        return 0
+    regressions = check_budgets(results)
+    if baseline:
+        regressions += compare(results, baseline, args.tolerance)
+    else:
+        print("\n[!] Pas de baseline : rien à comparer (--update-baseline pour en créer une)")
+    if len(results) < len(names):
+        regressions.append("cas en erreur")
+    if regressions:
+        print("\n[!] Régressions :")
+        for r in regressions:
+            print(f"   - {r}")
+        return 1
+    print("\n[+] Aucune régression au-delà de la tolérance")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -72,16 +72,22 @@
 # cli_scan_main.py
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import csv
+import json
 import sys
 import ipaddress
 import time
 import os
 
+# imports légers seulement : les sous-systèmes (moteurs de scan, asyncio, sqlite,
+# base de vulns...) sont importés par la commande qui en a besoin
+from timing import HOST_TIMINGS
+from scan_metrics import METRICS, PROM_INTERVAL
+from scan_reporter import REPORTER
 from net_utils import get_primary_ip, get_netmask_for_ip  # si tu as ce module; sinon fallback below
-from host_discovery_win import discover_hosts
-from port_scan_win import scan_host_ports
-from os_detection import detect_os
-from result_export import print_host_summary, export_results_flat
+from targets import TargetSet, read_spec_file, split_specs
+from ports import parse_ports, top_ports
 
 # fallback get_primary_ip/get_netmask_for_ip si net_utils absent
 try:
@@ -106,6 +112,372 @@ except Exception:
             return None
 
 DEFAULT_PORTS = [22, 80, 443, 3389, 3306]
+DEFAULT_UDP_PORTS = [53, 67, 123, 137, 161, 500, 1900]
+
+def add_port_args(p):
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--ports", default=None,
+                   help="Ports : 22,80,1-1024,8000-8100 ; '-' = 1-65535 "
+                        "(défaut 22,80,443,3389,3306 ; 53,67,123,137,161,500,1900 avec --udp)")
+    g.add_argument("--top-ports", type=int, default=None, metavar="N",
+                   help="Les N ports les plus fréquents (table embarquée, TCP ou UDP)")
+
+def resolve_ports(args):
+    proto = "udp" if getattr(args, "udp", False) else "tcp"
+    if args.top_ports:
+        return top_ports(args.top_ports, proto)
+    if not args.ports:
+        return DEFAULT_UDP_PORTS if proto == "udp" else DEFAULT_PORTS
+    try:
+        return parse_ports(args.ports)
+    except ValueError as e:
+        print(f"[!] --ports invalide: {e}")
+        sys.exit(1)
+
+def add_engine_args(p):
+    p.add_argument("--engine", choices=("thread","async"), default="thread",
+                   help="thread: pool par hôte ; async: connexions non bloquantes, budget global")
+    p.add_argument("--udp", action="store_true",
+                   help="Scan UDP (payloads protocolaires, quelques sockets multiplexés) au lieu du connect TCP")
+    p.add_argument("--syn", action="store_true",
+                   help="Scan SYN semi-ouvert (scapy, root) : pas de connexion complète ni de bannière, "
+                        "TTL des réponses réutilisé pour l'OS")
+    # défauts None : remplis par engine_defaults() depuis les modules de scan,
+    # pour ne pas les importer juste pour construire le parser
+    p.add_argument("--max-sockets", type=int, default=None,
+                   help="Sockets en vol max (tous hôtes) pour --engine async, probes en vol avec --udp "
+                        "(défaut ASYNC_MAX_SOCKETS)")
+    p.add_argument("--scan-workers", type=int, default=None,
+                   help="Hôtes scannés en parallèle (défaut SCAN_WORKERS du pipeline, 64 en async)")
+    p.add_argument("--os-workers", type=int, default=None,
+                   help="Workers OS/enrichissement en parallèle")
+    p.add_argument("--queue-size", type=int, default=None,
+                   help="Taille des files entre étages du pipeline")
+    p.add_argument("--timeout", type=float, default=None,
+                   help="Timeout de connect max (s) ; plafond des timeouts adaptatifs")
+    p.add_argument("--min-rtt-timeout", type=float, default=HOST_TIMINGS.min_timeout,
+                   help="Timeout adaptatif minimal (s)")
+    p.add_argument("--retries", type=int, default=None,
+                   help="Retransmissions pour les ports qui expirent")
+    p.add_argument("--no-adaptive-timeout", action="store_true",
+                   help="Timeout fixe (--timeout) au lieu de l'estimation SRTT/RTTVAR")
+    p.add_argument("--max-rate", type=float, default=None,
+                   help="Probes/s max (découverte + scan, tous workers confondus)")
+    p.add_argument("--min-rate", type=float, default=None,
+                   help="Plancher de débit quand --adaptive-rate ralentit (exige --adaptive-rate)")
+    p.add_argument("--adaptive-rate", action="store_true",
+                   help="Réduit le débit quand la part de timeouts augmente")
+
+def engine_defaults(args):
+    """Complète les réglages moteur laissés à None avec les défauts des modules de scan."""
+    import port_scan_win
+    from scan_pipeline import SCAN_WORKERS, POST_WORKERS, QUEUE_SIZE
+    if args.max_sockets is None:
+        args.max_sockets = port_scan_win.ASYNC_MAX_SOCKETS
+    if args.scan_workers is None:
+        args.scan_workers = 64 if args.engine == "async" or args.udp or args.syn else SCAN_WORKERS
+    if args.os_workers is None:
+        args.os_workers = POST_WORKERS
+    if args.queue_size is None:
+        args.queue_size = QUEUE_SIZE
+    if args.timeout is None:
+        args.timeout = port_scan_win.CONNECT_TIMEOUT
+    if args.retries is None:
+        args.retries = port_scan_win.CONNECT_RETRIES
+
+def timing_settings(args):
+    return {"timeout": args.timeout, "retries": args.retries,
+            "adaptive": not args.no_adaptive_timeout, "min_rtt_timeout": args.min_rtt_timeout}
+
+def rate_settings(args, shards: int = 1):
+    """Réglages du limiteur ; le débit est réparti entre les shards."""
+    div = max(1, shards)
+    return {"max_rate": args.max_rate / div if args.max_rate else None,
+            "min_rate": args.min_rate / div if args.min_rate else None,
+            "adaptive": args.adaptive_rate}
+
+def check_rate_args(args):
+    """--min-rate n'est qu'un plancher du mode adaptatif : refusé seul plutôt qu'ignoré."""
+    if args.min_rate and not (args.adaptive_rate and args.max_rate):
+        print("[!] --min-rate s'utilise avec --adaptive-rate et --max-rate (plancher du débit adaptatif).")
+        sys.exit(1)
+
+def check_syn_args(args):
+    """--syn : exclusif avec --udp ; sans scapy ou privilèges, retour au connect TCP."""
+    if not getattr(args, "syn", False):
+        return
+    if args.udp:
+        print("[!] --syn et --udp sont exclusifs.")
+        sys.exit(1)
+    from syn_scan import syn_unavailable
+    reason = syn_unavailable()
+    if reason:
+        print(f"[!] Scan SYN indisponible ({reason}) : scan connect")
+        args.syn = False
+
+def apply_timing_args(args):
+    import port_scan_win
+    from rate_limit import RATE_LIMITER
+    check_rate_args(args)
+    engine_defaults(args)
+    port_scan_win.configure_timing(**timing_settings(args))
+    RATE_LIMITER.configure(**rate_settings(args))
+    if RATE_LIMITER.enabled:
+        print(f"[+] Débit max: {RATE_LIMITER.rate:.0f} probes/s" + (" (adaptatif)" if RATE_LIMITER.adaptive else ""))
+
+def add_metrics_args(p):
+    p.add_argument("--metrics", default=None, metavar="FICHIER",
+                   help="Résumé JSON des métriques (compteurs, temps par phase) en fin de run")
+    p.add_argument("--prometheus", default=None, metavar="FICHIER",
+                   help="Fichier texte Prometheus (textfile collector), rafraîchi pendant le run")
+    p.add_argument("--prometheus-interval", type=float, default=PROM_INTERVAL,
+                   help="Période de rafraîchissement du fichier Prometheus (s)")
+    p.add_argument("--profile", nargs="?", const="scan_profile.prof", default=None, metavar="FICHIER",
+                   help="Exécute le run sous cProfile (threads compris) et écrit les stats")
+
+@contextlib.contextmanager
+def instrumented(args):
+    """Métriques et profilage autour d'une commande (écrits même si elle sort par sys.exit)."""
+    METRICS.reset()
+    prom = METRICS.start_prometheus(args.prometheus, args.prometheus_interval) if args.prometheus else None
+    profiler = None
+    if args.profile:
+        from scan_metrics import ScanProfiler
+        profiler = ScanProfiler().start()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.stop(args.profile)
+        if prom:
+            prom.stop()
+        if args.metrics or args.prometheus or args.profile:
+            METRICS.print_summary()
+        if args.metrics:
+            METRICS.write_json(args.metrics)
+
+def add_output_args(p):
+    p.add_argument("--progress", choices=("auto", "on", "off"), default="auto",
+                   help="Ligne d'état (hôtes, ports, probes/s, ETA) ; auto = si la sortie est un terminal")
+    p.add_argument("--events", nargs="?", const="-", default=None, metavar="FICHIER",
+                   help="Flux d'événements NDJSON (défaut stdout : le texte humain passe alors sur stderr)")
+
+@contextlib.contextmanager
+def reporting(args):
+    """Reporter (thread d'affichage) autour d'une commande de scan."""
+    if not hasattr(args, "progress"):
+        yield
+        return
+    progress = {"auto": None, "on": True, "off": False}[args.progress]
+    REPORTER.start(progress=progress, events=args.events)
+    try:
+        yield
+    finally:
+        REPORTER.stop()
+
+def add_journal_args(p):
+    p.add_argument("--journal", default=None, help="Journal de reprise (hôtes/ports terminés)")
+    p.add_argument("--resume", default=None, metavar="JOURNAL",
+                   help="Reprend un scan interrompu depuis son journal (cible et ports du journal)")
+
+def load_journal(args):
+    """--resume : relit le journal et reprend sa cible/ses ports ; --journal : nouveau journal."""
+    if not (args.resume or args.journal):
+        return None
+    from scan_journal import ScanJournal
+    if args.resume:
+        j = ScanJournal.load(args.resume)
+        if j.meta.get("target"):
+            args.target = j.meta["target"]
+        if j.meta.get("ports"):
+            args.ports = ",".join(str(p) for p in j.meta["ports"])
+        done = sum(len(v) for v in j.ports_done.values())
+        print(f"[+] Reprise {args.resume}: {len(j.finished)} hôte(s) terminés, {done} port(s) déjà scannés")
+        return j
+    if args.journal:
+        return ScanJournal(args.journal)
+    return None
+
+def add_baseline_args(p):
+    p.add_argument("--baseline", action="append", default=None, metavar="EXPORT",
+                   help="Export précédent (json/ndjson/csv) ; répétable, du plus ancien au plus récent. "
+                        "Hôtes/ports connus scannés d'abord, rapport de changements en fin de run")
+    p.add_argument("--skip-stable", type=int, default=0, metavar="N",
+                   help="Avec --baseline : saute les ports fermés dans au moins N baselines")
+    p.add_argument("--sample-stable", type=float, default=0.0, metavar="FRACTION",
+                   help="Avec --skip-stable : part des ports stables rescannée quand même (0-1)")
+
+def load_baseline(args):
+    if not args.baseline:
+        return None
+    from scan_baseline import ScanBaseline
+    try:
+        return ScanBaseline(args.baseline, args.skip_stable, args.sample_stable)
+    except Exception as e:
+        print(f"[!] Baseline illisible: {e}")
+        sys.exit(1)
+
+def finish_baseline(baseline, args, prefix, targets):
+    """Rapport de changements : affiché et écrit à côté des exports."""
+    from scan_baseline import print_report, write_report
+    report = baseline.report(targets)
+    print_report(report)
+    write_report(report, os.path.join(args.outdir, f"{prefix}_changes_{int(time.time())}.json"))
+
+def parse_targets(args) -> TargetSet:
+    specs = split_specs(args.target)
+    if args.target_file:
+        specs += read_spec_file(args.target_file)
+    excl = split_specs(args.exclude)
+    if args.exclude_file:
+        excl += read_spec_file(args.exclude_file)
+    return TargetSet.parse(specs, excl)
+
+def add_history_args(p):
+    p.add_argument("--history", default=None, metavar="DB",
+                   help="Base SQLite d'historique : chaque hôte y est ajouté (requêtes : sous-commande query)")
+
+def open_history(args, meta):
+    if not getattr(args, "history", None):
+        return None
+    from scan_history import HistoryWriter
+    try:
+        return HistoryWriter(args.history, meta)
+    except Exception as e:
+        print(f"[!] Historique {args.history} inutilisable: {e}")
+        sys.exit(1)
+
+def scan_hosts_sharded(targets, ports, args, stream=None, history=None):
+    """Comme scan_hosts, mais réparti sur --shards processus ; le parent fusionne les résultats."""
+    from sharded_scan import run_sharded
+    check_syn_args(args)
+    check_rate_args(args)
+    engine_defaults(args)
+    REPORTER.configure(targets=len(targets), ports_per_host=len(ports))
+    all_hosts = []
+
+    def on_host(h):
+        REPORTER.emit("host_done", host=h)
+        if history:
+            history.write_host(h)
+        if stream:
+            stream.write_host(h)
+        else:
+            all_hosts.append(h)
+
+    settings = {
+        "timing": timing_settings(args),
+        "rate": rate_settings(args, args.shards),
+        "engine": args.engine,
+        "udp": args.udp,
+        "syn": args.syn,
+        "max_sockets": args.max_sockets if args.engine == "async" or args.udp or args.syn else None,
+        "scan_workers": args.scan_workers,
+        "post_workers": args.os_workers,
+        "queue_size": args.queue_size,
+        # les workers n'écrivent pas sur la console tenue par le reporter
+        "quiet": REPORTER.owns_console,
+    }
+    try:
+        count = run_sharded(targets, ports, args.shards, settings, on_host)
+    finally:
+        if stream:
+            stream.close()
+        if history:
+            history.close()
+    all_hosts.sort(key=lambda h: tuple(int(p) for p in h["ip"].split(".")))
+    return count, all_hosts
+
+def open_output(args, prefix):
+    """Nom du fichier de sortie et exporteur en flux (ndjson/csv) ; (None, None) sans --out."""
+    if not args.out:
+        return None, None
+    from result_export import StreamingExporter, STREAM_FORMATS
+    fname = os.path.join(args.outdir, f"{prefix}_{int(time.time())}.{args.out}")
+    if args.out in STREAM_FORMATS:
+        return fname, StreamingExporter(fname, args.out, skip_closed=args.skip_closed)
+    return fname, None
+
+def scan_hosts(ip_source, ports, args, stream=None, journal=None, baseline=None, history=None):
+    """
+    Pipeline découverte -> scan ports -> OS ; affiche chaque hôte et retourne (nb_hôtes, all_hosts).
+    Avec `stream`, chaque hôte est écrit dès qu'il est terminé et all_hosts n'est pas conservé.
+    Avec `journal`, le travail terminé est journalisé et celui d'un run précédent réutilisé.
+    Avec `baseline`, les ports connus passent en premier et chaque hôte alimente le rapport.
+    Avec `history`, chaque hôte est ajouté à la base SQLite (par lots).
+    """
+    from port_scan_win import scan_host_ports, AsyncScanEngine
+    from scan_pipeline import run_pipeline
+    check_syn_args(args)
+    apply_timing_args(args)
+    REPORTER.configure(ports_per_host=len(ports))
+    count = [0]
+    previous = []
+
+    def emit(h):
+        count[0] += 1
+        REPORTER.emit("host_done", host=h)
+        if baseline:
+            baseline.observe_host(h)
+        if history:
+            history.write_host(h)
+        if stream:
+            stream.write_host(h)
+
+    def on_host(h):
+        emit(h)
+        if journal:
+            journal.record_host(h)
+
+    if journal:
+        for h in journal.finished_hosts():
+            emit(h)
+            if stream is None:
+                previous.append(h)
+
+    engine = None
+    scan_fn = scan_host_ports
+    scan_workers = args.scan_workers
+    if args.syn:
+        from syn_scan import SynScanEngine
+        engine = SynScanEngine(max_in_flight=args.max_sockets)
+        scan_fn = engine.scan_host_ports
+        print(f"[+] Scan SYN — {engine.max_in_flight} SYN en vol max (port source {engine.sport})")
+    elif args.udp:
+        from udp_scan import UdpScanEngine
+        engine = UdpScanEngine(max_in_flight=args.max_sockets)
+        scan_fn = engine.scan_host_ports
+        print(f"[+] Scan UDP — {engine.max_in_flight} probes en vol max")
+    elif args.engine == "async":
+        engine = AsyncScanEngine(args.max_sockets)
+        scan_fn = engine.scan_host_ports
+        print(f"[+] Moteur asyncio — {engine.max_sockets} sockets max")
+    if baseline:
+        scan_fn = baseline.wrap_scan(scan_fn)
+    if journal:
+        scan_fn = journal.wrap_scan(scan_fn)
+    try:
+        all_hosts = run_pipeline(
+            ip_source, ports,
+            on_host=on_host,
+            keep=stream is None,
+            scan_fn=scan_fn,
+            scan_workers=scan_workers,
+            post_workers=args.os_workers,
+            queue_size=args.queue_size,
+        )
+        if previous:
+            all_hosts = sorted(previous + all_hosts, key=lambda h: tuple(int(p) for p in h["ip"].split(".")))
+        return count[0], all_hosts
+    finally:
+        if engine:
+            engine.close()
+        if stream:
+            stream.close()
+        if history:
+            history.close()
+        if journal:
+            journal.close()
 
 def main():
     parser = argparse.ArgumentParser(description="CLI Scanner — découvre hôtes, scan ports, détecte OS, affiche vuln")
@@ -114,18 +486,187 @@ def main():
     p_disc = sub.add_parser("discover", help="Découvrir les hôtes")
     p_disc.add_argument("--outdir", default=".", help="Dossier de sortie")
 
-    p_scan = sub.add_parser("scan", help="Scanner une cible (CIDR)")
-    p_scan.add_argument("--target", required=True)
-    p_scan.add_argument("--ports", default=",".join(str(p) for p in DEFAULT_PORTS))
-    p_scan.add_argument("--out", choices=("json","csv"), default=None)
+    p_scan = sub.add_parser("scan", help="Scanner des cibles (CIDR, IP, plages)")
+    p_scan.add_argument("--target", help="Cibles séparées par des virgules : CIDR, IP, a.b.c.d-e.f.g.h, a.b.c.d-N "
+                                         "(obligatoire sauf avec --resume/--target-file)")
+    p_scan.add_argument("--target-file", help="Fichier de cibles (une spec par ligne, # commentaires)")
+    p_scan.add_argument("--exclude", help="Cibles exclues (même syntaxe que --target)")
+    p_scan.add_argument("--exclude-file", help="Fichier de cibles exclues")
+    p_scan.add_argument("--shards", type=int, default=1,
+                        help="Nombre de processus de scan (espace d'adresses réparti entre eux)")
+    add_port_args(p_scan)
+    p_scan.add_argument("--out", choices=("json","csv","ndjson"), default=None,
+                        help="ndjson/csv : écrits au fil du scan ; json : à la fin")
+    p_scan.add_argument("--skip-closed", action="store_true", help="Ports fermés résumés en plages (json/ndjson) ou omis (csv)")
     p_scan.add_argument("--outdir", default=".", help="Dossier de sortie")
+    add_engine_args(p_scan)
+    add_journal_args(p_scan)
+    add_baseline_args(p_scan)
+    add_history_args(p_scan)
 
     p_full = sub.add_parser("full", help="Découverte auto + scan ports + os")
-    p_full.add_argument("--ports", default=",".join(str(p) for p in DEFAULT_PORTS))
-    p_full.add_argument("--out", choices=("json","csv"), default=None)
+    add_port_args(p_full)
+    p_full.add_argument("--out", choices=("json","csv","ndjson"), default=None,
+                        help="ndjson/csv : écrits au fil du scan ; json : à la fin")
+    p_full.add_argument("--skip-closed", action="store_true", help="Ports fermés résumés en plages (json/ndjson) ou omis (csv)")
     p_full.add_argument("--outdir", default=".", help="Dossier de sortie")
+    add_engine_args(p_full)
+    add_journal_args(p_full)
+    add_baseline_args(p_full)
+    add_history_args(p_full)
+    p_full.set_defaults(target=None)
+
+    p_query = sub.add_parser("query", help="Interroger l'historique SQLite (--history) de tous les runs")
+    p_query.add_argument("--db", required=True, help="Base d'historique")
+    p_query.add_argument("--ip", help="IP, CIDR ou plage (syntaxe --target)")
+    p_query.add_argument("--port", help="Ports (syntaxe --ports)")
+    p_query.add_argument("--product", help="Produit (préfixe, insensible à la casse), ex. OpenSSH")
+    p_query.add_argument("--version", help="Version ou spec : 7.4, <7.6, >=2.4.49,<2.4.51")
+    p_query.add_argument("--service", help="Nom de service (ssh, http, ssl/http...)")
+    p_query.add_argument("--banner", help="Texte contenu dans la bannière")
+    p_query.add_argument("--state", default="open", help="État (open, filtered, error) ; 'any' = tous")
+    p_query.add_argument("--vulnerable", action="store_true", help="Seulement les ports avec vulnérabilités")
+    p_query.add_argument("--since", help="Depuis : 30d, 12h, 2026-09-01")
+    p_query.add_argument("--until", help="Jusqu'à (même syntaxe)")
+    p_query.add_argument("--latest", action="store_true", help="Dernier run de chaque hôte seulement")
+    p_query.add_argument("--limit", type=int, default=None, help="Lignes max (défaut QUERY_LIMIT, 0 = sans limite)")
+    p_query.add_argument("--format", choices=("table", "json", "csv"), default="table")
+    p_query.add_argument("--scans", action="store_true", help="Liste les runs enregistrés")
+
+    p_daemon = sub.add_parser("daemon", help="Démon : jobs de scan via une API HTTP/JSON locale, caches gardés chauds")
+    p_daemon.add_argument("--listen", default=None, metavar="HÔTE:PORT",
+                          help="Adresse d'écoute HTTP (défaut 127.0.0.1:8765)")
+    p_daemon.add_argument("--unix", default=None, metavar="CHEMIN", help="Écoute sur un socket Unix à la place")
+    p_daemon.add_argument("--allow-remote", action="store_true",
+                          help="Autorise une adresse hors boucle locale (exige --token)")
+    p_daemon.add_argument("--token", default=os.environ.get("SCAN_DAEMON_TOKEN"),
+                          help="Jeton exigé dans 'Authorization: Bearer <jeton>' (défaut $SCAN_DAEMON_TOKEN)")
+    p_daemon.add_argument("--max-jobs", type=int, default=None, help="Jobs exécutés en même temps (défaut MAX_JOBS)")
+    add_engine_args(p_daemon)
+    p_daemon.set_defaults(engine="async")
+
+    p_index = sub.add_parser("build-vuln-index",
+                             help="Construit l'index binaire de vulnérabilités à partir de flux NVD/CPE locaux")
+    p_index.add_argument("feeds", nargs="+", help="Flux .json/.ndjson (éventuellement .gz) : NVD 1.1/2.0, "
+                                                   "entrées produit/CPE + versions, format vuln_db.json")
+    p_index.add_argument("--out", default=None, help="Fichier index (défaut vuln_db.idx, lu par le scanner)")
+    p_index.add_argument("--no-local-db", action="store_true", help="N'inclut pas vuln_db.json dans l'index")
+
+    for p in (p_disc, p_scan, p_full, p_query, p_daemon, p_index):
+        add_metrics_args(p)
+    for p in (p_disc, p_scan, p_full):
+        add_output_args(p)
 
     args = parser.parse_args()
+    if not args.cmd:
+        parser.print_help()
+        return
+    # reporter à l'extérieur : le résumé des métriques passe encore par lui
+    with reporting(args), instrumented(args):
+        run_command(args)
+
+def run_query(args):
+    from scan_history import query, list_scans, parse_when, QUERY_LIMIT
+    if not os.path.exists(args.db):
+        print(f"[!] Base d'historique introuvable: {args.db}")
+        sys.exit(1)
+    if args.scans:
+        for r in list_scans(args.db):
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["started"]))
+            print(f" #{r['scan_id']:<5} {started}  {r['cmd'] or '-':<5} {r['target'] or '-':<20} "
+                  f"{r['hosts']} hôte(s), {r['open_ports']} port(s) ouverts")
+        return
+    try:
+        rows = query(args.db, ip=args.ip, ports=parse_ports(args.port) if args.port else None,
+                     product=args.product, version=args.version, service=args.service, banner=args.banner,
+                     state=None if args.state == "any" else args.state, vulnerable=args.vulnerable,
+                     since=parse_when(args.since) if args.since else None,
+                     until=parse_when(args.until) if args.until else None,
+                     latest=args.latest, limit=QUERY_LIMIT if args.limit is None else args.limit)
+        rows = list(rows)
+    except ValueError as e:
+        print(f"[!] Filtre invalide: {e}")
+        sys.exit(1)
+    if args.format == "json":
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    for r in rows:
+        r["scanned"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["scanned"]))
+        r["vulns"] = "; ".join(f"{v['product']} {v['version']}" for v in r["vulns"] or [])
+        r["banner"] = (r["banner"] or "").splitlines()[0][:60] if r["banner"] else ""
+    keys = ["scanned", "ip", "hostname", "port", "state", "service", "product", "version", "vulns", "banner"]
+    if args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=keys, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    try:
+        from tabulate import tabulate
+    except Exception:
+        tabulate = None
+    if tabulate:
+        print(tabulate([[r[k] for k in keys] for r in rows], headers=keys))
+    else:
+        for r in rows:
+            print("  ".join(str(r[k] if r[k] is not None else "-") for k in keys))
+    print(f"[+] {len(rows)} résultat(s)")
+
+def run_daemon(args):
+    import scan_daemon
+    if args.syn:
+        print("[!] --syn non supporté par le démon.")
+        sys.exit(1)
+    # travail par job : défauts du démon, pas ceux d'un scan isolé
+    scan_workers = args.scan_workers or scan_daemon.JOB_SCAN_WORKERS
+    post_workers = args.os_workers or scan_daemon.JOB_POST_WORKERS
+    apply_timing_args(args)
+    host, port = scan_daemon.DAEMON_HOST, scan_daemon.DAEMON_PORT
+    if args.listen:
+        h, _, p = args.listen.rpartition(":")
+        try:
+            host, port = h or host, int(p)
+        except ValueError:
+            print(f"[!] --listen invalide: {args.listen}")
+            sys.exit(1)
+    daemon = scan_daemon.ScanDaemon(
+        engine=args.engine, max_sockets=args.max_sockets,
+        max_jobs=args.max_jobs or scan_daemon.MAX_JOBS,
+        scan_workers=scan_workers, post_workers=post_workers, udp=args.udp)
+    try:
+        scan_daemon.serve(daemon, host, port, args.unix, token=args.token, allow_remote=args.allow_remote)
+    except (OSError, ValueError) as e:
+        daemon.close()
+        print(f"[!] Démon non démarré: {e}")
+        sys.exit(1)
+
+def run_build_vuln_index(args):
+    from port_scan_win import VULN_DB_FILE, VULN_INDEX_FILE
+    from vuln_index import build_index
+    feeds = list(args.feeds)
+    if not args.no_local_db and os.path.exists(VULN_DB_FILE) and VULN_DB_FILE not in feeds:
+        feeds.append(VULN_DB_FILE)
+    out = args.out or VULN_INDEX_FILE
+    try:
+        stats = build_index(feeds, out)
+    except (OSError, ValueError) as e:
+        print(f"[!] Flux illisible: {e}")
+        sys.exit(1)
+    print(f"[+] Index: {stats['products']} produit(s), {stats['entries']} entrée(s) "
+          f"({stats['skipped']} ignorée(s) sur {stats['read']}) -> {out} "
+          f"({stats['bytes'] // 1024} Ko, {stats['seconds']:.1f}s)")
+
+def run_command(args):
+    if args.cmd == "build-vuln-index":
+        run_build_vuln_index(args)
+        sys.exit(0)
+
+    if args.cmd == "query":
+        run_query(args)
+        sys.exit(0)
+
+    if args.cmd == "daemon":
+        run_daemon(args)
+        sys.exit(0)
 
     if args.cmd == "discover":
         ip = get_primary_ip()
@@ -134,72 +675,87 @@ def main():
             sys.exit(1)
         net = get_netmask_for_ip(ip)
         print(f"[+] IP: {ip} Réseau: {net}")
+        from host_discovery_win import discover_hosts
         hosts = discover_hosts(net)
         print(f"[+] Hôtes trouvés ({len(hosts)}):")
         for h in hosts:
             print(f" - {h.get('ip')}  MAC:{h.get('mac') or '-'}  Host:{h.get('hostname') or '-'}")
         sys.exit(0)
 
+    from host_discovery_win import iter_discover_hosts
+    from result_export import export_results_flat
+
     if args.cmd == "scan":
+        journal = load_journal(args)
         try:
-            net = ipaddress.ip_network(args.target, strict=False)
+            net = parse_targets(args)
         except Exception:
             print("[!] target invalide.")
             sys.exit(1)
-        ports = [int(p) for p in args.ports.split(",") if p.strip()]
-        hosts = discover_hosts(net)
-        all_hosts = []
-        for host in hosts:
-            ip = host.get("ip")
-            print(f"\n[+] Traitement {ip}")
-            services = scan_host_ports(ip, ports)
-            os_info = detect_os(ip)
-            print_host_summary(host, services, os_info)
-            host_entry = {
-                "ip": ip,
-                "mac": host.get("mac"),
-                "hostname": host.get("hostname"),
-                "os": os_info,
-                "services": services
-            }
-            all_hosts.append(host_entry)
-        if args.out:
-            fname = os.path.join(args.outdir, f"scan_{int(time.time())}.{args.out}")
-            export_results_flat(all_hosts, fname, args.out)
+        if not net:
+            print("[!] Aucune cible (--target/--target-file) après exclusions.")
+            sys.exit(1)
+        REPORTER.configure(targets=len(net))
+        ports = resolve_ports(args)
+        baseline = load_baseline(args)
+        if args.shards > 1:
+            if journal or baseline:
+                print("[!] --journal/--resume/--baseline non supportés avec --shards.")
+                sys.exit(1)
+            fname, stream = open_output(args, "scan")
+            history = open_history(args, {"cmd": "scan", "target": net.spec(), "ports": ports})
+            _, all_hosts = scan_hosts_sharded(net, ports, args, stream, history)
+            if fname and not stream:
+                export_results_flat(all_hosts, fname, args.out, args.skip_closed)
+            sys.exit(0)
+        discover = lambda: iter_discover_hosts(net)
+        if baseline:
+            discover = lambda: baseline.source(net, lambda: iter_discover_hosts(net))
+        source = discover()
+        if journal:
+            journal.open({"cmd": "scan", "target": net.spec(), "ports": ports})
+            source = journal.source(discover)
+        fname, stream = open_output(args, "scan")
+        history = open_history(args, {"cmd": "scan", "target": net.spec(), "ports": ports})
+        _, all_hosts = scan_hosts(source, ports, args, stream, journal, baseline, history)
+        if fname and not stream:
+            export_results_flat(all_hosts, fname, args.out, args.skip_closed)
+        if baseline:
+            finish_baseline(baseline, args, "scan", net)
         sys.exit(0)
 
     if args.cmd == "full":
-        ip = get_primary_ip()
-        if not ip:
-            print("[!] IP locale non détectée.")
-            sys.exit(1)
-        net = get_netmask_for_ip(ip)
-        ports = [int(p) for p in args.ports.split(",") if p.strip()]
-        hosts = discover_hosts(net)
-        if not hosts:
+        journal = load_journal(args)
+        if args.target:
+            net = ipaddress.ip_network(args.target, strict=False)
+        else:
+            ip = get_primary_ip()
+            if not ip:
+                print("[!] IP locale non détectée.")
+                sys.exit(1)
+            net = get_netmask_for_ip(ip)
+        ports = resolve_ports(args)
+        baseline = load_baseline(args)
+        scope = TargetSet.parse([str(net)])
+        REPORTER.configure(targets=len(scope))
+        discover = lambda: iter_discover_hosts(net)
+        if baseline:
+            discover = lambda: baseline.source(scope, lambda: iter_discover_hosts(net))
+        source = discover()
+        if journal:
+            journal.open({"cmd": "full", "target": str(net), "ports": ports})
+            source = journal.source(discover)
+        fname, stream = open_output(args, "fullscan")
+        history = open_history(args, {"cmd": "full", "target": str(net), "ports": ports})
+        count, all_hosts = scan_hosts(source, ports, args, stream, journal, baseline, history)
+        if baseline:
+            finish_baseline(baseline, args, "fullscan", scope)
+        if not count:
             print("[!] Aucun hôte découvert — sortie.")
             sys.exit(0)
-        all_hosts = []
-        for host in hosts:
-            ip = host.get("ip")
-            print(f"\n[+] Traitement {ip}")
-            services = scan_host_ports(ip, ports)
-            os_info = detect_os(ip)
-            print_host_summary(host, services, os_info)
-            host_entry = {
-                "ip": ip,
-                "mac": host.get("mac"),
-                "hostname": host.get("hostname"),
-                "os": os_info,
-                "services": services
-            }
-            all_hosts.append(host_entry)
-        if args.out:
-            fname = os.path.join(args.outdir, f"fullscan_{int(time.time())}.{args.out}")
-            export_results_flat(all_hosts, fname, args.out)
+        if fname and not stream:
+            export_results_flat(all_hosts, fname, args.out, args.skip_closed)
         sys.exit(0)
 
-    parser.print_help()
-
 if __name__ == "__main__":
     main()
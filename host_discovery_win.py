@@ -60,25 +60,76 @@
 
 # host_discovery_win.py
 import subprocess
-import platform
 import concurrent.futures
 import socket
 import ipaddress
 import re
-from typing import List, Dict, Optional
+import os
+import time
+import threading
+import itertools
+import selectors
+import struct
+import errno
+from typing import List, Dict, Optional, Iterator
 
-def parse_arp_a_output(output: str) -> List[str]:
-    ips = set()
+from timing import HOST_TIMINGS
+from rate_limit import RATE_LIMITER
+from scan_metrics import METRICS
+from scan_reporter import REPORTER, report
+from targets import TargetSet
+from name_resolution import prefetch_name, resolve_name, get_resolver
+
+PROBE_TIMEOUT = 1.0
+DISCOVERY_WORKERS = 200
+# futures en vol max : la mémoire ne dépend plus de la taille du préfixe
+DISCOVERY_WINDOW = 2 * DISCOVERY_WORKERS
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}  # 10035 = WSAEWOULDBLOCK
+
+MAC_RE = re.compile(r"^(?:[0-9A-Fa-f]{1,2}[-:]){5}[0-9A-Fa-f]{1,2}$")
+PROC_NET_ARP = "/proc/net/arp"
+# délai min entre deux relectures de la table sur un échec de lookup
+NEIGHBOUR_REFRESH_INTERVAL = 5.0
+
+def parse_arp_a_entries(output: str) -> Dict[str, str]:
+    """
+    Parse la sortie de 'arp -a' en { ip: mac }.
+    Windows : "  192.168.0.1   24-2f-d0-10-10-1f   dynamique"
+    Unix    : "? (192.168.0.1) at 24:2f:d0:10:10:1f [ether] on eth0"
+    """
+    table = {}
     for ln in output.splitlines():
-        ln = ln.strip()
-        parts = ln.split()
-        if len(parts) >= 2 and parts[0].count(".") == 3:
-            try:
-                ipaddress.ip_address(parts[0])
-                ips.add(parts[0])
-            except Exception:
-                pass
-    return list(ips)
+        parts = ln.strip().replace("(", " ").replace(")", " ").split()
+        ip = next((p for p in parts if p.count(".") == 3), None)
+        mac = next((p for p in parts if MAC_RE.match(p)), None)
+        if not ip or not mac:
+            continue
+        try:
+            ipaddress.ip_address(ip)
+        except Exception:
+            continue
+        if mac.replace("-", "").replace(":", "").lower() in ("000000000000", "ffffffffffff"):
+            continue
+        table[ip] = mac
+    return table
+
+def parse_arp_a_output(output: str) -> List[str]:
+    return list(parse_arp_a_entries(output))
+
+def read_proc_net_arp(path: str = PROC_NET_ARP) -> Dict[str, str]:
+    """Table voisins Linux sans sous-processus : /proc/net/arp -> { ip: mac }."""
+    table = {}
+    try:
+        with open(path, "r", encoding="ascii", errors="ignore") as f:
+            next(f, None)  # en-tête
+            for ln in f:
+                parts = ln.split()
+                # IP, HW type, Flags, HW address, Mask, Device ; flags 0x0 = incomplet
+                if len(parts) >= 4 and parts[2] != "0x0" and parts[3] != "00:00:00:00:00:00":
+                    table[parts[0]] = parts[3]
+    except Exception:
+        pass
+    return table
 
 def get_arp_table_windows() -> List[str]:
     try:
@@ -87,96 +138,185 @@ def get_arp_table_windows() -> List[str]:
     except Exception:
         return []
 
+class NeighbourTable:
+    """
+    Instantané ip -> MAC de la table ARP, lu une fois par run :
+    /proc/net/arp sous Linux, un seul 'arp -a' ailleurs. Un lookup manquant
+    relit la table au plus toutes les NEIGHBOUR_REFRESH_INTERVAL secondes
+    (les probes TCP peuplent le cache ARP pendant la découverte).
+    """
+
+    def __init__(self, refresh_interval: float = NEIGHBOUR_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._table: Optional[Dict[str, str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, str]:
+        if os.path.exists(PROC_NET_ARP):
+            return read_proc_net_arp()
+        try:
+            res = subprocess.run(["arp", "-a"], capture_output=True, text=True, check=False)
+            return parse_arp_a_entries(res.stdout)
+        except Exception:
+            return {}
+
+    def refresh(self) -> Dict[str, str]:
+        with self._lock:
+            self._table = self._read()
+            self._loaded_at = time.time()
+            return self._table
+
+    def snapshot(self) -> Dict[str, str]:
+        table = self._table
+        return table if table is not None else self.refresh()
+
+    def lookup(self, ip: str) -> Optional[str]:
+        mac = self.snapshot().get(ip)
+        if mac is None and time.time() - self._loaded_at >= self.refresh_interval:
+            mac = self.refresh().get(ip)
+        return mac
+
+NEIGHBOURS = NeighbourTable()
+
 def mac_from_arp(ip: str) -> Optional[str]:
-    """Retourne la MAC pour une IP via 'arp -a IP' si présente."""
-    try:
-        p = subprocess.run(["arp","-a", ip], capture_output=True, text=True, check=False)
-        out = p.stdout
-        for ln in out.splitlines():
-            if ip in ln:
-                parts = ln.split()
-                for part in parts:
-                    # Windows MAC format ex: 00-11-22-33-44-55
-                    if '-' in part and re.match(r'^[0-9A-Fa-f\-]{17,}$', part):
-                        return part
-    except Exception:
-        pass
-    return None
+    """Retourne la MAC pour une IP depuis la table voisins (instantané partagé)."""
+    return NEIGHBOURS.lookup(ip)
 
 def reverse_dns(ip: str) -> Optional[str]:
+    """Nom DNS inverse (borné par DNS_TIMEOUT, cache partagé) ; NetBIOS en repli sous Windows."""
+    return resolve_name(ip)
+
+def iter_host_ips(network: ipaddress.IPv4Network) -> Iterator[str]:
+    """Adresses hôtes du réseau en chaînes, générées depuis des entiers (mémoire constante)."""
+    if isinstance(network, TargetSet):
+        yield from network.iter_ips()
+        return
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen < 31:
+        first, last = first + 1, last - 1
+    for n in range(first, last + 1):
+        yield socket.inet_ntoa(struct.pack("!I", n))
+
+def probe_host(ip: str, ports=(80, 443), timeout: float = PROBE_TIMEOUT) -> Optional[float]:
+    """
+    Connect non bloquant sur tous les ports en même temps ; retourne le RTT (s)
+    du premier qui aboutit, None si aucun avant `timeout`.
+    """
+    # une probe par port, décomptée du débit global (pas d'adaptation : les
+    # adresses mortes sont normales pendant la découverte)
+    RATE_LIMITER.acquire(len(ports))
+    METRICS.inc("discovery_probes", len(ports))
+    with METRICS.timer("discovery_probe"):
+        return _probe_host(ip, ports, timeout)
+
+def _probe_host(ip: str, ports, timeout: float) -> Optional[float]:
+    sel = selectors.DefaultSelector()
+    socks = []
+    start = time.time()
     try:
-        return socket.gethostbyaddr(ip)[0]
-    except Exception:
+        for p in ports:
+            try:
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            except OSError:
+                continue
+            socks.append(s)
+            s.setblocking(False)
+            err = s.connect_ex((ip, p))
+            if err == 0:
+                return time.time() - start
+            if err in _CONNECT_PENDING:
+                sel.register(s, selectors.EVENT_WRITE)
+        deadline = start + timeout
+        while sel.get_map():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(remaining):
+                s = key.fileobj
+                if s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    return time.time() - start
+                sel.unregister(s)
         return None
+    finally:
+        sel.close()
+        for s in socks:
+            s.close()
+
+def ip_sort_key(ip: str):
+    return tuple(int(p) for p in ip.split("."))
+
+def enrich_host(ip: str) -> Dict:
+    """Construit l'objet hôte enrichi { ip, mac, hostname }."""
+    with METRICS.timer("enrich"):
+        mac = mac_from_arp(ip)
+        hostname = resolve_name(ip)
+    return {"ip": ip, "mac": mac, "hostname": hostname}
 
-def nbt_name(ip: str) -> Optional[str]:
-    """Tentative NetBIOS name via nbtstat -A (Windows)."""
-    if platform.system().lower().startswith("win"):
+def iter_discover_hosts(network: ipaddress.IPv4Network, quick_probe_ports=(80, 443)) -> Iterator[str]:
+    """
+    Découverte en flux : produit chaque IP vivante dès qu'elle est trouvée
+    (ARP d'abord, puis probes TCP), sans enrichissement.
+    """
+    discovered_ips = set()
+
+    report(f"[+] Découverte sur {network} ...")
+
+    # 1) ARP passive (table voisins lue une seule fois, Windows ou Linux)
+    for ip in NEIGHBOURS.refresh():
         try:
-            p = subprocess.run(["nbtstat","-A", ip], capture_output=True, text=True, check=False)
-            out = p.stdout
-            # Heuristique : trouver la première token printable utile
-            for ln in out.splitlines():
-                if "<20>" in ln or "<00>" in ln:
-                    parts = ln.split()
-                    for tok in parts:
-                        if not tok.startswith("<") and len(tok.strip()) > 1:
-                            return tok.strip()
+            if ipaddress.ip_address(ip) in network:
+                discovered_ips.add(ip)
         except Exception:
             pass
-    return None
+    if discovered_ips:
+        report(f"  • Découvert via ARP: {len(discovered_ips)} hôte(s)")
+        METRICS.inc("hosts_alive", len(discovered_ips))
+        for ip in sorted(discovered_ips, key=ip_sort_key):
+            REPORTER.emit("host_alive", ip=ip, via="arp")
+            yield ip
+
+    # 2) TCP-probe pour compléter (80/443 typiquement), fenêtre bornée sur un flux d'IP
+    to_probe = (ip for ip in iter_host_ips(network) if ip not in discovered_ips)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=DISCOVERY_WORKERS) as ex:
+        pending = {}
+        while True:
+            for ip in itertools.islice(to_probe, DISCOVERY_WINDOW - len(pending)):
+                pending[ex.submit(probe_host, ip, quick_probe_ports)] = ip
+            METRICS.gauge_set("discovery_pending", len(pending))
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                ip = pending.pop(fut)
+                try:
+                    rtt = fut.result()
+                except Exception:
+                    rtt = None
+                if rtt is not None:
+                    # premier échantillon RTT pour les timeouts adaptatifs du scan
+                    HOST_TIMINGS.observe(ip, rtt)
+                    METRICS.inc("hosts_alive")
+                    discovered_ips.add(ip)
+                    REPORTER.emit("host_alive", ip=ip, via="tcp", rtt_ms=round(rtt * 1000, 2))
+                    yield ip
 
 def discover_hosts(network: ipaddress.IPv4Network, quick_probe_ports=(80, 443)) -> List[Dict]:
     """
     Découverte : combine ARP table + probes TCP.
     Retourne liste d'objets: { "ip": "...", "mac": "...", "hostname": "..." }
     """
+    # noms résolus en parallèle, lancés dès qu'un hôte est trouvé
     discovered_ips = set()
-    hosts = []
-
-    print(f"[+] Découverte sur {network} ...")
-
-    # 1) ARP passive
-    if platform.system().lower().startswith("win"):
-        arp_ips = get_arp_table_windows()
-        for ip in arp_ips:
-            try:
-                if ipaddress.ip_address(ip) in network:
-                    discovered_ips.add(ip)
-            except Exception:
-                pass
-        if discovered_ips:
-            print(f"  • Découvert via ARP: {len(discovered_ips)} hôte(s)")
-
-    # 2) TCP-probe pour compléter (80/443 typiquement)
-    def probe(ip):
-        for p in quick_probe_ports:
-            try:
-                s = socket.create_connection((str(ip), p), timeout=1)
-                s.close()
-                return True
-            except Exception:
-                continue
-        return False
-
-    to_probe = [ip for ip in network.hosts() if str(ip) not in discovered_ips]
-    with concurrent.futures.ThreadPoolExecutor(max_workers=200) as ex:
-        futures = {ex.submit(probe, ip): ip for ip in to_probe}
-        for fut in concurrent.futures.as_completed(futures):
-            ip = futures[fut]
-            try:
-                if fut.result():
-                    discovered_ips.add(str(ip))
-                    print(f"  • {ip} => alive (tcp probe)")
-            except Exception:
-                pass
+    for ip in iter_discover_hosts(network, quick_probe_ports):
+        discovered_ips.add(ip)
+        prefetch_name(ip)
+    names = get_resolver().resolve_many(discovered_ips)
 
     # Construire la liste finale d'hôtes enrichis (ip, mac, hostname)
-    for ip in sorted(discovered_ips, key=lambda x: tuple(int(p) for p in x.split("."))):
-        mac = mac_from_arp(ip)
-        hostname = reverse_dns(ip) or nbt_name(ip)
-        hosts.append({"ip": ip, "mac": mac, "hostname": hostname})
+    hosts = [{"ip": ip, "mac": mac_from_arp(ip), "hostname": names.get(ip)}
+             for ip in sorted(discovered_ips, key=ip_sort_key)]
 
-    print(f"[+] Découverte terminée — {len(hosts)} hôte(s) trouvés.")
+    report(f"[+] Découverte terminée — {len(hosts)} hôte(s) trouvés.")
     return hosts
-
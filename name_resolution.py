@@ -0,0 +1,192 @@
+# name_resolution.py
+"""
+Résolution des noms d'hôtes (DNS inverse, puis NetBIOS sous Windows) :
+  - lookups concurrents sur un pool borné, lancés dès qu'un hôte est trouvé
+    (submit) et récupérés plus tard (resolve), pendant le scan de ports
+  - timeout par lookup, compté à partir du début réel de gethostbyaddr (pas
+    de sa mise en file) : gethostbyaddr n'en a pas, on cesse simplement
+    d'attendre ; un timeout n'est pas mis en cache comme "sans nom", la
+    réponse tardive remplit le cache (nom ou absence de nom)
+  - cache TTL (clé ip, persisté) réutilisé d'un run à l'autre
+"""
+import concurrent.futures
+import platform
+import socket
+import subprocess
+import threading
+from typing import Dict, Iterable, Optional
+
+from ttl_cache import TtlCache, MISS, cache_path
+from scan_metrics import METRICS
+
+NAME_WORKERS = 32           # lookups simultanés
+DNS_TIMEOUT = 1.0           # attente max d'une réponse DNS inverse (s)
+NBT_TIMEOUT = 2.0           # nbtstat -A (s)
+NAME_CACHE_TTL = 24 * 3600  # nom d'un hôte réutilisé 24 h
+NAME_NEGATIVE_TTL = 3600    # hôte sans nom : redemandé après 1 h
+
+def nbt_name(ip: str, timeout: float = NBT_TIMEOUT) -> Optional[str]:
+    """Tentative NetBIOS name via nbtstat -A (Windows)."""
+    if platform.system().lower().startswith("win"):
+        try:
+            p = subprocess.run(["nbtstat", "-A", ip], capture_output=True, text=True,
+                               check=False, timeout=timeout)
+            out = p.stdout
+            # Heuristique : trouver la première token printable utile
+            for ln in out.splitlines():
+                if "<20>" in ln or "<00>" in ln:
+                    parts = ln.split()
+                    for tok in parts:
+                        if not tok.startswith("<") and len(tok.strip()) > 1:
+                            return tok.strip()
+        except subprocess.TimeoutExpired:
+            METRICS.inc("nbt_timeouts")
+        except Exception:
+            pass
+    return None
+
+class NameResolver:
+    """
+    Noms d'hôtes par lots : submit() lance le lookup (ou rend le résultat en
+    cache / déjà en vol), resolve() l'attend. Appelable depuis plusieurs threads.
+    """
+
+    def __init__(self, workers: int = NAME_WORKERS, timeout: float = DNS_TIMEOUT,
+                 nbt_timeout: float = NBT_TIMEOUT, cache: Optional[TtlCache] = None):
+        self.timeout = timeout
+        self.nbt_timeout = nbt_timeout
+        self.cache = cache if cache is not None else TtlCache(
+            cache_path("names.json"), ttl=NAME_CACHE_TTL, negative_ttl=NAME_NEGATIVE_TTL)
+        # deux pools : un lookup bloqué dans gethostbyaddr ne retient pas le suivant
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="names")
+        self._dns = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dns")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        # lookups DNS expirés mais encore en cours : ip -> future gethostbyaddr
+        self._timed_out: Dict[str, concurrent.futures.Future] = {}
+
+    def _late_answer(self, ip: str, fut: concurrent.futures.Future):
+        with self._lock:
+            self._timed_out.pop(ip, None)
+        if fut.cancelled():
+            return
+        try:
+            name = fut.result()[0]
+        except socket.herror:
+            name = None         # réponse définitive : pas de nom
+        except Exception:
+            return
+        self.cache.set(ip, name)
+
+    def _dns_lookup(self, ip: str) -> concurrent.futures.Future:
+        """gethostbyaddr sur le pool DNS ; `started` est signalé quand il démarre vraiment."""
+        started = threading.Event()
+
+        def run():
+            started.set()
+            return socket.gethostbyaddr(ip)
+
+        fut = self._dns.submit(run)
+        fut.started = started
+        return fut
+
+    def _lookup(self, ip: str) -> Optional[str]:
+        with METRICS.timer("name_lookup"):
+            METRICS.inc("dns_lookups")
+            with self._lock:
+                # réponse d'un lookup précédent encore attendue : on ne la relance pas
+                dns = self._timed_out.get(ip)
+            if dns is None:
+                dns = self._dns_lookup(ip)
+            timed_out = False
+            try:
+                # en file derrière des lookups lents, le timeout ne court pas encore
+                while not dns.started.wait(self.timeout) and not dns.done():
+                    pass
+                name = dns.result(timeout=self.timeout)[0]
+            except concurrent.futures.TimeoutError:
+                METRICS.inc("dns_timeouts")
+                with self._lock:
+                    self._timed_out[ip] = dns
+                dns.add_done_callback(lambda f: self._late_answer(ip, f))
+                timed_out = True
+                name = None
+            except concurrent.futures.CancelledError:
+                return None     # résolveur fermé avant le lookup : rien à mettre en cache
+            except Exception:
+                name = None
+            if not name:
+                name = nbt_name(ip, self.nbt_timeout)
+            if name or not timed_out:
+                self.cache.set(ip, name)
+            return name
+
+    def _done(self, ip: str, fut: concurrent.futures.Future):
+        with self._lock:
+            if self._pending.get(ip) is fut:
+                del self._pending[ip]
+
+    def submit(self, ip: str) -> concurrent.futures.Future:
+        cached = self.cache.get(ip)
+        if cached is not MISS:
+            fut = concurrent.futures.Future()
+            fut.set_result(cached)
+            return fut
+        with self._lock:
+            fut = self._pending.get(ip)
+            if fut is None:
+                fut = self._pending[ip] = self._pool.submit(self._lookup, ip)
+                fut.add_done_callback(lambda f: self._done(ip, f))
+        return fut
+
+    def resolve(self, ip: str) -> Optional[str]:
+        try:
+            return self.submit(ip).result()
+        except Exception:
+            return None
+
+    def resolve_many(self, ips: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Lot d'IP -> { ip: nom }, lookups lancés en parallèle."""
+        futures = {ip: self.submit(ip) for ip in ips}
+        out = {}
+        for ip, f in futures.items():
+            try:
+                out[ip] = f.result()
+            except Exception:
+                out[ip] = None
+        return out
+
+    def close(self):
+        # d'abord les lookups DNS en file : les lookups qui les attendent se terminent aussitôt
+        self._dns.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=True)
+        self.cache.save()
+
+_resolver: Optional[NameResolver] = None
+_resolver_lock = threading.Lock()
+
+def get_resolver() -> NameResolver:
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = NameResolver()
+    return _resolver
+
+def close_resolver():
+    """Ferme le résolveur partagé (cache sauvegardé) ; le prochain get_resolver() en recrée un."""
+    global _resolver
+    with _resolver_lock:
+        resolver, _resolver = _resolver, None
+    if resolver is not None:
+        resolver.close()
+
+def prefetch_name(ip: str):
+    """Lance la résolution en arrière-plan ; resolve_name() la récupère ensuite."""
+    try:
+        get_resolver().submit(ip)
+    except Exception:
+        pass
+
+def resolve_name(ip: str) -> Optional[str]:
+    return get_resolver().resolve(ip)
@@ -1,24 +1,51 @@
 import socket
 import ipaddress
-try:
-    import psutil
-except Exception:
-    psutil = None
+
+from ttl_cache import TtlCache, MISS, cache_path
+
+# IP principale et réseau local réutilisés d'une invocation à l'autre pendant 5 min
+IFACE_CACHE_TTL = 300
+
+_cache = None
+
+def _iface_cache() -> TtlCache:
+    global _cache
+    if _cache is None:
+        _cache = TtlCache(cache_path("iface.json"), ttl=IFACE_CACHE_TTL, max_entries=64)
+    return _cache
 
 def get_primary_ip():
+    cached = _iface_cache().get("primary_ip")
+    if cached is not MISS and cached:
+        return cached
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         s.connect(("8.8.8.8", 80))
-        return s.getsockname()[0]
+        ip = s.getsockname()[0]
     except Exception:
         return None
     finally:
         s.close()
+    _iface_cache().set("primary_ip", ip)
+    return ip
 
 def get_netmask_for_ip(ip):
     """Retourne ip_network pour une IP donnée"""
     if not ip:
         return None
+    cached = _iface_cache().get(f"net|{ip}")
+    if cached is not MISS and cached:
+        return ipaddress.ip_network(cached, strict=False)
+    net = _netmask_for_ip(ip)
+    if net is not None:
+        _iface_cache().set(f"net|{ip}", str(net))
+    return net
+
+def _netmask_for_ip(ip):
+    try:
+        import psutil   # coûteux à importer : seulement si le réseau n'est pas en cache
+    except Exception:
+        psutil = None
     if psutil:
         for ifname, addrs in psutil.net_if_addrs().items():
             for addr in addrs:
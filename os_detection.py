@@ -1,23 +1,25 @@
 # os_detection.py
 import platform
 import subprocess
+import asyncio
+import threading
+import concurrent.futures
 import re
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Iterable, Tuple
 
-def detect_os(ip: str) -> Dict[str, Optional[object]]:
-    """
-    Ping l'hôte (1 echo) et déduit le TTL -> heuristique OS.
-    Retourne: { "ttl": int|None, "os_guess": "..."}.
-    """
-    param = "-n" if platform.system().lower().startswith("win") else "-c"
-    try:
-        p = subprocess.run(["ping", param, "1", ip], capture_output=True, text=True, check=False)
-        out = p.stdout
-        m = re.search(r"TTL=(\d+)", out, re.IGNORECASE)
-        ttl = int(m.group(1)) if m else None
-    except Exception:
-        ttl = None
+from ttl_cache import TtlCache, MISS, cache_path
+from scan_metrics import METRICS
+
+PING_TIMEOUT = 1.0          # attente d'écho max (s)
+MAX_PINGS = 32              # pings simultanés
+OS_CACHE_TTL = 6 * 3600     # TTL/OS d'un hôte (ip, mac) réutilisé 6 h
+OS_NEGATIVE_TTL = 600       # hôte muet : re-pingé après 10 min
 
+_TTL_RE = re.compile(r"TTL=(\d+)", re.IGNORECASE)
+
+def guess_os_from_ttl(ttl: Optional[int]) -> Dict[str, Optional[object]]:
+    """Heuristique TTL -> OS. Retourne: { "ttl": int|None, "os_guess": "..."}."""
     if ttl is None:
         return {"ttl": None, "os_guess": None}
 
@@ -31,3 +33,149 @@ def detect_os(ip: str) -> Dict[str, Optional[object]]:
         guess = "Equipement réseau / TTL faible"
 
     return {"ttl": ttl, "os_guess": guess}
+
+def ping_command(ip: str, timeout: float = PING_TIMEOUT):
+    system = platform.system().lower()
+    if system.startswith("win"):
+        return ["ping", "-n", "1", "-w", str(int(timeout * 1000)), ip]
+    if system == "darwin":
+        return ["ping", "-c", "1", "-W", str(int(timeout * 1000)), ip]
+    return ["ping", "-c", "1", "-W", str(max(1, round(timeout))), ip]
+
+def parse_ping_ttl(out: str) -> Optional[int]:
+    m = _TTL_RE.search(out or "")
+    return int(m.group(1)) if m else None
+
+async def ping_ttl_async(ip: str, sem: Optional[asyncio.Semaphore] = None,
+                         timeout: float = PING_TIMEOUT) -> Optional[int]:
+    """Un ping non bloquant ; tué s'il dépasse `timeout` (+ marge de lancement)."""
+    if sem is None:
+        sem = asyncio.Semaphore(1)
+    async with sem:
+        METRICS.inc("pings")
+        start = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *ping_command(ip, timeout),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        except Exception:
+            return None
+        finally:
+            # coût du lancement du processus seul (fork/exec), distinct de l'attente réseau
+            METRICS.observe("ping_spawn", time.perf_counter() - start)
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), timeout + 1.0)
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+            await proc.wait()
+            METRICS.inc("ping_timeouts")
+            return None
+        finally:
+            METRICS.observe("ping", time.perf_counter() - start)
+        return parse_ping_ttl(out.decode(errors="ignore"))
+
+class OsDetector:
+    """
+    Détection OS par lots : pings asynchrones bornés à `max_pings` sur une boucle
+    dédiée, et cache TTL (clé ip|mac, persisté) pour réutiliser les runs précédents.
+    detect() est appelable depuis plusieurs threads (étage OS du pipeline).
+    """
+
+    def __init__(self, max_pings: int = MAX_PINGS, timeout: float = PING_TIMEOUT,
+                 cache: Optional[TtlCache] = None):
+        self.timeout = timeout
+        self.cache = cache if cache is not None else TtlCache(
+            cache_path("os_cache.json"), ttl=OS_CACHE_TTL, negative_ttl=OS_NEGATIVE_TTL)
+        self.max_pings = max_pings
+        self._loop = asyncio.new_event_loop()
+        self._sem = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="os-detect", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._sem = asyncio.Semaphore(self.max_pings)
+        self._ready.set()
+        self._loop.run_forever()
+
+    @staticmethod
+    def _key(ip: str, mac: Optional[str]) -> str:
+        return f"{ip}|{(mac or '').lower()}"
+
+    def observe(self, ip: str, ttl: Optional[int], mac: Optional[str] = None):
+        """Enregistre un TTL vu ailleurs (ex. réponse SYN) sans ping."""
+        self.cache.set(self._key(ip, mac), ttl)
+
+    def submit(self, ip: str, mac: Optional[str] = None) -> concurrent.futures.Future:
+        cached = self.cache.get(self._key(ip, mac))
+        if cached is MISS and mac:
+            # TTL observé sans MAC (scan SYN) pour cette IP
+            cached = self.cache.get(self._key(ip, None))
+        if cached is not MISS:
+            fut = concurrent.futures.Future()
+            fut.set_result(guess_os_from_ttl(cached))
+            return fut
+
+        async def job():
+            ttl = await ping_ttl_async(ip, self._sem, self.timeout)
+            self.cache.set(self._key(ip, mac), ttl)
+            return guess_os_from_ttl(ttl)
+
+        return asyncio.run_coroutine_threadsafe(job(), self._loop)
+
+    def detect(self, ip: str, mac: Optional[str] = None) -> Dict[str, Optional[object]]:
+        return self.submit(ip, mac).result()
+
+    def detect_many(self, hosts: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, Dict]:
+        """Lot (ip, mac) -> { ip: os_info }, pings lancés en parallèle."""
+        futures = {ip: self.submit(ip, mac) for ip, mac in hosts}
+        return {ip: f.result() for ip, f in futures.items()}
+
+    def close(self):
+        self.cache.save()
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+
+_detector: Optional[OsDetector] = None
+_detector_lock = threading.Lock()
+
+def get_detector() -> OsDetector:
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = OsDetector()
+    return _detector
+
+def close_detector():
+    """Ferme le détecteur partagé (cache sauvegardé) ; le prochain get_detector() en recrée un."""
+    global _detector
+    with _detector_lock:
+        detector, _detector = _detector, None
+    if detector is not None:
+        detector.close()
+
+def detect_os(ip: str, mac: Optional[str] = None) -> Dict[str, Optional[object]]:
+    """
+    Ping l'hôte (1 echo, timeout court) et déduit le TTL -> heuristique OS.
+    Les pings passent par le détecteur partagé (concurrence bornée, cache ip|mac).
+    Retourne: { "ttl": int|None, "os_guess": "..."}.
+    """
+    return get_detector().detect(ip, mac)
+
+def detect_os_blocking(ip: str, timeout: float = PING_TIMEOUT) -> Dict[str, Optional[object]]:
+    """Variante sans boucle ni cache (un ping subprocess synchrone)."""
+    try:
+        p = subprocess.run(ping_command(ip, timeout), capture_output=True, text=True,
+                           check=False, timeout=timeout + 1.0)
+        ttl = parse_ping_ttl(p.stdout)
+    except Exception:
+        ttl = None
+    return guess_os_from_ttl(ttl)
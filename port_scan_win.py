@@ -57,18 +57,44 @@
 # port_scan_win.py
 import socket
 import time
+import asyncio
+import threading
 import concurrent.futures
 import json
 import os
-import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Callable, Tuple
+try:
+    import resource
+except Exception:
+    resource = None
+
+from timing import HOST_TIMINGS
+from rate_limit import RATE_LIMITER
+from scan_metrics import METRICS
+from scan_reporter import REPORTER
+from vuln_match import get_matcher
+from result_store import HostServices
+from ports import order_by_frequency
+from service_probes import identify_service, identify_service_async, service_label
 
 CONNECT_TIMEOUT = 2.0
+# temps max passé à identifier un port ouvert (toutes probes confondues)
 BANNER_TIMEOUT = 2.0
 MAX_WORKERS = 100
+# timeouts de connect estimés par hôte (SRTT/RTTVAR) ; CONNECT_TIMEOUT devient le plafond
+ADAPTIVE_TIMEOUT = True
+# retransmissions pour un port qui expire avec un timeout adaptatif (< CONNECT_TIMEOUT)
+CONNECT_RETRIES = 1
+# moteur asyncio : budget global de sockets en vol (tous hôtes confondus)
+ASYNC_MAX_SOCKETS = 2000
+# nombre max de coroutines actives par hôte (évite 65k tâches pour un scan complet)
+ASYNC_HOST_CONCURRENCY = 1000
+
+VULN_DB_FILE = "vuln_db.json"
+# index binaire (build-vuln-index) : préféré au JSON s'il existe
+VULN_INDEX_FILE = "vuln_db.idx"
 
-# charger DB vuln une seule fois
-def load_vuln_db(path="vuln_db.json") -> Dict:
+def load_vuln_db(path=VULN_DB_FILE) -> Dict:
     if os.path.exists(path):
         try:
             with open(path, "r", encoding="utf-8") as f:
@@ -77,79 +103,335 @@ def load_vuln_db(path="vuln_db.json") -> Dict:
             return {}
     return {}
 
-VULN_DB = load_vuln_db()
+# DB vuln chargée une seule fois, au premier port identifié (pas à l'import) :
+# l'index VULN_INDEX_FILE (mmap) s'il existe, sinon le JSON
+_vuln_db = None
+_vuln_db_lock = threading.Lock()
+
+def get_vuln_db():
+    global _vuln_db
+    if _vuln_db is None:
+        with _vuln_db_lock:
+            if _vuln_db is None:
+                index = None
+                if os.path.exists(VULN_INDEX_FILE):
+                    from vuln_index import open_index
+                    index = open_index(VULN_INDEX_FILE)
+                _vuln_db = index if index is not None else load_vuln_db()
+    return _vuln_db
+
+def __getattr__(name):
+    # compatibilité : port_scan_win.VULN_DB reste disponible, chargé à la demande
+    if name == "VULN_DB":
+        return get_vuln_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def check_vulns_from_banner(banner: Optional[str], vuln_db: Dict) -> Optional[List[Dict]]:
-    if not banner or not vuln_db:
+def check_vulns_from_banner(banner: Optional[str], vuln_db,
+                            service: Optional[Dict] = None) -> Optional[List[Dict]]:
+    """
+    Vulns connues pour un port (matcher compilé une fois par DB, cache par bannière).
+    Si les probes ont identifié produit + version, on les ajoute aux correspondances de
+    la bannière brute, qui peut citer d'autres composants (ex. "Apache/2.4.49 OpenSSL/1.0.2k").
+    """
+    if not vuln_db:
         return None
-    found = []
-    for product, info in vuln_db.items():
-        if product.lower() in banner.lower():
-            vers = re.findall(r"(\d+\.\d+(?:\.\d+)*)", banner)
-            for v in vers:
-                for vv in info.get("vulnerable_versions", []):
-                    if v.startswith(vv):
-                        found.append({"product": product, "version": v, "notes": info.get("notes")})
-    return found if found else None
-
-def grab_banner(sock: socket.socket, ip: str, port: int) -> Optional[str]:
-    banner = ""
-    sock.settimeout(BANNER_TIMEOUT)
-    try:
-        if port in (80, 8080, 8000, 443):
-            try:
-                sock.sendall(b"HEAD / HTTP/1.0\r\nHost: local\r\n\r\n")
-            except Exception:
-                pass
-        data = sock.recv(1024)
-        if data:
-            banner = data.decode(errors='ignore').strip()
-    except Exception:
-        pass
-    return banner or None
+    with METRICS.timer("vuln_match"):
+        matcher = get_matcher(vuln_db)
+        found = list(matcher.match(banner) or [])
+        if service and service.get("product") and service.get("version"):
+            found += matcher.match_service(service["product"], service["version"]) or []
+        if not found:
+            return None
+        # même vuln vue par le service et la bannière : une seule fois, ordre conservé
+        unique = dict.fromkeys((v["product"], v["version"], v["notes"]) for v in found)
+        return [{"product": p, "version": v, "notes": n} for p, v, n in unique]
+
+def grab_banner(sock: socket.socket, ip: str, port: int) -> Tuple[Optional[str], Optional[Dict]]:
+    """(bannière, service identifié) via les probes de service_probes."""
+    with METRICS.timer("banner"):
+        return identify_service(sock, ip, port, BANNER_TIMEOUT)
+
+def apply_banner(out: Dict, banner: Optional[str], service: Optional[Dict]):
+    """Bannière / service identifiés et vulns correspondantes dans le résultat `out` (TCP et UDP)."""
+    if banner:
+        out["banner"] = banner
+    if service:
+        out["service"] = service
+    if banner or service:
+        out["vulns"] = check_vulns_from_banner(banner, get_vuln_db(), service)
+
+def configure_timing(timeout: Optional[float] = None, retries: Optional[int] = None,
+                     adaptive: Optional[bool] = None, min_rtt_timeout: Optional[float] = None):
+    """Règle timeouts/retransmissions du module (CLI, workers de shards)."""
+    global CONNECT_TIMEOUT, CONNECT_RETRIES, ADAPTIVE_TIMEOUT
+    if timeout is not None:
+        CONNECT_TIMEOUT = timeout
+    if retries is not None:
+        CONNECT_RETRIES = max(0, retries)
+    if adaptive is not None:
+        ADAPTIVE_TIMEOUT = adaptive
+    HOST_TIMINGS.configure(min_timeout=min_rtt_timeout, max_timeout=timeout)
+
+def connect_timeout(ip: str, attempt: int = 0) -> float:
+    """Timeout de connect pour `ip` : estimé depuis les RTT observés si ADAPTIVE_TIMEOUT."""
+    if not ADAPTIVE_TIMEOUT:
+        return CONNECT_TIMEOUT
+    return min(CONNECT_TIMEOUT, HOST_TIMINGS.timeout(ip, attempt))
 
 def scan_port(ip: str, port: int) -> Dict:
     out = {"ip": ip, "port": port, "state": "closed", "banner": None, "rtt_ms": None, "vulns": None}
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(CONNECT_TIMEOUT)
-        start = time.time()
-        s.connect((ip, port))
-        out["state"] = "open"
-        out["rtt_ms"] = round((time.time() - start) * 1000, 2)
+    for attempt in range(CONNECT_RETRIES + 1):
+        timeout = connect_timeout(ip, attempt)
+        RATE_LIMITER.acquire()
+        METRICS.inc("connects")
+        METRICS.gauge_add("sockets_in_flight", 1)
+        s = None
         try:
-            b = grab_banner(s, ip, port)
-            if b:
-                out["banner"] = b
-                # check vuln
-                out["vulns"] = check_vulns_from_banner(b, VULN_DB)
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.settimeout(timeout)
+            start = time.time()
+            s.connect((ip, port))
+            elapsed = time.time() - start
+            HOST_TIMINGS.observe(ip, elapsed)
+            RATE_LIMITER.record(True)
+            METRICS.inc("connect_open")
+            METRICS.observe("connect", elapsed)
+            out["state"] = "open"
+            out["rtt_ms"] = round(elapsed * 1000, 2)
+            apply_banner(out, *grab_banner(s, ip, port))
+        except socket.timeout:
+            out["state"] = "filtered"
+            RATE_LIMITER.record(False)
+            METRICS.inc("connect_timeouts")
+            # retransmission seulement si le timeout n'était pas déjà au maximum
+            if timeout < CONNECT_TIMEOUT:
+                continue
+        except ConnectionRefusedError:
+            # un RST est aussi un échantillon de RTT
+            HOST_TIMINGS.observe(ip, time.time() - start)
+            RATE_LIMITER.record(True)
+            METRICS.inc("connect_refused")
+            METRICS.observe("connect", time.time() - start)
+            out["state"] = "closed"
+        except Exception as e:
+            out["state"] = "error"
+            out["error"] = str(e)
+            METRICS.inc("connect_errors")
         finally:
-            s.close()
-    except socket.timeout:
-        out["state"] = "filtered"
-    except ConnectionRefusedError:
-        out["state"] = "closed"
-    except Exception as e:
-        out["state"] = "error"
-        out["error"] = str(e)
+            METRICS.gauge_add("sockets_in_flight", -1)
+            if s:
+                s.close()
+        break
     return out
 
-def scan_host_ports(ip: str, ports: List[int], realtime_print: bool = True) -> List[Dict]:
+def scan_host_ports(ip: str, ports: List[int], realtime_print: bool = True,
+                    on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
     """
     Scanne les ports et affiche uniquement les ports ouverts (avec bannières/vulns).
-    Retourne la liste complète des services (open/closed/filtered).
+    Retourne tous les services (open/closed/filtered) dans un HostServices compact
+    (ports fermés repliés en plages).
+    on_result est appelé pour chaque port terminé (journal, export...).
     """
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+    results = HostServices(ip)
+    # les ports les plus souvent ouverts partent (et sont rapportés) en premier
+    ports = order_by_frequency(ports)
+    with METRICS.timer("port_scan"), concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
         futures = {ex.submit(scan_port, ip, p): p for p in ports}
         for fut in concurrent.futures.as_completed(futures):
             r = fut.result()
-            results.append(r)
+            results.add(r)
+            if on_result:
+                on_result(r)
             # n'affiche que les ports ouverts
-            if realtime_print and r.get("state") == "open":
-                snippet = (r.get("banner") or "")[:100]
-                print(f"  -> {ip}:{r['port']} OPEN  {('banner: '+snippet) if snippet else ''}")
-                if r.get("vulns"):
-                    for v in r["vulns"]:
-                        print(f"     !!! VULN: {v['product']} {v['version']} — {v.get('notes')}")
-    return results
+            report_result(r, realtime_print)
+    return results.compact()
+
+def report_result(r: Dict, realtime_print: bool = True):
+    """Port terminé : compté pour la progression ; les ports ouverts partent au reporter."""
+    METRICS.inc("ports_done")
+    if not realtime_print or r.get("state") != "open":
+        return
+    snippet = (r.get("banner") or "").splitlines()[0][:100] if r.get("banner") else ""
+    REPORTER.emit("port_open", ip=r["ip"], port=r["port"], service=service_label(r.get("service")),
+                  banner=snippet, vulns=r.get("vulns"))
+
+# ---------------------------------------------------------------------------
+# Moteur asyncio (connect non bloquant) — mêmes dicts résultat que scan_port
+# ---------------------------------------------------------------------------
+
+def raise_nofile_limit(wanted: int) -> int:
+    """Monte la limite soft de descripteurs (Unix) pour tenir `wanted` sockets. Retourne la limite effective."""
+    if resource is None:
+        return wanted
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted + 64
+        if hard != resource.RLIM_INFINITY:
+            target = min(target, hard)
+        if soft != resource.RLIM_INFINITY and soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        return max(1, soft - 64) if soft != resource.RLIM_INFINITY else wanted
+    except Exception:
+        return wanted
+
+async def _grab_banner_async(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                             ip: str, port: int) -> Tuple[Optional[str], Optional[Dict]]:
+    with METRICS.timer("banner"):
+        return await identify_service_async(reader, writer, ip, port, BANNER_TIMEOUT)
+
+async def scan_port_async(ip: str, port: int, sem: Optional[asyncio.Semaphore] = None) -> Dict:
+    """Équivalent non bloquant de scan_port ; `sem` borne le nombre de sockets en vol."""
+    if sem is None:
+        return await _scan_port_async(ip, port)
+    async with sem:
+        return await _scan_port_async(ip, port)
+
+async def _scan_port_async(ip: str, port: int) -> Dict:
+    out = {"ip": ip, "port": port, "state": "closed", "banner": None, "rtt_ms": None, "vulns": None}
+    for attempt in range(CONNECT_RETRIES + 1):
+        timeout = connect_timeout(ip, attempt)
+        await RATE_LIMITER.acquire_async()
+        METRICS.inc("connects")
+        METRICS.gauge_add("sockets_in_flight", 1)
+        start = time.time()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        except asyncio.TimeoutError:
+            out["state"] = "filtered"
+            RATE_LIMITER.record(False)
+            METRICS.inc("connect_timeouts")
+            METRICS.gauge_add("sockets_in_flight", -1)
+            if timeout < CONNECT_TIMEOUT:
+                continue
+            return out
+        except ConnectionRefusedError:
+            HOST_TIMINGS.observe(ip, time.time() - start)
+            RATE_LIMITER.record(True)
+            METRICS.inc("connect_refused")
+            METRICS.observe("connect", time.time() - start)
+            METRICS.gauge_add("sockets_in_flight", -1)
+            out["state"] = "closed"
+            return out
+        except Exception as e:
+            out["state"] = "error"
+            out["error"] = str(e)
+            METRICS.inc("connect_errors")
+            METRICS.gauge_add("sockets_in_flight", -1)
+            return out
+        break
+    else:
+        return out
+    elapsed = time.time() - start
+    HOST_TIMINGS.observe(ip, elapsed)
+    RATE_LIMITER.record(True)
+    METRICS.inc("connect_open")
+    METRICS.observe("connect", elapsed)
+    out["state"] = "open"
+    out["rtt_ms"] = round(elapsed * 1000, 2)
+    try:
+        apply_banner(out, *await _grab_banner_async(reader, writer, ip, port))
+    finally:
+        METRICS.gauge_add("sockets_in_flight", -1)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+    return out
+
+async def scan_host_ports_async(ip: str, ports: List[int], realtime_print: bool = True,
+                                sem: Optional[asyncio.Semaphore] = None,
+                                on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
+    """
+    Version asyncio de scan_host_ports. Passer le même `sem` à plusieurs appels
+    concurrents pour partager un budget global de sockets entre hôtes.
+    """
+    if sem is None:
+        sem = asyncio.Semaphore(ASYNC_MAX_SOCKETS)
+    results = HostServices(ip)
+    ports = order_by_frequency(ports)
+    it = iter(ports)
+
+    async def worker():
+        for p in it:
+            r = await scan_port_async(ip, p, sem)
+            results.add(r)
+            if on_result:
+                on_result(r)
+            report_result(r, realtime_print)
+
+    n = min(len(ports), ASYNC_HOST_CONCURRENCY)
+    with METRICS.timer("port_scan"):
+        await asyncio.gather(*(worker() for _ in range(n)))
+    return results.compact()
+
+async def scan_many_async(hosts: Iterable[str], ports: List[int], max_sockets: int = ASYNC_MAX_SOCKETS,
+                          realtime_print: bool = True) -> Dict[str, HostServices]:
+    """
+    Scanne plusieurs hôtes en parallèle sous un seul budget de `max_sockets` connexions.
+    Retourne { ip: HostServices } (itère les mêmes dicts que scan_port).
+    """
+    max_sockets = raise_nofile_limit(max_sockets)
+    results: Dict[str, HostServices] = {}
+    ports = order_by_frequency(ports)
+    units = ((ip, p) for ip in hosts for p in ports)
+
+    async def worker():
+        for ip, p in units:
+            r = await scan_port_async(ip, p)
+            if ip not in results:
+                results[ip] = HostServices(ip)
+            results[ip].add(r)
+            report_result(r, realtime_print)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, max_sockets))))
+    return {ip: r.compact() for ip, r in results.items()}
+
+def scan_many(hosts: Iterable[str], ports: List[int], max_sockets: int = ASYNC_MAX_SOCKETS,
+              realtime_print: bool = True) -> Dict[str, HostServices]:
+    """Point d'entrée synchrone de scan_many_async."""
+    return asyncio.run(scan_many_async(hosts, ports, max_sockets, realtime_print))
+
+class AsyncScanEngine:
+    """
+    Boucle asyncio dans un thread dédié, avec un budget global de sockets.
+    `scan_host_ports` a la même signature que la version threadée et peut être
+    appelée depuis plusieurs threads : toutes les connexions partagent le budget.
+    """
+
+    def __init__(self, max_sockets: int = ASYNC_MAX_SOCKETS):
+        self.max_sockets = raise_nofile_limit(max_sockets)
+        self._loop = asyncio.new_event_loop()
+        self._sem = None
+        self._thread = threading.Thread(target=self._run, name="async-scan", daemon=True)
+        self._ready = threading.Event()
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._sem = asyncio.Semaphore(self.max_sockets)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, ip: str, ports: List[int], realtime_print: bool = True,
+               on_result: Optional[Callable[[Dict], None]] = None) -> concurrent.futures.Future:
+        coro = scan_host_ports_async(ip, ports, realtime_print, self._sem, on_result)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def scan_host_ports(self, ip: str, ports: List[int], realtime_print: bool = True,
+                        on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
+        return self.submit(ip, ports, realtime_print, on_result).result()
+
+    def close(self):
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,68 @@
+# ports.py
+"""
+Syntaxe des ports (22,80,1-1024,8000-8100 ; "-" ou "all" = 1-65535),
+table de fréquence embarquée (port_frequency.json) pour --top-ports et
+ordonnancement des ports du plus probable au moins probable.
+"""
+import json
+import os
+from typing import Dict, Iterable, List
+
+FREQUENCY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "port_frequency.json")
+MAX_PORT = 65535
+
+_freq: Dict[str, List[int]] = {}
+_rank: Dict[str, Dict[int, int]] = {}
+
+def parse_ports(spec: str) -> List[int]:
+    """'22,80,1-1024' -> liste sans doublons (ordre d'apparition). ValueError si invalide."""
+    spec = (spec or "").strip()
+    if spec in ("-", "all"):
+        return list(range(1, MAX_PORT + 1))
+    out: List[int] = []
+    seen = set()
+    for tok in spec.split(","):
+        tok = tok.strip()
+        if not tok:
+            continue
+        if "-" in tok:
+            lo, hi = tok.split("-", 1)
+            a = int(lo) if lo.strip() else 1
+            b = int(hi) if hi.strip() else MAX_PORT
+        else:
+            a = b = int(tok)
+        if not (1 <= a <= b <= MAX_PORT):
+            raise ValueError(f"port(s) invalide(s): {tok}")
+        for p in range(a, b + 1):
+            if p not in seen:
+                seen.add(p)
+                out.append(p)
+    if not out:
+        raise ValueError("aucun port")
+    return out
+
+def frequency_table(proto: str = "tcp") -> List[int]:
+    if proto not in _freq:
+        try:
+            with open(FREQUENCY_FILE, "r", encoding="utf-8") as f:
+                _freq[proto] = [int(p) for p in json.load(f).get(proto, [])]
+        except Exception:
+            _freq[proto] = []
+    return _freq[proto]
+
+def top_ports(n: int, proto: str = "tcp") -> List[int]:
+    """Les n ports les plus fréquents ; complétés par ordre numérique au-delà de la table."""
+    table = frequency_table(proto)
+    out = table[:n]
+    if len(out) < n:
+        known = set(out)
+        out += [p for p in range(1, MAX_PORT + 1) if p not in known][:n - len(out)]
+    return out
+
+def order_by_frequency(ports: Iterable[int], proto: str = "tcp") -> List[int]:
+    """Trie les ports du plus au moins fréquent ; les ports absents de la table suivent, en ordre numérique."""
+    if proto not in _rank:
+        _rank[proto] = {p: i for i, p in enumerate(frequency_table(proto))}
+    rank = _rank[proto]
+    unknown = len(rank)
+    return sorted(ports, key=lambda p: (rank.get(p, unknown), p))
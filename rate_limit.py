@@ -0,0 +1,98 @@
+# rate_limit.py
+"""
+Limiteur de débit global (token bucket) partagé par la découverte et le scan
+de ports : débit de probes prévisible, indépendant du RTT et du nombre de
+workers. En mode adaptatif, le débit baisse quand la part de timeouts monte
+(jamais sous min_rate) et remonte quand elle redevient faible (jamais au-dessus
+de max_rate).
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from scan_reporter import report
+
+ADAPT_WINDOW = 200          # probes observées par décision
+BACKOFF_RATIO = 0.25        # part de timeouts au-delà de laquelle on ralentit
+RECOVER_RATIO = 0.05        # en dessous, on réaccélère
+BACKOFF_FACTOR = 0.7
+RECOVER_FACTOR = 1.2
+
+class RateLimiter:
+
+    def __init__(self, max_rate: Optional[float] = None, min_rate: Optional[float] = None,
+                 burst: Optional[float] = None, adaptive: bool = False):
+        self._lock = threading.Lock()
+        self.configure(max_rate, min_rate, burst, adaptive)
+
+    def configure(self, max_rate: Optional[float] = None, min_rate: Optional[float] = None,
+                  burst: Optional[float] = None, adaptive: bool = False):
+        """max_rate=None : pas de limite (acquire ne coûte rien)."""
+        with self._lock:
+            self.max_rate = max_rate if max_rate and max_rate > 0 else None
+            self.min_rate = min_rate if min_rate and min_rate > 0 else None
+            if self.max_rate and self.min_rate and self.min_rate > self.max_rate:
+                self.min_rate = self.max_rate
+            self.rate = self.max_rate
+            self.burst = burst or (max(1.0, self.max_rate / 10) if self.max_rate else 1.0)
+            self.adaptive = adaptive and self.max_rate is not None
+            self._tokens = self.burst
+            self._last = time.monotonic()
+            self._ok = 0
+            self._timeouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate is not None
+
+    def _reserve(self, n: float) -> float:
+        """Réserve n jetons ; retourne l'attente nécessaire (s)."""
+        with self._lock:
+            rate = self.rate
+            if rate is None:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= n
+            return -self._tokens / rate if self._tokens < 0 else 0.0
+
+    def acquire(self, n: float = 1):
+        if self.rate is None:
+            return
+        wait = self._reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, n: float = 1):
+        if self.rate is None:
+            return
+        wait = self._reserve(n)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, responded: bool):
+        """Résultat d'une probe (réponse ou timeout) pour l'adaptation du débit."""
+        if not self.adaptive:
+            return
+        with self._lock:
+            if responded:
+                self._ok += 1
+            else:
+                self._timeouts += 1
+            total = self._ok + self._timeouts
+            if total < ADAPT_WINDOW:
+                return
+            ratio = self._timeouts / total
+            self._ok = self._timeouts = 0
+            old = self.rate
+            if ratio > BACKOFF_RATIO:
+                self.rate = max(self.min_rate or 1.0, self.rate * BACKOFF_FACTOR)
+            elif ratio < RECOVER_RATIO:
+                self.rate = min(self.max_rate, self.rate * RECOVER_FACTOR)
+        if self.rate != old:
+            # via le reporter : appelé depuis les workers, ne doit pas casser la ligne d'état / --events
+            report(f"[~] Débit ajusté: {old:.0f} -> {self.rate:.0f} probes/s (timeouts {ratio:.0%})")
+
+RATE_LIMITER = RateLimiter()
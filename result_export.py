@@ -27,63 +27,167 @@
 # result_export.py
 import json
 import csv
-from typing import List, Dict
+import os
+import time
+import threading
+from typing import List, Dict, Iterator
+
+from result_store import HostServices, iter_services, json_default
+from service_probes import service_label
+from scan_metrics import METRICS
 try:
     from tabulate import tabulate
 except Exception:
     tabulate = None
 
-def print_host_summary(host_obj: Dict, services: List[Dict], os_info=None):
+def print_host_summary(host_obj: Dict, services, os_info=None):
     """
     Affiche résumé pour un hôte:
       IP, MAC, Hostname, OS, puis ports ouverts / vulnérabilités
     """
+    print("\n".join(format_host_summary(host_obj, services, os_info)))
+
+def format_host_summary(host_obj: Dict, services, os_info=None) -> List[str]:
+    """Lignes du résumé d'un hôte (print_host_summary, reporter)."""
     ip = host_obj.get("ip")
-    print(f"\n=== {ip} ===")
+    lines = [f"\n=== {ip} ==="]
     if host_obj.get("mac"):
-        print(f"MAC: {host_obj.get('mac')}")
+        lines.append(f"MAC: {host_obj.get('mac')}")
     if host_obj.get("hostname"):
-        print(f"Nom: {host_obj.get('hostname')}")
+        lines.append(f"Nom: {host_obj.get('hostname')}")
     if os_info:
-        print(f"OS: {os_info.get('os_guess')} (TTL={os_info.get('ttl')})")
-    open_services = [s for s in services if s.get("state") == "open"]
+        lines.append(f"OS: {os_info.get('os_guess')} (TTL={os_info.get('ttl')})")
+    # HostServices : on ne parcourt que les ports non fermés
+    open_services = [s for s in iter_services(services, include_closed=False) if s.get("state") == "open"]
+    if isinstance(services, HostServices) and services.closed_count:
+        lines.append(f" -> {services.closed_count} port(s) fermé(s)")
     if not open_services:
-        print(" -> Aucun port ouvert détecté.")
-        return
+        lines.append(" -> Aucun port ouvert détecté.")
+        return lines
     for s in open_services:
+        label = service_label(s.get("service"))
         banner = (s.get("banner") or "")[:120]
-        print(f" -> {ip}:{s['port']} OPEN  {('banner: '+banner) if banner else ''}")
+        lines.append(f" -> {ip}:{s['port']} OPEN  {label + '  ' if label else ''}{('banner: '+banner) if banner else ''}")
         if s.get("vulns"):
             for v in s["vulns"]:
-                print(f"    !!! VULN: {v['product']} {v['version']} — {v.get('notes')}")
+                lines.append(f"    !!! VULN: {v['product']} {v['version']} — {v.get('notes')}")
+    return lines
+
+CSV_KEYS = ["ip","mac","hostname","os_guess","ttl","port","state","service","banner","vulns"]
+STREAM_FORMATS = ("ndjson", "csv")
+FLUSH_EVERY = 50        # enregistrements
+FLUSH_INTERVAL = 2.0    # secondes
+
+def csv_rows(host: Dict, skip_closed: bool = False) -> Iterator[Dict]:
+    """Lignes CSV "une ligne par service" pour un hôte."""
+    os_info = host.get("os") or {}
+    for s in iter_services(host.get("services"), include_closed=not skip_closed):
+        yield {
+            "ip": host.get("ip"),
+            "mac": host.get("mac"),
+            "hostname": host.get("hostname"),
+            "os_guess": os_info.get("os_guess"),
+            "ttl": os_info.get("ttl"),
+            "port": s.get("port"),
+            "state": s.get("state"),
+            "service": service_label(s.get("service")),
+            "banner": (s.get("banner") or "")[:200],
+            "vulns": json.dumps(s.get("vulns") or [])
+        }
+
+def host_record(host: Dict) -> Dict:
+    """Hôte avec seulement ses ports non fermés, les fermés résumés dans "closed"."""
+    services = host.get("services")
+    if isinstance(services, HostServices):
+        return {**host, **services.summary()}
+    kept = list(iter_services(services, include_closed=False))
+    return {**host, "services": kept, "closed": {"count": len(services or []) - len(kept)}}
+
+def ndjson_line(host: Dict, skip_closed: bool = False) -> str:
+    """
+    Un hôte en une ligne JSON compacte. skip_closed : seuls les ports non fermés,
+    les fermés étant résumés dans "closed": { count, ranges }.
+    """
+    if skip_closed:
+        host = host_record(host)
+    return json.dumps(host, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+
+class StreamingExporter:
+    """
+    Écrit les résultats au fil de l'eau, un enregistrement par hôte (NDJSON)
+    ou une ligne par service (CSV), avec flush régulier : la mémoire ne dépend
+    pas de la taille du scan et un run interrompu laisse un fichier exploitable.
+    """
+
+    def __init__(self, filename: str, fmt: str, skip_closed: bool = False):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"format non streamable: {fmt}")
+        self.filename = filename
+        self.fmt = fmt
+        self.skip_closed = skip_closed
+        self.hosts_written = 0
+        self._pending = 0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._f = open(filename, "w", newline="" if fmt == "csv" else None, encoding="utf-8")
+        self._writer = None
+        if fmt == "csv":
+            self._writer = csv.DictWriter(self._f, fieldnames=CSV_KEYS)
+            self._writer.writeheader()
+            self._f.flush()
+
+    def write_host(self, host: Dict):
+        with self._lock, METRICS.timer("export"):
+            if self.fmt == "ndjson":
+                self._f.write(ndjson_line(host, self.skip_closed))
+            else:
+                self._writer.writerows(csv_rows(host, self.skip_closed))
+            self.hosts_written += 1
+            self._pending += 1
+            if self._pending >= FLUSH_EVERY or time.time() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+
+    def _flush(self):
+        self._f.flush()
+        self._pending = 0
+        self._last_flush = time.time()
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._flush()
+                self._f.close()
+                METRICS.inc("exported_bytes", os.path.getsize(self.filename))
+        print(f"[+] Exporté: {self.filename} ({self.hosts_written} hôte(s))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-def export_results_flat(all_hosts: List[Dict], filename: str, fmt: str):
+def export_results_flat(all_hosts: List[Dict], filename: str, fmt: str, skip_closed: bool = False):
     """
     Exporte les résultats globaux:
     all_hosts: [ { ip, mac, hostname, os: {...}, services: [ ... ] }, ... ]
+    skip_closed : ports fermés résumés en "closed": { count, ranges } (json/ndjson) ou omis (csv),
+    au lieu d'un dict par port fermé.
     """
-    if fmt == "json":
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(all_hosts, f, ensure_ascii=False, indent=2)
-    elif fmt == "csv":
-        # Écriture CSV "une ligne par service"
-        keys = ["ip","mac","hostname","os_guess","ttl","port","state","banner","vulns"]
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            for host in all_hosts:
-                os_guess = host.get("os",{}).get("os_guess")
-                ttl = host.get("os",{}).get("ttl")
-                for s in host.get("services",[]):
-                    writer.writerow({
-                        "ip": host.get("ip"),
-                        "mac": host.get("mac"),
-                        "hostname": host.get("hostname"),
-                        "os_guess": os_guess,
-                        "ttl": ttl,
-                        "port": s.get("port"),
-                        "state": s.get("state"),
-                        "banner": (s.get("banner") or "")[:200],
-                        "vulns": json.dumps(s.get("vulns") or [])
-                    })
+    with METRICS.timer("export"):
+        if fmt == "json":
+            hosts = [host_record(h) for h in all_hosts] if skip_closed else all_hosts
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(hosts, f, ensure_ascii=False, indent=2, default=json_default)
+        elif fmt == "ndjson":
+            with open(filename, "w", encoding="utf-8") as f:
+                for host in all_hosts:
+                    f.write(ndjson_line(host, skip_closed))
+        elif fmt == "csv":
+            # Écriture CSV "une ligne par service"
+            with open(filename, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_KEYS)
+                writer.writeheader()
+                for host in all_hosts:
+                    writer.writerows(csv_rows(host, skip_closed))
+    METRICS.inc("exported_bytes", os.path.getsize(filename))
     print(f"[+] Exporté: {filename}")
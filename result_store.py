@@ -0,0 +1,199 @@
+# result_store.py
+"""
+Stockage compact des résultats de ports d'un hôte.
+Les ports non fermés sont rangés en colonnes (array port / code d'état / rtt),
+bannière, vulns et erreur seulement quand elles existent ; les ports fermés
+ne sont gardés que sous forme de plages. L'itération redonne les mêmes dicts
+que scan_port, ce qui garde compatibles affichage et exports.
+"""
+import bisect
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+STATES = ["closed", "open", "filtered", "error", "open|filtered"]
+STATE_CODES = {s: i for i, s in enumerate(STATES)}
+_CLOSED = STATE_CODES["closed"]
+_DETAIL_KEYS = ("banner", "service", "vulns", "error")
+MAX_RANGE_END = 1 << 17
+
+def _merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1] + 1:
+            if b > out[-1][1]:
+                out[-1] = (out[-1][0], b)
+        else:
+            out.append((a, b))
+    return out
+
+def format_ranges(ranges: Iterable[Tuple[int, int]]) -> str:
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def parse_ranges(text: str) -> List[Tuple[int, int]]:
+    """Inverse de format_ranges : '1-21,23' -> [(1, 21), (23, 23)]."""
+    out = []
+    for tok in (text or "").split(","):
+        tok = tok.strip()
+        if not tok:
+            continue
+        a, _, b = tok.partition("-")
+        out.append((int(a), int(b or a)))
+    return _merge_ranges(out)
+
+class HostServices:
+    """Résultats de ports d'un hôte (mêmes dicts que scan_port à l'itération)."""
+
+    __slots__ = ("ip", "_ports", "_states", "_rtts", "_details", "_closed", "_closed_ranges")
+
+    def __init__(self, ip: str, services: Iterable[Dict] = ()):
+        self.ip = ip
+        self._ports = array("H")
+        self._states = array("B")
+        self._rtts = array("f")          # NaN = pas de RTT
+        self._details: Dict[int, Dict] = {}
+        self._closed = array("H")        # tampon avant compact()
+        self._closed_ranges: List[Tuple[int, int]] = []
+        self.extend(services)
+
+    def add(self, r: Dict):
+        port = r["port"]
+        code = STATE_CODES.get(r.get("state"), STATE_CODES["error"])
+        if code == _CLOSED:
+            self._closed.append(port)
+            return
+        self._ports.append(port)
+        self._states.append(code)
+        rtt = r.get("rtt_ms")
+        self._rtts.append(math.nan if rtt is None else rtt)
+        extra = {k: r[k] for k in _DETAIL_KEYS if r.get(k) is not None}
+        if extra:
+            self._details[port] = extra
+
+    def extend(self, services: Iterable[Dict]):
+        if isinstance(services, HostServices):
+            for r in services.interesting():
+                self.add(r)
+            self._closed_ranges = _merge_ranges(self._closed_ranges + services.closed_ranges())
+            return
+        for r in services:
+            self.add(r)
+
+    def add_closed_ranges(self, ranges: Iterable[Tuple[int, int]]):
+        """Ports fermés déjà sous forme de plages (export --skip-closed relu)."""
+        self._closed_ranges = _merge_ranges(self._closed_ranges + list(ranges))
+
+    @classmethod
+    def from_export(cls, ip: str, services, closed: Optional[Dict] = None) -> "HostServices":
+        """Reconstruit depuis un export (liste de dicts, + "closed": {ranges} pour --skip-closed)."""
+        hs = cls(ip, services or [])
+        if closed and closed.get("ranges"):
+            hs.add_closed_ranges(parse_ranges(closed["ranges"]))
+        return hs.compact()
+
+    def compact(self) -> "HostServices":
+        """Replie les ports fermés en plages et libère le tampon."""
+        if self._closed:
+            self._closed_ranges = _merge_ranges(
+                self._closed_ranges + [(p, p) for p in sorted(set(self._closed))])
+            self._closed = array("H")
+        return self
+
+    # -- lecture -----------------------------------------------------------
+
+    def closed_ranges(self) -> List[Tuple[int, int]]:
+        self.compact()
+        return self._closed_ranges
+
+    @property
+    def closed_count(self) -> int:
+        return sum(b - a + 1 for a, b in self.closed_ranges())
+
+    def _record(self, i: int) -> Dict:
+        port = self._ports[i]
+        rtt = self._rtts[i]
+        d = self._details.get(port, {})
+        out = {"ip": self.ip, "port": port, "state": STATES[self._states[i]],
+               "banner": d.get("banner"), "rtt_ms": None if math.isnan(rtt) else round(rtt, 2),
+               "vulns": d.get("vulns")}
+        if "service" in d:
+            out["service"] = d["service"]
+        if "error" in d:
+            out["error"] = d["error"]
+        return out
+
+    def interesting(self) -> Iterator[Dict]:
+        """Ports non fermés seulement (open/filtered/error)."""
+        for i in range(len(self._ports)):
+            yield self._record(i)
+
+    def open_services(self) -> Iterator[Dict]:
+        code = STATE_CODES["open"]
+        for i, st in enumerate(self._states):
+            if st == code:
+                yield self._record(i)
+
+    def iter_closed(self) -> Iterator[Dict]:
+        for a, b in self.closed_ranges():
+            for p in range(a, b + 1):
+                yield {"ip": self.ip, "port": p, "state": "closed", "banner": None, "rtt_ms": None, "vulns": None}
+
+    def __iter__(self) -> Iterator[Dict]:
+        yield from self.interesting()
+        yield from self.iter_closed()
+
+    def __len__(self):
+        return len(self._ports) + self.closed_count
+
+    def is_closed(self, port: int) -> bool:
+        ranges = self.closed_ranges()
+        i = bisect.bisect_right(ranges, (port, MAX_RANGE_END)) - 1
+        return i >= 0 and ranges[i][0] <= port <= ranges[i][1]
+
+    def port_set(self) -> set:
+        ports = set(self._ports)
+        for a, b in self.closed_ranges():
+            ports.update(range(a, b + 1))
+        return ports
+
+    def get(self, port: int) -> Optional[Dict]:
+        for i, p in enumerate(self._ports):
+            if p == port:
+                return self._record(i)
+        for a, b in self.closed_ranges():
+            if a <= port <= b:
+                return {"ip": self.ip, "port": port, "state": "closed", "banner": None, "rtt_ms": None, "vulns": None}
+        return None
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+    def summary(self) -> Dict:
+        """Forme compacte pour les exports : ports intéressants + plages fermées."""
+        return {"services": list(self.interesting()),
+                "closed": {"count": self.closed_count, "ranges": format_ranges(self.closed_ranges())}}
+
+    def __getstate__(self):
+        self.compact()
+        return (self.ip, self._ports, self._states, self._rtts, self._details, self._closed_ranges)
+
+    def __setstate__(self, state):
+        self.ip, self._ports, self._states, self._rtts, self._details, self._closed_ranges = state
+        self._closed = array("H")
+
+    def __repr__(self):
+        return f"HostServices({self.ip}, {len(self._ports)} intéressant(s), {self.closed_count} fermé(s))"
+
+def iter_services(services, include_closed: bool = True) -> Iterator[Dict]:
+    """Itère des services, qu'ils soient en HostServices ou en liste de dicts."""
+    if isinstance(services, HostServices):
+        return iter(services) if include_closed else services.interesting()
+    if include_closed:
+        return iter(services or [])
+    return (s for s in services or [] if s.get("state") != "closed")
+
+def json_default(obj):
+    """Hook json.dump : HostServices -> liste complète de dicts."""
+    if isinstance(obj, HostServices):
+        return obj.to_list()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,229 @@
+# scan_baseline.py
+"""
+Rescans différentiels à partir d'exports précédents (--baseline, json/ndjson/csv) :
+  - les hôtes vivants lors des runs précédents sont sondés (sur leurs ports
+    ouverts connus) et scannés en premier, avant la découverte complète
+  - sur chaque hôte, les ports ouverts connus partent en premier
+  - les ports fermés explicitement dans au moins N baselines (et jamais vus
+    ouverts/filtrés) peuvent être sautés, ou seulement échantillonnés
+  - en fin de run : rapport de changements (nouveaux hôtes/ports, ports
+    fermés, bannières/services modifiés) par rapport à la baseline la plus récente
+Les --baseline sont donnés du plus ancien au plus récent.
+"""
+import concurrent.futures
+import csv
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from result_store import HostServices
+from service_probes import service_label
+
+PROBE_WORKERS = 200
+DEFAULT_PROBE_PORTS = (80, 443)
+
+def load_export(path: str) -> Dict[str, HostServices]:
+    """Relit un export (json, ndjson ou csv selon l'extension) en {ip: HostServices}."""
+    ext = os.path.splitext(path)[1].lower()
+    hosts: Dict[str, HostServices] = {}
+    if ext == ".csv":
+        rows: Dict[str, List[Dict]] = {}
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if not row.get("ip") or not row.get("port"):
+                    continue
+                rows.setdefault(row["ip"], []).append({
+                    "ip": row["ip"], "port": int(row["port"]), "state": row.get("state"),
+                    "banner": row.get("banner") or None,
+                    # le CSV n'a que le libellé du service (service_label) : suffisant pour comparer
+                    "service": {"name": row["service"]} if row.get("service") else None})
+        for ip, services in rows.items():
+            hosts[ip] = HostServices.from_export(ip, services)
+        return hosts
+    with open(path, "r", encoding="utf-8") as f:
+        if ext == ".ndjson":
+            entries = (json.loads(ln) for ln in f if ln.strip())
+        else:
+            entries = iter(json.load(f))
+        for h in entries:
+            ip = h.get("ip")
+            if ip:
+                hosts[ip] = HostServices.from_export(ip, h.get("services"), h.get("closed"))
+    return hosts
+
+def _label(r: Dict) -> str:
+    """Ce qui est comparé d'un run à l'autre : service identifié, sinon 1re ligne de bannière."""
+    if r.get("service"):
+        return service_label(r["service"])
+    return (r.get("banner") or "").splitlines()[0].strip() if r.get("banner") else ""
+
+class ScanBaseline:
+
+    def __init__(self, paths: List[str], skip_stable: int = 0, sample_stable: float = 0.0):
+        self.paths = paths
+        self.runs: List[Dict[str, HostServices]] = [load_export(p) for p in paths]
+        self.latest: Dict[str, HostServices] = self.runs[-1] if self.runs else {}
+        self.skip_stable = skip_stable
+        self.sample_stable = sample_stable
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._rnd = random.Random()
+        self._seen: Dict[str, Dict[int, Dict]] = {}      # ip -> {port: record non fermé}
+        self._scanned: Dict[str, set] = {}               # ip -> ports réellement scannés
+        live = set()
+        for run in self.runs:
+            live.update(run)
+        self.live = live
+        print(f"[+] Baseline: {len(paths)} run(s), {len(live)} hôte(s) connus, "
+              f"{sum(1 for h in self.latest.values() for _ in h.open_services())} port(s) ouverts au dernier run")
+
+    # -- priorités ---------------------------------------------------------
+
+    def known_open(self, ip: str) -> List[int]:
+        ports = set()
+        for run in self.runs:
+            if ip in run:
+                ports.update(r["port"] for r in run[ip].open_services())
+        return sorted(ports)
+
+    def _stable_closed(self, ip: str, port: int) -> bool:
+        """Fermé explicitement dans >= skip_stable runs, jamais ouvert/filtré."""
+        closed = 0
+        for run in self.runs:
+            hs = run.get(ip)
+            if hs is None:
+                continue
+            if hs.is_closed(port):
+                closed += 1
+            elif hs.get(port) is not None:
+                return False
+        return closed >= self.skip_stable
+
+    def plan_ports(self, ip: str, ports: List[int]) -> Tuple[List[int], List[int]]:
+        """(ports ouverts connus, reste à scanner) après saut/échantillonnage des ports stables."""
+        known = set(self.known_open(ip))
+        first = [p for p in ports if p in known]
+        rest = []
+        skipped = 0
+        for p in ports:
+            if p in known:
+                continue
+            if self.skip_stable and ip in self.live and self._stable_closed(ip, p):
+                if not self.sample_stable or self._rnd.random() >= self.sample_stable:
+                    skipped += 1
+                    continue
+            rest.append(p)
+        if skipped:
+            with self._lock:
+                self.skipped += skipped
+        return first, rest
+
+    def wrap_scan(self, scan_fn: Callable) -> Callable[..., HostServices]:
+        """scan_fn qui scanne d'abord les ports ouverts connus, puis le reste (hors ports stables)."""
+        def scan(ip: str, ports: List[int], **kwargs) -> HostServices:
+            first, rest = self.plan_ports(ip, ports)
+            with self._lock:
+                self._scanned.setdefault(ip, set()).update(first + rest)
+            results = scan_fn(ip, first, **kwargs) if first else HostServices(ip)
+            if rest:
+                results.extend(scan_fn(ip, rest, **kwargs))
+            return results.compact()
+        return scan
+
+    def source(self, targets, discover: Callable[[], Iterable[str]],
+               probe: Optional[Callable] = None) -> Iterator[str]:
+        """
+        Hôtes connus (dans `targets`) sondés sur leurs ports ouverts connus et
+        produits d'abord, puis la découverte habituelle sans doublons.
+        """
+        if probe is None:
+            from host_discovery_win import probe_host as probe
+        known = [ip for ip in sorted(self.live, key=lambda ip: tuple(int(p) for p in ip.split(".")))
+                 if ip in targets]
+        emitted = set()
+        if known:
+            print(f"  • {len(known)} hôte(s) connus sondés en premier")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_WORKERS) as ex:
+                futures = {ex.submit(probe, ip, tuple(self.known_open(ip)[:8]) or DEFAULT_PROBE_PORTS): ip
+                           for ip in known}
+                for fut in concurrent.futures.as_completed(futures):
+                    try:
+                        alive = fut.result() is not None
+                    except Exception:
+                        alive = False
+                    if alive:
+                        ip = futures[fut]
+                        emitted.add(ip)
+                        yield ip
+        for ip in discover():
+            if ip not in emitted:
+                emitted.add(ip)
+                yield ip
+
+    # -- rapport -----------------------------------------------------------
+
+    def observe_host(self, host: Dict):
+        """on_host du pipeline : garde seulement les ports non fermés de chaque hôte."""
+        services = host.get("services")
+        items = services.interesting() if isinstance(services, HostServices) else \
+            (s for s in services or [] if s.get("state") != "closed")
+        with self._lock:
+            self._seen[host["ip"]] = {r["port"]: r for r in items}
+
+    def report(self, targets=None) -> Dict:
+        """Différences avec la baseline la plus récente."""
+        new_hosts = sorted(ip for ip in self._seen if ip not in self.latest)
+        gone = sorted(ip for ip in self.latest
+                      if ip not in self._seen and (targets is None or ip in targets))
+        opened, closed, changed = [], [], []
+        unchanged = 0
+        for ip, now in self._seen.items():
+            before = self.latest.get(ip)
+            before_open = {r["port"]: r for r in before.open_services()} if before else {}
+            scanned = self._scanned.get(ip)
+            for port, r in sorted(now.items()):
+                if r.get("state") != "open":
+                    continue
+                old = before_open.get(port)
+                if old is None:
+                    opened.append({"ip": ip, "port": port, "service": _label(r)})
+                elif _label(old) != _label(r):
+                    changed.append({"ip": ip, "port": port, "before": _label(old), "after": _label(r)})
+                else:
+                    unchanged += 1
+            for port, old in sorted(before_open.items()):
+                if port in now and now[port].get("state") == "open":
+                    continue
+                if scanned is not None and port not in scanned:
+                    continue    # hors de la liste de ports de ce run
+                closed.append({"ip": ip, "port": port, "state": (now.get(port) or {}).get("state", "closed"),
+                               "was": _label(old)})
+        return {"generated": time.time(), "baselines": self.paths,
+                "new_hosts": new_hosts, "gone_hosts": gone,
+                "opened": opened, "closed": closed, "changed": changed,
+                "unchanged_open": unchanged, "skipped_stable_ports": self.skipped}
+
+def print_report(report: Dict):
+    print(f"\n=== Changements depuis {os.path.basename(report['baselines'][-1])} ===")
+    for ip in report["new_hosts"]:
+        print(f" [+] hôte {ip}")
+    for ip in report["gone_hosts"]:
+        print(f" [-] hôte {ip}")
+    for r in report["opened"]:
+        print(f" [+] {r['ip']}:{r['port']} OPEN  {r['service']}")
+    for r in report["closed"]:
+        print(f" [-] {r['ip']}:{r['port']} {r['state'].upper()}  (était: {r['was'] or '-'})")
+    for r in report["changed"]:
+        print(f" [~] {r['ip']}:{r['port']}  {r['before'] or '-'} -> {r['after'] or '-'}")
+    print(f"[+] {len(report['new_hosts'])} nouvel(s) hôte(s), {len(report['gone_hosts'])} disparu(s), "
+          f"{len(report['opened'])} port(s) ouvert(s), {len(report['closed'])} fermé(s), "
+          f"{len(report['changed'])} modifié(s), {report['unchanged_open']} inchangé(s), "
+          f"{report['skipped_stable_ports']} port(s) stables non rescannés")
+
+def write_report(report: Dict, filename: str):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[+] Rapport de changements: {filename}")
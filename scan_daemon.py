@@ -0,0 +1,487 @@
+# scan_daemon.py
+"""
+Mode démon : un processus longue durée reçoit des jobs de scan par une API
+HTTP/JSON locale (TCP sur 127.0.0.1 ou socket Unix) et garde ses caches
+chauds d'un job à l'autre (base de vulns, probes, réseau local, noms, table
+ARP, TTL/OS, RTT par hôte).
+Les jobs tournent en parallèle (max_jobs) sous un seul budget de sockets
+(moteur asyncio partagé) et un seul limiteur de débit (RATE_LIMITER).
+
+  POST   /jobs                 {"target": "10.0.0.0/24", "ports": "22,80", "top_ports": N,
+                                "discover": true, "udp": false, "stream": false}  -> 202 + job
+                               "stream": true : la réponse est directement le NDJSON des hôtes
+  GET    /jobs                 liste des jobs
+  GET    /jobs/<id>            état du job
+  GET    /jobs/<id>/results    NDJSON, un hôte par ligne ; ?follow=0 : sans attendre la fin,
+                               ?from=N : à partir du N-ième hôte
+  DELETE /jobs/<id>            annule (plus aucun nouvel hôte ; ceux en cours se terminent)
+  GET    /health, /metrics     état du démon, métriques Prometheus
+L'API lance des scans arbitraires : écoute sur la boucle locale seulement, sauf
+allow_remote, qui exige alors un jeton (en-tête "Authorization: Bearer <jeton>").
+Contre une page web du poste local (CSRF, DNS rebinding) : en-tête Host limité
+aux noms/adresses de boucle locale, POST en application/json seulement (une
+requête cross-origin doit alors passer par un preflight CORS, jamais accepté).
+"""
+import hmac
+import http.server
+import ipaddress
+import itertools
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from targets import TargetSet, split_specs
+from ports import parse_ports, top_ports
+from scan_metrics import METRICS
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+MAX_JOBS = 4                # jobs exécutés en même temps (les autres attendent)
+JOB_SCAN_WORKERS = 16       # hôtes scannés en parallèle par job
+JOB_POST_WORKERS = 8        # OS/enrichissement par job
+JOB_RETENTION = 3600        # résultats d'un job terminé gardés 1 h
+MAX_KEPT_JOBS = 200         # au-delà, les plus anciens jobs terminés sont oubliés
+MAX_JOB_ADDRESSES = 1 << 16 # cible max d'un job (les gros scans passent par le CLI)
+HOUSEKEEPING_INTERVAL = 60.0
+CACHE_SAVE_INTERVAL = 300.0
+MAX_BODY = 1 << 16
+
+FINISHED = ("done", "cancelled", "error")
+
+class Job:
+
+    def __init__(self, job_id: str, spec: Dict, targets: TargetSet, ports: List[int], discover: bool,
+                 udp: bool = False):
+        self.id = job_id
+        self.spec = spec
+        self.targets = targets
+        self.ports = ports
+        self.discover = discover
+        self.udp = udp
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.open_ports = 0
+        self.lines: List[str] = []          # un hôte NDJSON par ligne (ports fermés résumés)
+        self.cancelled = threading.Event()
+        self._cond = threading.Condition()
+
+    def add_host(self, host: Dict):
+        from result_export import ndjson_line
+        from result_store import iter_services
+        line = ndjson_line(host, skip_closed=True)
+        opened = sum(1 for s in iter_services(host.get("services"), include_closed=False) if s.get("state") == "open")
+        with self._cond:
+            self.lines.append(line)
+            self.open_ports += opened
+            self._cond.notify_all()
+
+    def set_state(self, state: str, error: Optional[str] = None):
+        with self._cond:
+            self.state = state
+            self.error = error
+            if state == "running":
+                self.started = time.time()
+            elif state in FINISHED:
+                self.finished = time.time()
+            self._cond.notify_all()
+
+    def follow(self, start: int = 0, wait: bool = True) -> Iterator[str]:
+        """Lignes NDJSON à partir de `start` ; avec `wait`, jusqu'à la fin du job."""
+        i = start
+        while True:
+            with self._cond:
+                while wait and i >= len(self.lines) and self.state not in FINISHED:
+                    self._cond.wait(1.0)
+                chunk = self.lines[i:]
+                done = self.state in FINISHED or not wait
+            yield from chunk
+            i += len(chunk)
+            if done and i >= len(self.lines):
+                return
+
+    def summary(self) -> Dict:
+        end = self.finished or time.time()
+        return {"id": self.id, "state": self.state, "error": self.error,
+                "target": self.targets.spec(), "addresses": len(self.targets), "ports": len(self.ports),
+                "discover": self.discover, "udp": self.udp, "created": self.created, "started": self.started,
+                "finished": self.finished,
+                "elapsed_s": round(end - self.started, 3) if self.started else None,
+                "hosts": len(self.lines), "open_ports": self.open_ports}
+
+class ScanDaemon:
+
+    def __init__(self, engine: str = "async", max_sockets: Optional[int] = None, max_jobs: int = MAX_JOBS,
+                 scan_workers: int = JOB_SCAN_WORKERS, post_workers: int = JOB_POST_WORKERS, udp: bool = False):
+        import port_scan_win
+        self.udp = udp
+        self.max_sockets = max_sockets or port_scan_win.ASYNC_MAX_SOCKETS
+        self.udp_engine = None
+        self.max_jobs = max(1, max_jobs)
+        self.scan_workers = max(1, scan_workers)
+        self.post_workers = max(1, post_workers)
+        self.engine = None
+        self._scan_fn = lambda ip, ports, **kw: port_scan_win.scan_host_ports(ip, ports, realtime_print=False, **kw)
+        if engine == "async":
+            # un seul moteur : tous les jobs puisent dans le même budget de sockets
+            self.engine = port_scan_win.AsyncScanEngine(self.max_sockets)
+            self._scan_fn = lambda ip, ports, **kw: self.engine.scan_host_ports(ip, ports, realtime_print=False, **kw)
+        self.jobs: Dict[str, Job] = {}
+        self.started = time.time()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_jobs)
+        self._stop = threading.Event()
+        self._housekeeper = threading.Thread(target=self._housekeeping, name="daemon-housekeeping", daemon=True)
+
+    # -- caches --------------------------------------------------------------
+
+    def warm(self):
+        """Charge tout ce qu'un run isolé rechargerait : base de vulns, probes, réseau local, table ARP."""
+        from port_scan_win import get_vuln_db
+        from service_probes import get_probes
+        from net_utils import get_primary_ip, get_netmask_for_ip
+        from host_discovery_win import NEIGHBOURS
+        get_vuln_db()
+        get_probes()
+        get_netmask_for_ip(get_primary_ip())
+        NEIGHBOURS.refresh()
+        self._housekeeper.start()
+
+    def save_caches(self):
+        from name_resolution import get_resolver
+        from os_detection import get_detector
+        for cache in (get_resolver().cache, get_detector().cache):
+            try:
+                cache.save()
+            except Exception as e:
+                print(f"[!] Sauvegarde du cache {cache.path} échouée: {e}")
+
+    def _housekeeping(self):
+        last_save = time.time()
+        while not self._stop.wait(HOUSEKEEPING_INTERVAL):
+            self.purge()
+            if time.time() - last_save >= CACHE_SAVE_INTERVAL:
+                self.save_caches()
+                last_save = time.time()
+
+    def purge(self):
+        """Oublie les jobs terminés depuis plus de JOB_RETENTION, puis les plus anciens au-delà de MAX_KEPT_JOBS."""
+        now = time.time()
+        with self._lock:
+            done = sorted((j for j in self.jobs.values() if j.state in FINISHED), key=lambda j: j.finished)
+            for j in done:
+                if now - j.finished > JOB_RETENTION or len(self.jobs) > MAX_KEPT_JOBS:
+                    del self.jobs[j.id]
+
+    # -- jobs ----------------------------------------------------------------
+
+    def submit(self, spec: Dict) -> Job:
+        """Valide la demande et démarre le job (ValueError si invalide)."""
+        if not isinstance(spec, dict):
+            raise ValueError("objet JSON attendu")
+        targets_spec = spec.get("target")
+        if not targets_spec:
+            raise ValueError("'target' obligatoire")
+        specs = targets_spec if isinstance(targets_spec, list) else split_specs(str(targets_spec))
+        exclude = spec.get("exclude") or []
+        exclude = exclude if isinstance(exclude, list) else split_specs(str(exclude))
+        try:
+            targets = TargetSet.parse(specs, exclude)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"cible invalide: {e}")
+        if not targets:
+            raise ValueError("aucune cible après exclusions")
+        if len(targets) > MAX_JOB_ADDRESSES:
+            raise ValueError(f"cible trop grande ({len(targets)} adresses > {MAX_JOB_ADDRESSES})")
+        udp = bool(spec.get("udp", self.udp))
+        if spec.get("top_ports"):
+            ports = top_ports(int(spec["top_ports"]), "udp" if udp else "tcp")
+        else:
+            p = spec.get("ports", "53,67,123,137,161,500,1900" if udp else "22,80,443,3389,3306")
+            ports = sorted(set(int(x) for x in p)) if isinstance(p, list) else parse_ports(str(p))
+        if not ports or not all(0 < x < 65536 for x in ports):
+            raise ValueError("ports invalides")
+        job = Job(f"{next(self._ids)}", spec, targets, ports, bool(spec.get("discover", True)), udp)
+        with self._lock:
+            self.jobs[job.id] = job
+        threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.id}", daemon=True).start()
+        print(f"[+] Job {job.id}: {job.targets.spec()} ({len(ports)} port(s){' UDP' if udp else ''})")
+        return job
+
+    def _source(self, job: Job) -> Iterator[str]:
+        from host_discovery_win import iter_discover_hosts
+        ips = iter_discover_hosts(job.targets) if job.discover else job.targets.iter_ips()
+        for ip in ips:
+            if job.cancelled.is_set():
+                return
+            yield ip
+
+    def _run_job(self, job: Job):
+        from scan_pipeline import run_pipeline
+        with self._slots:
+            if job.cancelled.is_set():
+                job.set_state("cancelled")
+                return
+            job.set_state("running")
+            try:
+                run_pipeline(self._source(job), job.ports, on_host=job.add_host, keep=False,
+                             scan_fn=self._udp_scan_fn() if job.udp else self._scan_fn, scan_workers=self.scan_workers,
+                             post_workers=self.post_workers)
+            except Exception as e:
+                job.set_state("error", str(e))
+                print(f"[!] Job {job.id} en erreur: {e}")
+                return
+        job.set_state("cancelled" if job.cancelled.is_set() else "done")
+        print(f"[+] Job {job.id} {job.state}: {len(job.lines)} hôte(s), {job.open_ports} port(s) ouverts")
+        # caches sur disque dès la fin du job : un arrêt brutal ne perd que le job en cours
+        self.save_caches()
+
+    def _udp_scan_fn(self):
+        """Moteur UDP créé au premier job UDP, puis partagé comme le moteur TCP."""
+        with self._lock:
+            if self.udp_engine is None:
+                from udp_scan import UdpScanEngine
+                self.udp_engine = UdpScanEngine(max_in_flight=self.max_sockets)
+        return lambda ip, ports, **kw: self.udp_engine.scan_host_ports(ip, ports, realtime_print=False, **kw)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None and job.state not in FINISHED:
+            job.cancelled.set()
+        return job
+
+    def health(self) -> Dict:
+        with self._lock:
+            states = [j.state for j in self.jobs.values()]
+        return {"status": "ok", "uptime_s": round(time.time() - self.started, 1), "max_jobs": self.max_jobs,
+                "max_sockets": self.engine.max_sockets if self.engine else None,
+                "jobs": {s: states.count(s) for s in ("queued", "running") + FINISHED}}
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for j in jobs:
+            j.cancelled.set()
+        for engine in (self.engine, self.udp_engine):
+            if engine:
+                engine.close()
+        from name_resolution import close_resolver
+        from os_detection import close_detector
+        for close in (close_resolver, close_detector):
+            try:
+                close()     # attend les lookups en vol puis sauvegarde le cache
+            except Exception as e:
+                print(f"[!] Fermeture des caches échouée: {e}")
+
+# ---------------------------------------------------------------------------
+# API HTTP
+# ---------------------------------------------------------------------------
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost" or host.endswith(".localhost"):
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _host_name(header: str) -> str:
+    """'127.0.0.1:8765' / '[::1]:8765' / 'localhost' -> nom sans port."""
+    header = header.strip().lower()
+    if header.startswith("["):
+        return header[1:].split("]", 1)[0]
+    return header.rsplit(":", 1)[0] if header.count(":") == 1 else header
+
+class DaemonHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "ScanDaemon/1"
+    daemon: ScanDaemon = None     # renseigné par make_server
+    token: Optional[str] = None
+    loopback_only = True          # en-tête Host vérifié (écoute TCP locale)
+
+    def address_string(self) -> str:
+        # socket Unix : pas d'adresse client
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, msg: str):
+        self._json(status, {"error": msg})
+
+    def _stream(self, job: Job, start: int = 0, wait: bool = True):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("X-Job-Id", job.id)
+        self.end_headers()
+        self.close_connection = True    # fin du flux = fin de la connexion
+        try:
+            for line in job.follow(start, wait):
+                self.wfile.write(line.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _authorized(self) -> bool:
+        if self.loopback_only and not is_loopback(_host_name(self.headers.get("Host") or "")):
+            # DNS rebinding : la page croit parler à son propre domaine
+            self._error(403, "en-tête Host hors boucle locale")
+            return False
+        if not self.token:
+            return True
+        got = self.headers.get("Authorization") or ""
+        if hmac.compare_digest(got.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self._error(401, "jeton manquant ou invalide")
+        return False
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return parts, query
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._json(200, self.daemon.health())
+        if parts == ["metrics"]:
+            body = METRICS.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if parts == ["jobs"]:
+            with self.daemon._lock:
+                jobs = list(self.daemon.jobs.values())
+            return self._json(200, [j.summary() for j in jobs])
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.daemon.get(parts[1])
+            if job is None:
+                return self._error(404, f"job inconnu: {parts[1]}")
+            if len(parts) == 2:
+                return self._json(200, job.summary())
+            if parts[2] == "results":
+                try:
+                    start = int(query.get("from", 0))
+                except ValueError:
+                    return self._error(400, "'from' doit être un entier")
+                return self._stream(job, start, wait=query.get("follow", "1") not in ("0", "false"))
+        self._error(404, "route inconnue")
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts, _ = self._route()
+        if parts != ["jobs"]:
+            return self._error(404, "route inconnue")
+        ctype = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+        if ctype != "application/json":
+            # text/plain & co. : requêtes cross-origin "simples", sans preflight
+            return self._error(415, "Content-Type application/json obligatoire")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return self._error(400, "Content-Length invalide")
+        if length < 0:
+            return self._error(400, "Content-Length invalide")
+        if length > MAX_BODY:
+            return self._error(413, "requête trop grande")
+        try:
+            spec = json.loads(self.rfile.read(length) or b"{}")
+            job = self.daemon.submit(spec)
+        except (ValueError, TypeError) as e:
+            return self._error(400, str(e))
+        if spec.get("stream"):
+            return self._stream(job)
+        self._json(202, job.summary())
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._error(404, "route inconnue")
+        job = self.daemon.cancel(parts[1])
+        if job is None:
+            return self._error(404, f"job inconnu: {parts[1]}")
+        self._json(200, job.summary())
+
+class _TcpServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+def make_server(daemon: ScanDaemon, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                unix_path: Optional[str] = None, token: Optional[str] = None,
+                allow_remote: bool = False):
+    if not unix_path and not is_loopback(host):
+        if not allow_remote:
+            raise ValueError(f"écoute sur {host} refusée : l'API lance des scans (--allow-remote pour forcer)")
+        if not token:
+            raise ValueError("écoute hors boucle locale : jeton obligatoire (--token)")
+    handler = type("BoundDaemonHandler", (DaemonHandler,),
+                   {"daemon": daemon, "token": token, "loopback_only": not unix_path and not allow_remote})
+    if unix_path:
+        if _UnixServer is None:
+            raise ValueError("sockets Unix non disponibles sur cette plateforme")
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        old = os.umask(0o177)   # socket accessible au seul propriétaire
+        try:
+            return _UnixServer(unix_path, handler)
+        finally:
+            os.umask(old)
+    return _TcpServer((host, port), handler)
+
+def _raise_interrupt(signum, frame):
+    # un seul arrêt : un second SIGTERM ne doit pas interrompre la sauvegarde des caches
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+def serve(daemon: ScanDaemon, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+          unix_path: Optional[str] = None, token: Optional[str] = None, allow_remote: bool = False):
+    server = make_server(daemon, host, port, unix_path, token, allow_remote)
+    if threading.current_thread() is threading.main_thread():
+        # SIGTERM (systemd, kill) : même arrêt propre que Ctrl-C, caches sauvegardés
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        daemon.warm()
+        where = unix_path or f"http://{host}:{server.server_address[1]}"
+        print(f"[+] Démon de scan à l'écoute sur {where} ({daemon.max_jobs} job(s) simultanés)")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[+] Arrêt du démon")
+    finally:
+        server.server_close()
+        daemon.close()
+        if unix_path and os.path.exists(unix_path):
+            os.unlink(unix_path)
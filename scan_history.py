@@ -0,0 +1,319 @@
+# scan_history.py
+"""
+Historique des scans en SQLite (optionnel, --history) :
+  scans    un run (début/fin, commande, cible, ports)
+  hosts    un hôte par run (ip + ip entière pour les plages, mac, nom, OS, ports fermés en plages)
+  services ports non fermés (état, rtt, service/produit/version, bannière)
+  banners  bannières dédoublonnées (une ligne par texte distinct)
+  vulns    vulnérabilités trouvées par port
+Index sur ip, port, produit et date du run ; les hôtes sont écrits par lots
+dans une transaction. query() sert la sous-commande `query` du CLI.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+
+from result_store import HostServices, format_ranges
+from targets import TargetSet, ip_to_int
+from vuln_match import VERSION_RE, compile_spec, parse_version
+
+BATCH_SIZE = 200            # hôtes par transaction
+FLUSH_INTERVAL = 5.0        # secondes
+QUERY_LIMIT = 1000
+QUERY_BATCH = 500           # lignes de services dont les vulns sont lues en une requête
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    cmd TEXT,
+    target TEXT,
+    ports TEXT
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    scan_id INTEGER NOT NULL REFERENCES scans(id),
+    ip TEXT NOT NULL,
+    ip_int INTEGER NOT NULL,
+    mac TEXT,
+    hostname TEXT,
+    os_guess TEXT,
+    ttl INTEGER,
+    closed_count INTEGER,
+    closed_ranges TEXT
+);
+CREATE TABLE IF NOT EXISTS banners (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    scan_id INTEGER NOT NULL REFERENCES scans(id),
+    host_id INTEGER NOT NULL REFERENCES hosts(id),
+    ip_int INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    rtt_ms REAL,
+    service TEXT,
+    product TEXT,
+    version TEXT,
+    banner_id INTEGER REFERENCES banners(id)
+);
+CREATE TABLE IF NOT EXISTS vulns (
+    id INTEGER PRIMARY KEY,
+    service_id INTEGER NOT NULL REFERENCES services(id),
+    scan_id INTEGER NOT NULL REFERENCES scans(id),
+    product TEXT,
+    version TEXT,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scans_started ON scans(started);
+CREATE INDEX IF NOT EXISTS idx_hosts_ip ON hosts(ip_int, scan_id);
+CREATE INDEX IF NOT EXISTS idx_hosts_scan ON hosts(scan_id);
+CREATE INDEX IF NOT EXISTS idx_services_ip_port ON services(ip_int, port);
+CREATE INDEX IF NOT EXISTS idx_services_port ON services(port);
+CREATE INDEX IF NOT EXISTS idx_services_product ON services(product COLLATE NOCASE, version);
+CREATE INDEX IF NOT EXISTS idx_services_scan ON services(scan_id);
+CREATE INDEX IF NOT EXISTS idx_vulns_service ON vulns(service_id);
+CREATE INDEX IF NOT EXISTS idx_vulns_product ON vulns(product COLLATE NOCASE);
+"""
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def connect_readonly(path: str) -> sqlite3.Connection:
+    """Lecture seule (query, list_scans) : une --db mal tapée ne crée pas de base vide."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"base d'historique introuvable: {path}")
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(path)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+class HistoryWriter:
+    """Même interface que StreamingExporter (write_host/close) ; un run = une ligne de `scans`."""
+
+    def __init__(self, path: str, meta: Optional[Dict] = None):
+        self.path = path
+        self.conn = connect(path)
+        self.hosts_written = 0
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._last_flush = time.time()
+        meta = meta or {}
+        ports = meta.get("ports")
+        cur = self.conn.execute(
+            "INSERT INTO scans(started, cmd, target, ports) VALUES (?, ?, ?, ?)",
+            (time.time(), meta.get("cmd"), meta.get("target"),
+             format_ranges(_to_ranges(ports)) if ports else None))
+        self.conn.commit()
+        self.scan_id = cur.lastrowid
+
+    def write_host(self, host: Dict):
+        with self._lock:
+            self._pending.append(host)
+            if len(self._pending) >= BATCH_SIZE or time.time() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+
+    def _banner_id(self, text: Optional[str]) -> Optional[int]:
+        if not text:
+            return None
+        digest = hashlib.sha1(text.encode("utf-8", "ignore")).hexdigest()
+        self.conn.execute("INSERT OR IGNORE INTO banners(digest, text) VALUES (?, ?)", (digest, text))
+        return self.conn.execute("SELECT id FROM banners WHERE digest = ?", (digest,)).fetchone()[0]
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self.conn:
+            for h in self._pending:
+                self._insert_host(h)
+        self.hosts_written += len(self._pending)
+        self._pending = []
+        self._last_flush = time.time()
+
+    def _insert_host(self, h: Dict):
+        ip = h["ip"]
+        ip_int = ip_to_int(ip)
+        os_info = h.get("os") or {}
+        services = h.get("services")
+        if not isinstance(services, HostServices):
+            services = HostServices(ip, services or [])
+        cur = self.conn.execute(
+            "INSERT INTO hosts(scan_id, ip, ip_int, mac, hostname, os_guess, ttl, closed_count, closed_ranges) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.scan_id, ip, ip_int, h.get("mac"), h.get("hostname"), os_info.get("os_guess"),
+             os_info.get("ttl"), services.closed_count, format_ranges(services.closed_ranges())))
+        host_id = cur.lastrowid
+        for s in services.interesting():
+            svc = s.get("service") or {}
+            cur = self.conn.execute(
+                "INSERT INTO services(scan_id, host_id, ip_int, port, state, rtt_ms, service, product, version, banner_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.scan_id, host_id, ip_int, s["port"], s.get("state"), s.get("rtt_ms"),
+                 svc.get("name"), svc.get("product"), svc.get("version"), self._banner_id(s.get("banner"))))
+            service_id = cur.lastrowid
+            for v in s.get("vulns") or []:
+                self.conn.execute(
+                    "INSERT INTO vulns(service_id, scan_id, product, version, notes) VALUES (?, ?, ?, ?, ?)",
+                    (service_id, self.scan_id, v.get("product"), v.get("version"), v.get("notes")))
+
+    def close(self):
+        with self._lock:
+            if self.conn is None:
+                return
+            self._flush()
+            with self.conn:
+                self.conn.execute("UPDATE scans SET finished = ? WHERE id = ?", (time.time(), self.scan_id))
+            self.conn.close()
+            self.conn = None
+        print(f"[+] Historique: {self.path} (run #{self.scan_id}, {self.hosts_written} hôte(s))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _to_ranges(ports: List[int]):
+    out = []
+    for p in sorted(set(ports)):
+        if out and p == out[-1][1] + 1:
+            out[-1] = (out[-1][0], p)
+        else:
+            out.append((p, p))
+    return out
+
+# ---------------------------------------------------------------------------
+# Requêtes
+# ---------------------------------------------------------------------------
+
+_AGE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw])$")
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_when(text: str) -> float:
+    """'30d', '12h' (il y a...) ou date 'YYYY-MM-DD[ HH:MM]' -> timestamp. ValueError sinon."""
+    text = text.strip()
+    m = _AGE_RE.match(text)
+    if m:
+        return time.time() - float(m.group(1)) * _AGE_UNITS[m.group(2)]
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"date invalide: {text}")
+
+def query(path: str, ip: Optional[str] = None, ports: Optional[List[int]] = None,
+          product: Optional[str] = None, version: Optional[str] = None,
+          service: Optional[str] = None, banner: Optional[str] = None,
+          state: Optional[str] = "open", vulnerable: bool = False,
+          since: Optional[float] = None, until: Optional[float] = None,
+          latest: bool = False, limit: int = QUERY_LIMIT) -> Iterator[Dict]:
+    """
+    Services des runs passés correspondant aux filtres (ET), du plus récent au plus ancien.
+    `version` accepte la syntaxe des specs de vuln_match ("7.4", "<7.6", ">=2.4.49,<2.4.51").
+    """
+    where, args = [], []
+    if ip:
+        ranges = TargetSet.parse([ip]).intervals
+        where.append("(" + " OR ".join("s.ip_int BETWEEN ? AND ?" for _ in ranges) + ")")
+        for a, b in ranges:
+            args += [a, b]
+    if ports:
+        where.append(f"s.port IN ({','.join('?' * len(ports))})")
+        args += list(ports)
+    if product:
+        # préfixe insensible à la casse : utilise l'index NOCASE
+        where.append("s.product LIKE ?")
+        args.append(product.replace("%", "") + "%")
+    if service:
+        where.append("s.service = ?")
+        args.append(service)
+    if banner:
+        where.append("b.text LIKE ?")
+        args.append(f"%{banner}%")
+    if state:
+        where.append("s.state = ?")
+        args.append(state)
+    if vulnerable:
+        where.append("EXISTS (SELECT 1 FROM vulns v WHERE v.service_id = s.id)")
+    if since is not None:
+        where.append("sc.started >= ?")
+        args.append(since)
+    if until is not None:
+        where.append("sc.started <= ?")
+        args.append(until)
+    if latest:
+        where.append("h.scan_id = (SELECT MAX(h2.scan_id) FROM hosts h2 WHERE h2.ip_int = h.ip_int)")
+    sql = ("SELECT s.id, sc.id, sc.started, h.ip, h.hostname, h.os_guess, s.port, s.state, s.rtt_ms, "
+           "s.service, s.product, s.version, b.text "
+           "FROM services s JOIN hosts h ON h.id = s.host_id JOIN scans sc ON sc.id = s.scan_id "
+           "LEFT JOIN banners b ON b.id = s.banner_id")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY sc.started DESC, h.ip_int, s.port"
+
+    match_version = None
+    if version:
+        match_version = compile_spec(version)
+        if match_version is None:
+            raise ValueError(f"spec de version invalide: {version}")
+
+    conn = connect_readonly(path)
+    try:
+        cur = conn.execute(sql, args)
+        n = 0
+        while True:
+            rows = cur.fetchmany(QUERY_BATCH)
+            if not rows:
+                break
+            if match_version is not None:
+                kept = []
+                for row in rows:
+                    m = VERSION_RE.search(row[11] or "")
+                    pv = parse_version(m.group(1)) if m else None
+                    if pv is not None and match_version(pv):
+                        kept.append(row)
+                rows = kept
+            if limit:
+                rows = rows[:limit - n]
+            # vulns du lot en une requête (pas une par ligne)
+            vulns: Dict[int, List[Dict]] = {}
+            if rows:
+                ids = [r[0] for r in rows]
+                for sid, p, v, nt in conn.execute(
+                        f"SELECT service_id, product, version, notes FROM vulns "
+                        f"WHERE service_id IN ({','.join('?' * len(ids))})", ids):
+                    vulns.setdefault(sid, []).append({"product": p, "version": v, "notes": nt})
+            for sid, scan_id, started, r_ip, hostname, os_guess, port, st, rtt, svc, prod, ver, text in rows:
+                yield {"scan_id": scan_id, "scanned": started, "ip": r_ip, "hostname": hostname, "os_guess": os_guess,
+                       "port": port, "state": st, "rtt_ms": rtt, "service": svc, "product": prod, "version": ver,
+                       "banner": text, "vulns": vulns.get(sid)}
+            n += len(rows)
+            if limit and n >= limit:
+                break
+    finally:
+        conn.close()
+
+def list_scans(path: str, limit: int = 20) -> List[Dict]:
+    conn = connect_readonly(path)
+    try:
+        rows = conn.execute(
+            "SELECT sc.id, sc.started, sc.finished, sc.cmd, sc.target, "
+            "(SELECT COUNT(*) FROM hosts h WHERE h.scan_id = sc.id), "
+            "(SELECT COUNT(*) FROM services s WHERE s.scan_id = sc.id AND s.state = 'open') "
+            "FROM scans sc ORDER BY sc.started DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [{"scan_id": r[0], "started": r[1], "finished": r[2], "cmd": r[3], "target": r[4],
+             "hosts": r[5], "open_ports": r[6]} for r in rows]
@@ -0,0 +1,150 @@
+# scan_journal.py
+"""
+Journal de reprise pour les longs scans (une ligne JSON compacte par événement) :
+  ["M", {cmd, target, ports}]   métadonnées du run
+  ["H", ip]                     hôte découvert
+  ["D"]                         découverte terminée
+  ["P", service]                (ip, port) terminé (clés à None omises)
+  ["F", {ip, mac, hostname, os}] hôte terminé (scan + OS)
+Le fichier est en append : un run interrompu peut être repris avec --resume,
+qui saute le travail déjà fait et réinjecte les anciens résultats.
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from result_store import HostServices
+
+FLUSH_INTERVAL = 1.0
+
+class ScanJournal:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta: Dict = {}
+        self.discovered: List[str] = []
+        self.discovery_done = False
+        self.ports_done: Dict[str, HostServices] = {}
+        self.finished: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+        self._f = None
+
+    # -- lecture -----------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: str) -> "ScanJournal":
+        """Relit un journal existant (les lignes tronquées par un crash sont ignorées)."""
+        j = cls(path)
+        seen = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for ln in f:
+                try:
+                    rec = json.loads(ln)
+                except ValueError:
+                    continue
+                kind = rec[0]
+                if kind == "M":
+                    j.meta = rec[1]
+                elif kind == "H":
+                    if rec[1] not in seen:
+                        seen.add(rec[1])
+                        j.discovered.append(rec[1])
+                elif kind == "D":
+                    j.discovery_done = True
+                elif kind == "P":
+                    svc = rec[1]
+                    if svc["ip"] not in j.ports_done:
+                        j.ports_done[svc["ip"]] = HostServices(svc["ip"])
+                    j.ports_done[svc["ip"]].add(svc)
+                elif kind == "F":
+                    j.finished[rec[1]["ip"]] = rec[1]
+        return j
+
+    def finished_hosts(self) -> Iterator[Dict]:
+        """host_entry complets des hôtes terminés lors des runs précédents."""
+        for ip, h in self.finished.items():
+            yield {**h, "services": self.ports_done.get(ip) or HostServices(ip)}
+
+    # -- écriture ----------------------------------------------------------
+
+    def open(self, meta: Optional[Dict] = None):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        torn = False
+        if not new:
+            # dernière ligne tronquée par un crash : la suivante ne doit pas s'y coller
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._f = open(self.path, "a", encoding="utf-8")
+        if torn:
+            self._f.write("\n")
+        if meta is not None and (new or not self.meta):
+            self.meta = meta
+            self._write(["M", meta], flush=True)
+        return self
+
+    def _write(self, rec, flush: bool = False):
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            if flush or time.time() - self._last_flush >= FLUSH_INTERVAL:
+                self._f.flush()
+                self._last_flush = time.time()
+
+    def record_discovered(self, ip: str):
+        self._write(["H", ip])
+
+    def record_discovery_done(self):
+        self._write(["D"], flush=True)
+
+    def record_port(self, service: Dict):
+        self._write(["P", {k: v for k, v in service.items() if v is not None}])
+
+    def record_host(self, host_entry: Dict):
+        self._write(["F", {k: host_entry.get(k) for k in ("ip", "mac", "hostname", "os")}], flush=True)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.flush()
+                self._f.close()
+                self._f = None
+
+    # -- reprise -----------------------------------------------------------
+
+    def source(self, discover: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        Source d'IP pour le pipeline : hôtes déjà découverts mais non terminés,
+        puis la découverte (relancée seulement si elle n'était pas finie).
+        """
+        emitted = set(self.finished)
+        for ip in self.discovered:
+            if ip not in emitted:
+                emitted.add(ip)
+                yield ip
+        if self.discovery_done:
+            return
+        for ip in discover():
+            if ip in emitted:
+                continue
+            emitted.add(ip)
+            self.record_discovered(ip)
+            yield ip
+        self.record_discovery_done()
+
+    def wrap_scan(self, scan_fn: Callable) -> Callable[[str, List[int]], HostServices]:
+        """scan_fn qui ne scanne que les ports restants, journalise chaque port et fusionne l'ancien."""
+        def scan(ip: str, ports: List[int]) -> HostServices:
+            done = self.ports_done.pop(ip, None)
+            if done is None:
+                return scan_fn(ip, ports, on_result=self.record_port)
+            done_ports = done.port_set()
+            remaining = [p for p in ports if p not in done_ports]
+            if remaining:
+                done.extend(scan_fn(ip, remaining, on_result=self.record_port))
+            return done.compact()
+        return scan
@@ -0,0 +1,305 @@
+# scan_metrics.py
+"""
+Instrumentation du scan : compteurs, jauges (valeur + max atteint) et
+histogrammes de durée par phase (discovery, connect, banner, port_scan,
+enrich, os_detect, ping, vuln_match, export...).
+Registre global METRICS, thread-safe, exporté :
+  - en résumé JSON en fin de run (--metrics)
+  - en fichier texte Prometheus rafraîchi périodiquement (--prometheus)
+Les workers de shards renvoient un snapshot() que le parent fusionne (merge).
+ScanProfiler enveloppe le run dans cProfile, threads compris (--profile).
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# bornes des histogrammes (s) ; la dernière case est +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROM_INTERVAL = 10.0
+PROM_PREFIX = "scan_"
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, v: float):
+        i = 0
+        while i < len(BUCKETS) and v > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimation par la borne haute de la case (None si vide)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_raw(self) -> List:
+        return [list(self.counts), self.sum, self.count, self.max]
+
+    def merge_raw(self, raw: List):
+        counts, s, n, mx = raw
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += s
+        self.count += n
+        self.max = max(self.max, mx)
+
+class _Timer:
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics: "Metrics", phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.phase, time.perf_counter() - self.start)
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[str, float] = {}
+            self.gauges: Dict[str, List[float]] = {}     # nom -> [valeur, max]
+            self.phases: Dict[str, Histogram] = {}
+
+    # -- enregistrement ----------------------------------------------------
+
+    def inc(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge_add(self, name: str, delta: float):
+        with self._lock:
+            g = self.gauges.setdefault(name, [0, 0])
+            g[0] += delta
+            if g[0] > g[1]:
+                g[1] = g[0]
+
+    def gauge_set(self, name: str, value: float):
+        with self._lock:
+            g = self.gauges.setdefault(name, [0, 0])
+            g[0] = value
+            if value > g[1]:
+                g[1] = value
+
+    def observe(self, phase: str, seconds: float):
+        with self._lock:
+            h = self.phases.get(phase)
+            if h is None:
+                h = self.phases[phase] = Histogram()
+            h.observe(seconds)
+
+    def timer(self, phase: str) -> _Timer:
+        """with METRICS.timer("banner"): ..."""
+        return _Timer(self, phase)
+
+    # -- shards ------------------------------------------------------------
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "gauges": {k: list(v) for k, v in self.gauges.items()},
+                    "phases": {k: h.to_raw() for k, h in self.phases.items()}}
+
+    def merge(self, snap: Dict):
+        """Ajoute le snapshot d'un autre processus (compteurs et histogrammes cumulés)."""
+        with self._lock:
+            for k, v in snap.get("counters", {}).items():
+                self.counters[k] = self.counters.get(k, 0) + v
+            for k, (value, mx) in snap.get("gauges", {}).items():
+                g = self.gauges.setdefault(k, [0, 0])
+                g[0] += value
+                g[1] = max(g[1], mx)
+            for k, raw in snap.get("phases", {}).items():
+                self.phases.setdefault(k, Histogram()).merge_raw(raw)
+
+    # -- export ------------------------------------------------------------
+
+    def summary(self) -> Dict:
+        with self._lock:
+            elapsed = max(1e-9, time.time() - self.started)
+            phases = {}
+            for name, h in sorted(self.phases.items()):
+                phases[name] = {
+                    "count": h.count, "sum_s": round(h.sum, 4),
+                    "mean_s": round(h.sum / h.count, 6) if h.count else None,
+                    "p50_s": h.quantile(0.5), "p95_s": h.quantile(0.95), "max_s": round(h.max, 4),
+                    "buckets": {str(b): c for b, c in zip(list(BUCKETS) + ["+Inf"], h.counts)},
+                }
+            return {
+                "started": self.started,
+                "elapsed_s": round(elapsed, 3),
+                "counters": dict(sorted(self.counters.items())),
+                "rates_per_s": {k: round(v / elapsed, 2) for k, v in sorted(self.counters.items())},
+                "gauges": {k: {"value": v, "max": m} for k, (v, m) in sorted(self.gauges.items())},
+                "phases": phases,
+            }
+
+    def write_json(self, path: str):
+        _atomic_write(path, json.dumps(self.summary(), indent=2, ensure_ascii=False) + "\n")
+        print(f"[+] Métriques: {path}")
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            lines = []
+            for k, v in sorted(self.counters.items()):
+                name = f"{PROM_PREFIX}{k}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {v}"]
+            for k, (v, mx) in sorted(self.gauges.items()):
+                name = f"{PROM_PREFIX}{k}"
+                lines += [f"# TYPE {name} gauge", f"{name} {v}",
+                          f"# TYPE {name}_max gauge", f"{name}_max {mx}"]
+            if self.phases:
+                name = f"{PROM_PREFIX}phase_seconds"
+                lines.append(f"# TYPE {name} histogram")
+                for phase, h in sorted(self.phases.items()):
+                    cum = 0
+                    for b, c in zip(list(BUCKETS) + ["+Inf"], h.counts):
+                        cum += c
+                        lines.append(f'{name}_bucket{{phase="{phase}",le="{b}"}} {cum}')
+                    lines.append(f'{name}_sum{{phase="{phase}"}} {h.sum}')
+                    lines.append(f'{name}_count{{phase="{phase}"}} {h.count}')
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        _atomic_write(path, self.prometheus_text())
+
+    def start_prometheus(self, path: str, interval: float = PROM_INTERVAL) -> "PrometheusFile":
+        return PrometheusFile(self, path, interval).start()
+
+    def print_summary(self):
+        """Résumé court en fin de run : compteurs principaux et temps par phase."""
+        s = self.summary()
+        c = s["counters"]
+        print(f"\n[+] {s['elapsed_s']}s — connects {c.get('connects', 0):.0f} "
+              f"({s['rates_per_s'].get('connects', 0)}/s), open {c.get('connect_open', 0):.0f}, "
+              f"refusés {c.get('connect_refused', 0):.0f}, timeouts {c.get('connect_timeouts', 0):.0f}")
+        if c.get("syn_sent"):
+            print(f"    SYN: envoyés {c['syn_sent']:.0f} ({s['rates_per_s'].get('syn_sent', 0)}/s), "
+                  f"open {c.get('syn_open', 0):.0f}, closed {c.get('syn_closed', 0):.0f}, "
+                  f"filtered {c.get('syn_filtered', 0):.0f}")
+        if c.get("udp_probes"):
+            print(f"    UDP: probes {c['udp_probes']:.0f} ({s['rates_per_s'].get('udp_probes', 0)}/s), "
+                  f"réponses {c.get('udp_responses', 0):.0f}, ICMP {c.get('udp_icmp', 0):.0f}, "
+                  f"sans réponse {c.get('udp_timeouts', 0):.0f}")
+        for name, p in s["phases"].items():
+            print(f"    {name:<16} n={p['count']:<7} total={p['sum_s']:.2f}s  p50≤{p['p50_s']}s  p95≤{p['p95_s']}s")
+
+def _atomic_write(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+class PrometheusFile:
+    """Réécrit le fichier Prometheus (textfile collector) toutes les `interval` s, puis à l'arrêt."""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = PROM_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="prometheus", daemon=True)
+
+    def start(self) -> "PrometheusFile":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.metrics.write_prometheus(self.path)
+            except Exception as e:
+                print(f"[!] Export Prometheus échoué: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        try:
+            self.metrics.write_prometheus(self.path)
+        except Exception as e:
+            print(f"[!] Export Prometheus échoué: {e}")
+
+# depuis 3.12, cProfile passe par sys.monitoring : un seul profiler actif à la fois
+PROFILE_ALL_THREADS = sys.version_info < (3, 12)
+
+class ScanProfiler:
+    """
+    cProfile sur le thread principal et sur chaque thread démarré pendant le run
+    (thread principal seulement à partir de Python 3.12).
+    """
+
+    def __init__(self):
+        import cProfile
+        self._new = cProfile.Profile
+        self._profiles: List = []
+        self._lock = threading.Lock()
+        self._main = self._new()
+
+    def _thread_hook(self, frame, event, arg):
+        # premier événement d'un nouveau thread : on y installe son propre profiler
+        prof = self._new()
+        with self._lock:
+            self._profiles.append(prof)
+        sys.setprofile(None)
+        try:
+            prof.enable()
+        except ValueError:
+            pass    # un autre profiler est déjà actif : thread non profilé
+
+    def start(self) -> "ScanProfiler":
+        if PROFILE_ALL_THREADS:
+            threading.setprofile(self._thread_hook)
+        else:
+            print("[!] Python >= 3.12 : profil du thread principal seulement (workers non profilés)")
+        self._main.enable()
+        return self
+
+    def stop(self, path: str, top: int = 25):
+        self._main.disable()
+        if PROFILE_ALL_THREADS:
+            threading.setprofile(None)
+        import pstats
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            for prof in self._profiles:
+                try:
+                    stats.add(prof)
+                except Exception:
+                    pass
+        stats.dump_stats(path)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(top)
+        print(out.getvalue())
+        print(f"[+] Profil: {path} (python -m pstats {path})")
+
+METRICS = Metrics()
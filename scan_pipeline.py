@@ -0,0 +1,161 @@
+# scan_pipeline.py
+"""
+Ordonnanceur en pipeline : découverte -> scan ports -> OS/enrichissement.
+Chaque étage tourne sur ses propres workers, reliés par des files bornées :
+un hôte part au scan dès qu'il est découvert, et un hôte lent ne bloque
+plus ceux qui le suivent.
+"""
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from port_scan_win import scan_host_ports
+from os_detection import detect_os
+from host_discovery_win import enrich_host
+from name_resolution import prefetch_name
+from scan_metrics import METRICS
+from scan_reporter import REPORTER, report_error
+
+SCAN_WORKERS = 4
+POST_WORKERS = 32
+QUEUE_SIZE = 64
+
+_DONE = object()
+
+class ScanPipeline:
+    """
+    ip_source (itérable d'IP) -> [scan_workers] -> [post_workers] -> run() (générateur).
+    run() produit les host_entry { ip, mac, hostname, os, services } dans l'ordre de fin.
+    """
+
+    def __init__(self, ports: List[int],
+                 scan_fn: Callable[[str, List[int]], List[Dict]] = scan_host_ports,
+                 os_fn: Callable[[str, Optional[str]], Dict] = detect_os,
+                 enrich_fn: Callable[[str], Dict] = enrich_host,
+                 prefetch_fn: Optional[Callable[[str], None]] = prefetch_name,
+                 scan_workers: int = SCAN_WORKERS,
+                 post_workers: int = POST_WORKERS,
+                 queue_size: int = QUEUE_SIZE):
+        self.ports = ports
+        self.scan_fn = scan_fn
+        self.os_fn = os_fn
+        self.enrich_fn = enrich_fn
+        self.prefetch_fn = prefetch_fn
+        self.scan_workers = max(1, scan_workers)
+        self.post_workers = max(1, post_workers)
+        self.scan_q = queue.Queue(maxsize=queue_size)
+        self.post_q = queue.Queue(maxsize=queue_size)
+        self.out_q = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._scan_alive = self.scan_workers
+        self._post_alive = self.post_workers
+
+    # -- étages ------------------------------------------------------------
+
+    def _feed(self, ip_source: Iterable):
+        try:
+            for item in ip_source:
+                if self.prefetch_fn is not None and not isinstance(item, dict):
+                    # nom résolu pendant le scan de ports, récupéré par enrich_fn
+                    self.prefetch_fn(item)
+                self.scan_q.put(item)
+                REPORTER.emit("host_queued", ip=item.get("ip") if isinstance(item, dict) else item)
+                METRICS.gauge_set("scan_queue", self.scan_q.qsize())
+        except Exception as e:
+            report_error(f"[!] Découverte interrompue: {e}")
+        finally:
+            for _ in range(self.scan_workers):
+                self.scan_q.put(_DONE)
+
+    def _scan_worker(self):
+        while True:
+            item = self.scan_q.get()
+            METRICS.gauge_set("scan_queue", self.scan_q.qsize())
+            if item is _DONE:
+                break
+            METRICS.inc("hosts_scanned")
+            host = item if isinstance(item, dict) else {"ip": item}
+            ip = host.get("ip")
+            REPORTER.emit("host_start", ip=ip)
+            try:
+                services = self.scan_fn(ip, self.ports)
+            except Exception as e:
+                report_error(f"[!] Scan {ip} échoué: {e}")
+                services = []
+            self.post_q.put((host, services))
+            METRICS.gauge_set("post_queue", self.post_q.qsize())
+        with self._lock:
+            self._scan_alive -= 1
+            last = self._scan_alive == 0
+        if last:
+            for _ in range(self.post_workers):
+                self.post_q.put(_DONE)
+
+    def _post_worker(self):
+        while True:
+            item = self.post_q.get()
+            METRICS.gauge_set("post_queue", self.post_q.qsize())
+            if item is _DONE:
+                break
+            host, services = item
+            self.out_q.put(self._finish_host(host, services))
+            METRICS.gauge_set("out_queue", self.out_q.qsize())
+        with self._lock:
+            self._post_alive -= 1
+            last = self._post_alive == 0
+        if last:
+            self.out_q.put(_DONE)
+
+    def _finish_host(self, host: Dict, services: List[Dict]) -> Dict:
+        ip = host.get("ip")
+        if "mac" not in host:
+            try:
+                host = self.enrich_fn(ip)
+            except Exception:
+                pass
+        try:
+            with METRICS.timer("os_detect"):
+                os_info = self.os_fn(ip, host.get("mac"))
+        except Exception:
+            os_info = {"ttl": None, "os_guess": None}
+        return {
+            "ip": ip,
+            "mac": host.get("mac"),
+            "hostname": host.get("hostname"),
+            "os": os_info,
+            "services": services
+        }
+
+    # -- exécution ---------------------------------------------------------
+
+    def run(self, ip_source: Iterable) -> Iterator[Dict]:
+        threads = [threading.Thread(target=self._feed, args=(ip_source,), name="discovery", daemon=True)]
+        threads += [threading.Thread(target=self._scan_worker, name=f"scan-{i}", daemon=True)
+                    for i in range(self.scan_workers)]
+        threads += [threading.Thread(target=self._post_worker, name=f"post-{i}", daemon=True)
+                    for i in range(self.post_workers)]
+        for t in threads:
+            t.start()
+        while True:
+            entry = self.out_q.get()
+            METRICS.gauge_set("out_queue", self.out_q.qsize())
+            if entry is _DONE:
+                break
+            yield entry
+        for t in threads:
+            t.join()
+
+def run_pipeline(ip_source: Iterable, ports: List[int], on_host: Optional[Callable[[Dict], None]] = None,
+                 keep: bool = True, **kwargs) -> List[Dict]:
+    """
+    Exécute le pipeline complet et retourne all_hosts trié par IP.
+    keep=False : les hôtes ne sont que passés à on_host (export en flux), liste vide en retour.
+    """
+    all_hosts = []
+    for entry in ScanPipeline(ports, **kwargs).run(ip_source):
+        if on_host:
+            on_host(entry)
+        if keep:
+            all_hosts.append(entry)
+    all_hosts.sort(key=lambda h: tuple(int(p) for p in h["ip"].split(".")))
+    return all_hosts
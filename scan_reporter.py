@@ -0,0 +1,320 @@
+# scan_reporter.py
+"""
+Affichage découplé du scan : les étages (découverte, scan de ports, pipeline,
+CLI) poussent des événements dans une file, un thread "reporter" les met en
+forme et écrit par lots (au plus 1/REPORT_INTERVAL) ; une console lente ne
+ralentit plus la collecte des résultats.
+Modes :
+  - lignes (défaut hors terminal) : mêmes messages qu'avant, écrits par lots
+  - progression (défaut sur un terminal) : une ligne d'état (hôtes, ports,
+    probes/s, ETA) redessinée en bas, seuls résumés d'hôtes/erreurs au-dessus
+  - événements (--events) : flux NDJSON lisible par machine, un objet par
+    événement + "progress" périodique ; sur stdout, le texte humain part sur stderr
+Tant que le reporter n'est pas démarré (bibliothèque, bench, shards), emit()
+affiche directement, comme avant.
+"""
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from scan_metrics import METRICS
+
+EVENT_QUEUE_SIZE = 10000    # événements en attente avant de freiner les étages
+REPORT_INTERVAL = 0.1       # période d'écriture des lots (s)
+PROGRESS_INTERVAL = 0.5     # rafraîchissement de la ligne d'état (s)
+EVENT_PROGRESS_INTERVAL = 2.0   # événement "progress" en mode --events (s)
+RATE_SMOOTHING = 0.3        # lissage exponentiel des débits affichés
+
+# événements masqués en mode progression (la ligne d'état les résume)
+_PROGRESS_HIDDEN = ("host_alive", "host_start", "port_open")
+
+_STOP = object()
+
+def _fmt_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+def format_event(kind: str, fields: Dict) -> Optional[str]:
+    """Texte humain d'un événement (None : rien à afficher)."""
+    if kind == "text":
+        return fields["text"]
+    if kind in ("info", "error"):
+        return fields["msg"] + "\n"
+    if kind == "host_alive":
+        return f"  • {fields['ip']} => alive (tcp probe)\n" if fields.get("via") == "tcp" else None
+    if kind == "host_start":
+        return f"\n[+] Traitement {fields['ip']}\n"
+    if kind == "port_open":
+        line = f"  -> {fields['ip']}:{fields['port']} OPEN  {fields['service'] + '  ' if fields.get('service') else ''}" \
+               f"{('banner: ' + fields['banner']) if fields.get('banner') else ''}\n"
+        for v in fields.get("vulns") or []:
+            line += f"     !!! VULN: {v['product']} {v['version']} — {v.get('notes')}\n"
+        return line
+    if kind == "host_done":
+        from result_export import format_host_summary
+        h = fields["host"]
+        return "\n".join(format_host_summary(h, h.get("services"), h.get("os"))) + "\n"
+    return None
+
+class _ConsoleProxy(io.TextIOBase):
+    """Remplace sys.stdout pendant le run : les print() passent par la file du reporter."""
+
+    def __init__(self, reporter: "Reporter", real):
+        self.reporter = reporter
+        self.real = real
+
+    def write(self, s: str) -> int:
+        if s:
+            self.reporter.emit("text", text=s)
+        return len(s)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return self.real.isatty()
+
+    @property
+    def encoding(self):
+        return self.real.encoding
+
+class Reporter:
+
+    def __init__(self):
+        self.started = False
+        self.progress = False
+        self._q: queue.Queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._console = sys.stdout
+        self._events = None
+        self._close_events = False
+        self._saved_stdout = None
+        self._reset_counts()
+
+    def _reset_counts(self):
+        self.targets = 0
+        self.ports_per_host = 0
+        self.hosts_queued = 0
+        self.hosts_done = 0
+        self.hosts_alive = 0
+        self._t0 = time.time()
+        self._last = (self._t0, 0.0, 0.0)     # (t, ports_done, connects)
+        self._port_rate = 0.0
+        self._probe_rate = 0.0
+        self._drawn = False
+        self._last_draw = 0.0
+        self._last_event_progress = 0.0
+
+    # -- cycle de vie ------------------------------------------------------
+
+    def start(self, progress: Optional[bool] = None, events: Optional[str] = None,
+              targets: int = 0, ports_per_host: int = 0) -> "Reporter":
+        """
+        progress None : ligne d'état seulement si stdout est un terminal.
+        events : "-" (stdout) ou chemin d'un fichier NDJSON.
+        """
+        if self.started:
+            return self
+        self._reset_counts()
+        self.targets = targets
+        self.ports_per_host = ports_per_host
+        real = sys.stdout
+        self._console = real
+        if events == "-":
+            self._events = real
+            self._console = sys.stderr
+            progress = False
+        elif events:
+            self._events = open(events, "w", encoding="utf-8")
+            self._close_events = True
+        if progress is None:
+            progress = self._console.isatty()
+        self.progress = bool(progress)
+        self.started = True
+        self._saved_stdout = real
+        sys.stdout = _ConsoleProxy(self, self._console)
+        self._thread = threading.Thread(target=self._run, name="reporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def configure(self, targets: Optional[int] = None, ports_per_host: Optional[int] = None):
+        """Totaux connus après le démarrage (taille de la cible, ports par hôte) pour l'ETA."""
+        if targets is not None:
+            self.targets = targets
+        if ports_per_host is not None:
+            self.ports_per_host = ports_per_host
+
+    @property
+    def owns_console(self) -> bool:
+        """Ligne d'état ou flux d'événements sur stdout : personne d'autre ne doit y écrire."""
+        return self.started and (self.progress or self._events is self._saved_stdout)
+
+    def flush(self):
+        """Attend que tout ce qui a été émis soit écrit."""
+        if self.started:
+            self._q.join()
+
+    def stop(self):
+        if not self.started:
+            return
+        self._q.put(_STOP)
+        self._thread.join()
+        sys.stdout = self._saved_stdout
+        if self._close_events:
+            self._events.close()
+        self._events = None
+        self._close_events = False
+        self._console = sys.stdout
+        self.started = False
+
+    # -- émission (tous threads) ---------------------------------------------
+
+    def emit(self, kind: str, **fields):
+        if not self.started:
+            text = format_event(kind, fields)
+            if text:
+                sys.stdout.write(text)
+            return
+        if threading.current_thread() is self._thread:
+            # print() depuis le reporter lui-même : pas de file (elle peut être pleine)
+            self._console.write(format_event(kind, fields) or "")
+            return
+        self._q.put((kind, fields, time.time()))
+
+    # -- thread reporter -----------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            time.sleep(REPORT_INTERVAL)
+            batch = []
+            try:
+                while len(batch) < EVENT_QUEUE_SIZE:
+                    batch.append(self._q.get_nowait())
+            except queue.Empty:
+                pass
+            text: List[str] = []
+            events: List[str] = []
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                    continue
+                kind, fields, t = item
+                self._account(kind)
+                if self._events is not None and kind != "text":
+                    events.append(self._event_line(kind, fields, t))
+                if self._events is not None and self._events is self._saved_stdout and kind != "text":
+                    continue    # flux machine sur stdout : pas de doublon humain
+                if self.progress and kind in _PROGRESS_HIDDEN:
+                    continue
+                try:
+                    out = format_event(kind, fields)
+                except Exception as e:
+                    out = f"[!] Affichage {kind} impossible: {e}\n"
+                if out:
+                    text.append(out)
+            now = time.time()
+            self._write(text, events, now, final=stopping)
+            for _ in batch:
+                self._q.task_done()
+
+    def _account(self, kind: str):
+        if kind == "host_queued":
+            self.hosts_queued += 1
+        elif kind == "host_done":
+            self.hosts_done += 1
+        elif kind == "host_alive":
+            self.hosts_alive += 1
+
+    def _write(self, text: List[str], events: List[str], now: float, final: bool = False):
+        try:
+            if self._events is not None:
+                if final or now - self._last_event_progress >= EVENT_PROGRESS_INTERVAL:
+                    self._last_event_progress = now
+                    events.append(self._event_line("progress", self.status(now), now))
+                if events:
+                    self._events.write("".join(events))
+                    self._events.flush()
+            if self.progress:
+                redraw = final or text or now - self._last_draw >= PROGRESS_INTERVAL
+                if not redraw:
+                    return
+                out = "\r\033[K" if self._drawn else ""
+                out += "".join(text)
+                if final:
+                    out += self.status_line(now) + "\n"
+                else:
+                    out += self.status_line(now)
+                self._drawn = not final
+                self._last_draw = now
+                self._console.write(out)
+                self._console.flush()
+            elif text:
+                self._console.write("".join(text))
+                self._console.flush()
+        except Exception:
+            pass
+
+    # -- progression ---------------------------------------------------------
+
+    def status(self, now: Optional[float] = None) -> Dict:
+        """Compteurs de progression (ligne d'état, événements "progress")."""
+        now = now or time.time()
+        c = METRICS.counters
+        ports_done = c.get("ports_done", 0)
+        connects = c.get("connects", 0) + c.get("udp_probes", 0) + c.get("syn_sent", 0) \
+            + c.get("discovery_probes", 0)
+        t, p0, c0 = self._last
+        dt = now - t
+        if dt >= 0.2:
+            a = RATE_SMOOTHING
+            self._port_rate = (1 - a) * self._port_rate + a * (ports_done - p0) / dt
+            self._probe_rate = (1 - a) * self._probe_rate + a * (connects - c0) / dt
+            self._last = (now, ports_done, connects)
+        hosts = max(self.hosts_queued, self.hosts_done)
+        ports_total = hosts * self.ports_per_host
+        eta = None
+        if ports_total and self._port_rate > 0:
+            eta = max(0.0, ports_total - ports_done) / self._port_rate
+        discovered = c.get("discovery_probes", 0)
+        return {"elapsed_s": round(now - self._t0, 1), "hosts_done": self.hosts_done, "hosts_queued": hosts,
+                "ports_done": int(ports_done), "ports_total": ports_total,
+                "probes_per_s": round(self._probe_rate, 1), "eta_s": round(eta, 1) if eta is not None else None,
+                "discovery_probes": int(discovered), "targets": self.targets}
+
+    def status_line(self, now: Optional[float] = None) -> str:
+        s = self.status(now)
+        line = f"[~] {_fmt_duration(s['elapsed_s'])}  hôtes {s['hosts_done']}/{s['hosts_queued']}"
+        if s["ports_total"]:
+            line += f"  ports {s['ports_done']}/{s['ports_total']}"
+        line += f"  {s['probes_per_s']:.0f} probes/s"
+        line += f"  ETA {_fmt_duration(s['eta_s'])}" if s["eta_s"] is not None else "  ETA --:--"
+        return line
+
+    # -- flux machine --------------------------------------------------------
+
+    @staticmethod
+    def _event_line(kind: str, fields: Dict, t: float) -> str:
+        ev = {"t": round(t, 3), "event": kind}
+        if kind == "host_done":
+            from result_export import host_record
+            from result_store import json_default
+            ev["host"] = host_record(fields["host"])
+            return json.dumps(ev, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+        ev.update(fields)
+        return json.dumps(ev, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+
+REPORTER = Reporter()
+
+def report(msg: str):
+    """Message d'information (ligne "[+] ...") via le reporter."""
+    REPORTER.emit("info", msg=msg)
+
+def report_error(msg: str):
+    REPORTER.emit("error", msg=msg)
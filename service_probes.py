@@ -0,0 +1,254 @@
+# service_probes.py
+"""
+Identification de service par probes (version très réduite de nmap-service-probes) :
+  1. probe NULL : courte attente, beaucoup de services parlent en premier (SSH, FTP, SMTP...)
+  2. si rien n'est venu : payload protocolaire selon le port (HTTP, TLS, Redis...)
+  3. la lecture s'arrête dès qu'une règle reconnaît le service
+Résultat : (bannière, {"name", "product", "version"}) ; le service structuré
+est ce que consomme check_vulns_from_banner. Base : service_probes.json.
+"""
+import asyncio
+import json
+import os
+import re
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROBES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service_probes.json")
+READ_IDLE = 0.2             # silence qui clôt une réponse non reconnue
+MAX_READ_BYTES = 16384      # lecture max pour reconnaître un service bavard
+BANNER_MAX_CHARS = 1024     # bannière conservée dans le résultat
+
+class Probe:
+    __slots__ = ("name", "payload", "wait", "tls", "ports", "skip_ports")
+
+    def __init__(self, d: Dict):
+        self.name = d["name"]
+        self.payload = d.get("payload", "")
+        self.wait = float(d.get("wait", 1.0))
+        self.tls = bool(d.get("tls"))
+        self.ports = set(d.get("ports", []))
+        self.skip_ports = set(d.get("skip_ports", []))
+
+    def data(self, ip: str) -> bytes:
+        return self.payload.replace("{host}", ip).encode("latin-1")
+
+class MatchRule:
+    __slots__ = ("service", "regex", "product", "version")
+
+    def __init__(self, d: Dict):
+        self.service = d["service"]
+        self.regex = re.compile(d["pattern"], re.DOTALL)
+        self.product = d.get("product")
+        self.version = d.get("version")
+
+    @staticmethod
+    def _fill(template: Optional[str], m) -> Optional[str]:
+        if not template:
+            return None
+        out = re.sub(r"\$(\d)", lambda g: m.group(int(g.group(1))) or "", template).strip()
+        return out or None
+
+    def apply(self, text: str) -> Optional[Dict]:
+        m = self.regex.search(text)
+        if not m:
+            return None
+        svc = {"name": self.service, "product": self._fill(self.product, m), "version": self._fill(self.version, m)}
+        return {k: v for k, v in svc.items() if v}
+
+class ServiceProbes:
+
+    def __init__(self, db: Dict):
+        probes = [Probe(p) for p in db.get("probes", [])]
+        self.null = next((p for p in probes if p.name == "NULL"), None)
+        self.probes = [p for p in probes if p.name != "NULL"]
+        self.rules: List[MatchRule] = []
+        for r in db.get("matches", []):
+            try:
+                self.rules.append(MatchRule(r))
+            except (re.error, KeyError) as e:
+                print(f"[!] Règle de service ignorée ({r.get('service')}): {e}")
+
+    def plan(self, port: int) -> List[Probe]:
+        """Probes à envoyer sur `port`, dans l'ordre."""
+        plan = []
+        if self.null and port not in self.null.skip_ports:
+            plan.append(self.null)
+        plan += [p for p in self.probes if port in p.ports]
+        return plan
+
+    def match(self, data: bytes) -> Optional[Dict]:
+        text = data.decode("latin-1")
+        for rule in self.rules:
+            svc = rule.apply(text)
+            if svc:
+                return svc
+        return None
+
+_lock = threading.Lock()
+_db: Optional[ServiceProbes] = None
+
+def get_probes() -> ServiceProbes:
+    """Base de probes chargée (et compilée) une seule fois."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                try:
+                    with open(PROBES_FILE, "r", encoding="utf-8") as f:
+                        _db = ServiceProbes(json.load(f))
+                except Exception as e:
+                    print(f"[!] Base de probes illisible ({e}) : bannières brutes seulement")
+                    _db = ServiceProbes({"probes": [{"name": "NULL", "wait": 2.0}]})
+    return _db
+
+_tls_ctx: Optional[ssl.SSLContext] = None
+
+def tls_context() -> ssl.SSLContext:
+    """Contexte TLS sans vérification (on identifie, on n'authentifie pas)."""
+    global _tls_ctx
+    if _tls_ctx is None:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        _tls_ctx = ctx
+    return _tls_ctx
+
+def banner_text(data: bytes) -> Optional[str]:
+    text = data.decode(errors="ignore").strip()
+    return text[:BANNER_MAX_CHARS] or None
+
+def _finish(data: bytes, service: Optional[Dict], probe: Optional[Probe]) -> Tuple[Optional[str], Optional[Dict]]:
+    if probe is not None and probe.tls:
+        # handshake réussi : au minimum un service TLS, sinon "ssl/<service>"
+        service = dict(service or {})
+        service["name"] = "ssl/" + service["name"] if service.get("name") else "ssl"
+    if service is not None and probe is not None:
+        service["probe"] = probe.name
+    return banner_text(data), service
+
+def identify_service(sock: socket.socket, ip: str, port: int, timeout: float) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Bannière + service d'un port ouvert (socket connecté). `timeout` borne le
+    temps total passé sur le port. Le socket TLS éventuel est fermé ici.
+    """
+    db = get_probes()
+    deadline = time.monotonic() + timeout
+    conn = sock
+    data = b""
+    tried = None
+    try:
+        for probe in db.plan(port):
+            wait = min(probe.wait, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            tried = probe
+            if probe.tls:
+                if conn is not sock:
+                    continue
+                conn.settimeout(wait)
+                conn = tls_context().wrap_socket(sock)
+            payload = probe.data(ip)
+            if payload:
+                conn.sendall(payload)
+            data, service = _recv_until(conn, db, wait)
+            if service or data:
+                return _finish(data, service, probe)
+    except Exception:
+        pass
+    finally:
+        if conn is not sock:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    if tried is not None and tried.tls and conn is not sock:
+        return _finish(data, None, tried)
+    return banner_text(data), None
+
+def _recv_until(conn: socket.socket, db: ServiceProbes, wait: float) -> Tuple[bytes, Optional[Dict]]:
+    data = b""
+    deadline = time.monotonic() + wait
+    while len(data) < MAX_READ_BYTES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        conn.settimeout(min(remaining, READ_IDLE) if data else remaining)
+        try:
+            chunk = conn.recv(4096)
+        except (socket.timeout, ssl.SSLError, OSError):
+            break
+        if not chunk:
+            break
+        data += chunk
+        service = db.match(data)
+        if service:
+            return data, service
+    return data, None
+
+async def identify_service_async(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                 ip: str, port: int, timeout: float) -> Tuple[Optional[str], Optional[Dict]]:
+    """Équivalent asyncio de identify_service (TLS : nouvelle connexion chiffrée, fermée ici)."""
+    db = get_probes()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tls_writer = None
+    data = b""
+    tried = None
+    try:
+        for probe in db.plan(port):
+            wait = min(probe.wait, deadline - loop.time())
+            if wait <= 0:
+                break
+            tried = probe
+            if probe.tls:
+                if tls_writer is not None:
+                    continue
+                reader, tls_writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port, ssl=tls_context(), server_hostname=""), wait)
+                writer = tls_writer
+            payload = probe.data(ip)
+            if payload:
+                writer.write(payload)
+                await writer.drain()
+            data, service = await _read_until(reader, db, wait)
+            if service or data:
+                return _finish(data, service, probe)
+    except Exception:
+        pass
+    finally:
+        if tls_writer is not None:
+            # pas de close_notify : l'attendre coûterait jusqu'au timeout SSL
+            tls_writer.transport.abort()
+    if tried is not None and tried.tls and tls_writer is not None:
+        return _finish(data, None, tried)
+    return banner_text(data), None
+
+async def _read_until(reader: asyncio.StreamReader, db: ServiceProbes, wait: float) -> Tuple[bytes, Optional[Dict]]:
+    loop = asyncio.get_running_loop()
+    data = b""
+    deadline = loop.time() + wait
+    while len(data) < MAX_READ_BYTES:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            chunk = await asyncio.wait_for(reader.read(4096), min(remaining, READ_IDLE) if data else remaining)
+        except Exception:
+            break
+        if not chunk:
+            break
+        data += chunk
+        service = db.match(data)
+        if service:
+            return data, service
+    return data, None
+
+def service_label(service: Optional[Dict]) -> str:
+    """'ssh OpenSSH 7.4p1' (affichage, CSV)."""
+    if not service:
+        return ""
+    return " ".join(service[k] for k in ("name", "product", "version") if service.get(k))
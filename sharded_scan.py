@@ -0,0 +1,100 @@
+# sharded_scan.py
+"""
+Scan réparti sur plusieurs processus : l'espace d'adresses (TargetSet) est
+découpé en N shards, chaque worker exécute le pipeline habituel
+(découverte -> scan ports -> OS) sur son shard et renvoie ses host_entry au
+parent par une file, au fil de l'eau. Le parent fusionne (affichage, export).
+"""
+import multiprocessing
+import os
+import queue
+import sys
+from typing import Callable, Dict, List
+
+from targets import TargetSet
+from scan_metrics import METRICS
+
+RESULT_QUEUE_SIZE = 1000
+
+_SHARD_DONE = "__shard_done__"
+
+def _scan_shard(shard_id: int, shard: TargetSet, ports: List[int], settings: Dict, out_q):
+    # imports dans le worker : rien de lourd n'est hérité/picklé depuis le parent
+    import port_scan_win
+    from host_discovery_win import iter_discover_hosts
+    from scan_pipeline import run_pipeline
+    from rate_limit import RATE_LIMITER
+
+    if settings.get("quiet"):
+        sys.stdout = open(os.devnull, "w")
+    engine = None
+    try:
+        port_scan_win.configure_timing(**settings.get("timing", {}))
+        RATE_LIMITER.configure(**settings.get("rate", {}))
+        scan_fn = port_scan_win.scan_host_ports
+        if settings.get("syn"):
+            from syn_scan import SynScanEngine
+            engine = SynScanEngine(max_in_flight=settings.get("max_sockets") or port_scan_win.ASYNC_MAX_SOCKETS)
+            scan_fn = engine.scan_host_ports
+        elif settings.get("udp"):
+            from udp_scan import UdpScanEngine
+            engine = UdpScanEngine(max_in_flight=settings.get("max_sockets") or port_scan_win.ASYNC_MAX_SOCKETS)
+            scan_fn = engine.scan_host_ports
+        elif settings.get("engine") == "async":
+            engine = port_scan_win.AsyncScanEngine(settings.get("max_sockets", port_scan_win.ASYNC_MAX_SOCKETS))
+            scan_fn = engine.scan_host_ports
+        pipeline_kwargs = {k: settings[k] for k in ("scan_workers", "post_workers", "queue_size") if settings.get(k)}
+        run_pipeline(iter_discover_hosts(shard), ports, on_host=out_q.put, keep=False,
+                     scan_fn=scan_fn, **pipeline_kwargs)
+    except Exception as e:
+        print(f"[!] Shard {shard_id} en erreur: {e}")
+    finally:
+        if engine:
+            engine.close()
+        # les métriques du worker remontent avec la sentinelle de fin
+        out_q.put((_SHARD_DONE, shard_id, METRICS.snapshot()))
+
+def run_sharded(targets: TargetSet, ports: List[int], shards: int, settings: Dict,
+                on_host: Callable[[Dict], None]) -> int:
+    """
+    Lance `shards` processus sur `targets` ; on_host est appelé dans le parent
+    pour chaque hôte terminé. Le budget de sockets async est partagé entre shards.
+    Retourne le nombre d'hôtes reçus.
+    """
+    parts = [p for p in targets.shard(shards) if p]
+    if not parts:
+        return 0
+    settings = dict(settings)
+    if settings.get("max_sockets"):
+        settings["max_sockets"] = max(1, settings["max_sockets"] // len(parts))
+    ctx = multiprocessing.get_context("spawn")
+    out_q = ctx.Queue(maxsize=RESULT_QUEUE_SIZE)
+    procs = [ctx.Process(target=_scan_shard, args=(i, p, ports, settings, out_q), name=f"shard-{i}", daemon=True)
+             for i, p in enumerate(parts)]
+    print(f"[+] {len(parts)} shard(s) sur {targets}")
+    for p in procs:
+        with METRICS.timer("shard_start"):
+            p.start()
+    remaining = len(procs)
+    count = 0
+    try:
+        while remaining:
+            try:
+                item = out_q.get(timeout=1.0)
+            except queue.Empty:
+                # worker mort sans sentinelle (kill, OOM...)
+                if not any(p.is_alive() for p in procs):
+                    break
+                continue
+            if isinstance(item, tuple) and item and item[0] == _SHARD_DONE:
+                remaining -= 1
+                METRICS.merge(item[2])
+                continue
+            count += 1
+            on_host(item)
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+    return count
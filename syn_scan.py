@@ -0,0 +1,428 @@
+# syn_scan.py
+"""
+Scan SYN semi-ouvert (scapy, privilèges root / administrateur) :
+  - un thread émetteur envoie les SYN par lots (SYN_BATCH) sur un seul
+    socket L3 et gère timeouts et retransmissions (tas d'échéances)
+  - une seule boucle de réception classe les réponses : SYN-ACK -> open,
+    RST -> closed, ICMP unreachable ou rien après retransmissions -> filtered
+    (sockets IP bruts sous Linux, sniffer scapy ailleurs)
+  - le noyau répond RST au SYN-ACK (aucun socket local) : pas de session
+    complète ouverte sur la cible
+  - le TTL de la première réponse d'un hôte alimente le détecteur d'OS
+    (OsDetector.observe) : plus de ping séparé pour ces hôtes
+Pas de connexion, donc ni bannière ni vulns. Mêmes dicts résultat que scan_port.
+"""
+import collections
+import heapq
+import itertools
+import os
+import random
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from port_scan_win import connect_timeout, report_result
+from ports import order_by_frequency
+from result_store import HostServices
+from rate_limit import RATE_LIMITER
+from targets import ip_to_int
+from timing import HOST_TIMINGS
+from scan_metrics import METRICS
+
+SYN_MAX_IN_FLIGHT = 2000        # SYN en attente de réponse (tous hôtes)
+SYN_BATCH = 256                 # SYN émis par réveil de l'émetteur
+SYN_TICK = 0.01                 # période max de l'émetteur (échéances, lots)
+SYN_RETRIES = 1                 # retransmissions d'un SYN sans réponse
+SYN_SPORT_RANGE = (40000, 60000)
+SYN_TTL = 64
+SNIFFER_START_TIMEOUT = 3.0
+RAW_RCVBUF = 4 << 20            # tampon des sockets bruts de réception
+MAX_PACKET = 65535
+
+# codes ICMP "destination unreachable" qui valent filtrage (comme nmap)
+_ICMP_FILTERED = (1, 2, 3, 9, 10, 13)
+
+def syn_unavailable() -> Optional[str]:
+    """Raison pour laquelle le scan SYN est impossible ici (None : disponible)."""
+    try:
+        import scapy  # noqa: F401
+    except Exception:
+        return "scapy non installé"
+    if hasattr(os, "geteuid") and os.geteuid() != 0:
+        return "privilèges root requis (sockets bruts)"
+    return None
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def source_address(ip: str) -> str:
+    """Adresse source choisie par le noyau pour joindre `ip` (aucun paquet émis)."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect((ip, 9))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+class _HostScan:
+    __slots__ = ("ip", "src", "dst", "results", "remaining", "realtime_print", "on_result", "ttl_seen",
+                 "lock", "done")
+
+    def __init__(self, ip: str, n: int, realtime_print: bool, on_result: Optional[Callable[[Dict], None]]):
+        self.ip = ip
+        self.src = socket.inet_aton(source_address(ip))
+        self.dst = socket.inet_aton(ip)
+        self.results = HostServices(ip)
+        self.remaining = n
+        self.realtime_print = realtime_print
+        self.on_result = on_result
+        self.ttl_seen = False
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+class _Probe:
+    __slots__ = ("host", "port", "seq", "attempt", "sent")
+
+    def __init__(self, host: _HostScan, port: int, seq: int):
+        self.host = host
+        self.port = port
+        self.seq = seq
+        self.attempt = 0
+        self.sent = 0.0
+
+class SynScanEngine:
+    """
+    Émetteur + sniffer partagés. `scan_host_ports` a la même signature que la
+    version connect et peut être appelée depuis plusieurs threads (workers du
+    pipeline) : tous les SYN partagent le budget `max_in_flight`.
+    RuntimeError si scapy ou les privilèges manquent (voir syn_unavailable).
+    """
+
+    def __init__(self, max_in_flight: int = SYN_MAX_IN_FLIGHT, retries: int = SYN_RETRIES):
+        reason = syn_unavailable()
+        if reason:
+            raise RuntimeError(reason)
+        from scapy.all import AsyncSniffer, conf
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = max(0, retries)
+        self.sport = random.randint(*SYN_SPORT_RANGE)
+        self._seq_base = random.getrandbits(32)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, int], _Probe] = {}
+        self._queue: collections.deque = collections.deque()
+        self._deadlines: List[Tuple[float, int, _Probe, int]] = []
+        self._tie = itertools.count()
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._sniffer = None
+        self._raw = self._raw_sockets()
+        self._caught_up = time.monotonic()
+        # Linux : SYN forgés depuis un gabarit scapy et émis sur un socket brut
+        # (scapy coûte ~0,7 ms par paquet construit puis émis) ; ailleurs, émission scapy
+        self._template = bytes(self._packet_tcp(0, 0))
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW) if self._raw \
+            else conf.L3socket()
+        if self._raw:
+            self._receiver = threading.Thread(target=self._recv_loop, name="syn-recv", daemon=True)
+            self._receiver.start()
+        else:
+            sniffing = threading.Event()
+            ifaces = sorted({str(conf.iface), str(conf.loopback_name)})
+            self._sniffer = AsyncSniffer(iface=ifaces, store=False, prn=self._on_packet,
+                                         started_callback=sniffing.set, **self._capture_filter())
+            self._sniffer.start()
+            if not sniffing.wait(SNIFFER_START_TIMEOUT):
+                error = getattr(self._sniffer, "exception", None)
+                self._sock.close()
+                raise RuntimeError(f"sniffer indisponible: {error or 'démarrage trop lent'}")
+        self._sender = threading.Thread(target=self._send_loop, name="syn-send", daemon=True)
+        self._sender.start()
+
+    @staticmethod
+    def _raw_sockets() -> List[socket.socket]:
+        """
+        Linux : sockets IP bruts TCP et ICMP, le noyau y copie chaque paquet
+        entrant une seule fois (sans Ethernet ni doublon de la boucle locale) ;
+        bien moins coûteux que la dissection scapy de tout le trafic capturé.
+        """
+        if not sys.platform.startswith("linux"):
+            return []
+        socks = []
+        try:
+            for proto in (socket.IPPROTO_TCP, socket.IPPROTO_ICMP):
+                s = socket.socket(socket.AF_INET, socket.SOCK_RAW, proto)
+                s.setblocking(False)
+                try:
+                    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RAW_RCVBUF)
+                except OSError:
+                    pass
+                socks.append(s)
+        except OSError:
+            for s in socks:
+                s.close()
+            return []
+        return socks
+
+    def _capture_filter(self) -> Dict:
+        """Filtre BPF si libpcap sait le compiler, sinon tri en Python (lfilter)."""
+        bpf = f"(tcp and dst port {self.sport}) or icmp"
+        try:
+            from scapy.arch.common import compile_filter
+            compile_filter(bpf)
+            return {"filter": bpf}
+        except Exception:
+            from scapy.all import TCP, ICMP
+            sport = self.sport
+            return {"lfilter": lambda p: ICMP in p or (TCP in p and p[TCP].dport == sport)}
+
+    # -- émission ------------------------------------------------------------
+
+    def _packet_tcp(self, port: int, seq: int):
+        from scapy.all import TCP
+        return TCP(sport=self.sport, dport=port, flags="S", seq=seq, window=1024, options=[("MSS", 1460)])
+
+    def _packet_bytes(self, probe: _Probe) -> bytes:
+        """SYN complet (IP + TCP) : gabarit TCP avec port, seq et somme de contrôle mis à jour."""
+        host = probe.host
+        tcp = bytearray(self._template)
+        struct.pack_into("!HI", tcp, 2, probe.port, probe.seq)
+        tcp[16:18] = b"\0\0"
+        pseudo = host.src + host.dst + struct.pack("!BBH", 0, socket.IPPROTO_TCP, len(tcp))
+        struct.pack_into("!H", tcp, 16, _checksum(pseudo + tcp))
+        # id, somme de contrôle IP : remplis par le noyau (IP_HDRINCL)
+        ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp), 0, 0, SYN_TTL, socket.IPPROTO_TCP, 0,
+                         host.src, host.dst)
+        return ip + bytes(tcp)
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(SYN_TICK)
+            self._wakeup.clear()
+            self._expire(time.monotonic())
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), SYN_BATCH))]
+            if not batch:
+                continue
+            RATE_LIMITER.acquire(len(batch))
+            for probe in batch:
+                self._send(probe)
+            if self._queue:
+                self._wakeup.set()
+
+    def _send(self, probe: _Probe):
+        try:
+            if self._raw:
+                data = self._packet_bytes(probe)
+                probe.sent = time.monotonic()
+                self._sock.sendto(data, (probe.host.ip, 0))
+            else:
+                from scapy.all import IP
+                pkt = IP(dst=probe.host.ip) / self._packet_tcp(probe.port, probe.seq)
+                probe.sent = time.monotonic()
+                self._sock.send(pkt)
+        except Exception as e:
+            METRICS.inc("syn_errors")
+            self._finish(probe, "error", error=str(e))
+            return
+        METRICS.inc("syn_sent")
+        deadline = probe.sent + connect_timeout(probe.host.ip, probe.attempt)
+        with self._lock:
+            heapq.heappush(self._deadlines, (deadline, next(self._tie), probe, probe.attempt))
+
+    def _expire(self, now: float):
+        # une probe n'expire que si la réception a rattrapé son échéance : un retard
+        # de traitement de notre côté n'est pas un port filtré
+        horizon = min(now, self._caught_up) if self._raw else now
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= horizon:
+                _, _, probe, attempt = heapq.heappop(self._deadlines)
+                # échéance périmée : probe déjà terminée ou retransmise depuis
+                if self._pending.get((probe.host.ip, probe.port)) is probe and probe.attempt == attempt:
+                    expired.append(probe)
+        for probe in expired:
+            RATE_LIMITER.record(False)
+            METRICS.inc("syn_timeouts")
+            if probe.attempt < self.retries:
+                probe.attempt += 1
+                with self._lock:
+                    self._queue.append(probe)
+            else:
+                self._finish(probe, "filtered")
+
+    # -- réception -----------------------------------------------------------
+
+    def _recv_loop(self):
+        sel = selectors.DefaultSelector()
+        for s in self._raw:
+            sel.register(s, selectors.EVENT_READ)
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            drained = True
+            for key, _ in sel.select(SYN_TICK * 10):
+                sock = key.fileobj
+                for _ in range(SYN_BATCH):
+                    try:
+                        data = sock.recv(MAX_PACKET)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        break
+                    try:
+                        self._on_datagram(data)
+                    except Exception:
+                        METRICS.inc("syn_errors")
+                else:
+                    drained = False
+            if drained:
+                # tout ce qui est arrivé avant t0 est traité
+                self._caught_up = t0
+        sel.close()
+
+    def _on_datagram(self, data: bytes):
+        """Paquet IPv4 brut (en-tête IP compris) : réponse TCP ou ICMP unreachable."""
+        if len(data) < 20:
+            return
+        ihl = (data[0] & 0x0f) * 4
+        proto = data[9]
+        if proto == socket.IPPROTO_TCP and len(data) >= ihl + 14:
+            sport, dport, _, ack = struct.unpack_from("!HHII", data, ihl)
+            if dport == self.sport:
+                self._on_reply(socket.inet_ntoa(data[12:16]), sport, ack, data[ihl + 13], data[8])
+        elif proto == socket.IPPROTO_ICMP and len(data) >= ihl + 8 + 20:
+            icmp_type, icmp_code = data[ihl], data[ihl + 1]
+            inner = ihl + 8
+            inner_ihl = (data[inner] & 0x0f) * 4
+            if data[inner + 9] != socket.IPPROTO_TCP or len(data) < inner + inner_ihl + 4:
+                return
+            sport, dport = struct.unpack_from("!HH", data, inner + inner_ihl)
+            if sport == self.sport:
+                self._on_unreachable(socket.inet_ntoa(data[inner + 16:inner + 20]), dport, icmp_type, icmp_code)
+
+    def _on_packet(self, pkt):
+        """Même tri que _on_datagram pour un paquet capturé par le sniffer scapy."""
+        from scapy.all import IP, TCP, ICMP, IPerror, TCPerror
+        try:
+            if TCP in pkt and IP in pkt:
+                tcp = pkt[TCP]
+                if tcp.dport == self.sport:
+                    self._on_reply(pkt[IP].src, tcp.sport, tcp.ack, int(tcp.flags), pkt[IP].ttl)
+            elif ICMP in pkt and IPerror in pkt and TCPerror in pkt:
+                if pkt[TCPerror].sport == self.sport:
+                    self._on_unreachable(pkt[IPerror].dst, pkt[TCPerror].dport, pkt[ICMP].type, pkt[ICMP].code)
+        except Exception:
+            METRICS.inc("syn_errors")
+
+    def _on_reply(self, ip: str, port: int, ack: int, flags: int, ttl: int):
+        with self._lock:
+            probe = self._pending.get((ip, port))
+        if probe is None or ack != (probe.seq + 1) & 0xffffffff:
+            # réponse tardive (après timeout), en double ou étrangère
+            METRICS.inc("syn_late")
+            return
+        if flags & 0x12 == 0x12:
+            state = "open"
+        elif flags & 0x04:
+            state = "closed"
+        else:
+            return
+        self._observe_ttl(probe.host, ttl)
+        self._finish(probe, state, rtt=time.monotonic() - probe.sent)
+
+    def _on_unreachable(self, ip: str, port: int, icmp_type: int, icmp_code: int):
+        if icmp_type != 3 or icmp_code not in _ICMP_FILTERED:
+            return
+        with self._lock:
+            probe = self._pending.get((ip, port))
+        if probe is not None:
+            METRICS.inc("syn_icmp")
+            self._finish(probe, "filtered", rtt=time.monotonic() - probe.sent)
+
+    def _observe_ttl(self, host: _HostScan, ttl: int):
+        if host.ttl_seen:
+            return
+        host.ttl_seen = True
+        from os_detection import get_detector
+        get_detector().observe(host.ip, ttl)
+
+    def _finish(self, probe: _Probe, state: str, rtt: Optional[float] = None, error: Optional[str] = None):
+        host = probe.host
+        with self._lock:
+            if self._pending.get((host.ip, probe.port)) is not probe:
+                return
+            del self._pending[(host.ip, probe.port)]
+        self._slots.release()
+        r = {"ip": host.ip, "port": probe.port, "state": state, "banner": None, "rtt_ms": None, "vulns": None}
+        if error:
+            r["error"] = error
+        if rtt is not None:
+            r["rtt_ms"] = round(rtt * 1000, 2)
+            HOST_TIMINGS.observe(host.ip, rtt)
+            RATE_LIMITER.record(True)
+            METRICS.observe("syn", rtt)
+        METRICS.inc(f"syn_{state}")
+        with host.lock:
+            host.results.add(r)
+            if host.on_result:
+                host.on_result(r)
+            host.remaining -= 1
+            last = host.remaining == 0
+        report_result(r, host.realtime_print)
+        if last:
+            host.done.set()
+
+    # -- API -----------------------------------------------------------------
+
+    def scan_host_ports(self, ip: str, ports: List[int], realtime_print: bool = True,
+                        on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
+        host = _HostScan(ip, len(ports), realtime_print, on_result)
+        if not ports:
+            return host.results
+        base = (self._seq_base + (ip_to_int(ip) << 16)) & 0xffffffff
+        with METRICS.timer("syn_scan"):
+            for port in order_by_frequency(ports):
+                self._slots.acquire()
+                probe = _Probe(host, port, (base + port) & 0xffffffff)
+                key = (ip, port)
+                while True:
+                    with self._lock:
+                        # même (ip, port) déjà en vol (autre job) : on attend qu'il se termine
+                        if key not in self._pending:
+                            self._pending[key] = probe
+                            self._queue.append(probe)
+                            break
+                    time.sleep(SYN_TICK)
+                self._wakeup.set()
+            host.done.wait()
+        return host.results.compact()
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._sender.join()
+        if self._sniffer is not None:
+            try:
+                self._sniffer.stop()
+            except Exception:
+                pass
+        else:
+            self._receiver.join()
+            for s in self._raw:
+                s.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
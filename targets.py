@@ -0,0 +1,145 @@
+# targets.py
+"""
+Listes de cibles : CIDR, IP seules, plages (10.0.0.1-10.0.0.50 ou 10.0.0.1-50),
+fichiers (une spec par ligne, # commentaires) et exclusions.
+Représentation interne : intervalles fusionnés d'entiers [debut, fin] inclus.
+"""
+import bisect
+import ipaddress
+import socket
+import struct
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+Interval = Tuple[int, int]
+
+def ip_to_int(ip: str) -> int:
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+def int_to_ip(n: int) -> str:
+    return socket.inet_ntoa(struct.pack("!I", n))
+
+def parse_spec(spec: str, hosts_only: bool = True) -> Interval:
+    """
+    Une spec -> intervalle. Les CIDR excluent réseau/broadcast comme network.hosts()
+    (sauf hosts_only=False, utilisé pour les exclusions).
+    """
+    spec = spec.strip()
+    if "/" in spec:
+        net = ipaddress.ip_network(spec, strict=False)
+        first, last = int(net.network_address), int(net.broadcast_address)
+        if hosts_only and net.prefixlen < 31:
+            first, last = first + 1, last - 1
+        return first, last
+    if "-" in spec:
+        lo, hi = (x.strip() for x in spec.split("-", 1))
+        start = ip_to_int(lo)
+        if hi.count(".") == 3:
+            end = ip_to_int(hi)
+        else:
+            # forme courte 10.0.0.1-50 : dernier octet seulement
+            if not hi.isdigit() or int(hi) > 255:
+                raise ValueError(f"dernier octet invalide: {spec}")
+            end = (start & 0xFFFFFF00) | int(hi)
+        if end < start:
+            raise ValueError(f"plage inversée: {spec}")
+        return start, end
+    n = ip_to_int(spec)
+    return n, n
+
+def _merge(intervals: Iterable[Interval]) -> List[Interval]:
+    out: List[Interval] = []
+    for a, b in sorted(intervals):
+        if out and a <= out[-1][1] + 1:
+            if b > out[-1][1]:
+                out[-1] = (out[-1][0], b)
+        else:
+            out.append((a, b))
+    return out
+
+def _subtract(intervals: List[Interval], excl: List[Interval]) -> List[Interval]:
+    out = []
+    j = 0
+    for a, b in intervals:
+        cur = a
+        while j < len(excl) and excl[j][1] < cur:
+            j += 1
+        k = j
+        while k < len(excl) and excl[k][0] <= b:
+            ea, eb = excl[k]
+            if ea > cur:
+                out.append((cur, ea - 1))
+            cur = max(cur, eb + 1)
+            k += 1
+        if cur <= b:
+            out.append((cur, b))
+    return out
+
+def read_spec_file(path: str) -> List[str]:
+    specs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.split("#", 1)[0]
+            specs += [t for t in ln.replace(",", " ").split() if t]
+    return specs
+
+def split_specs(text: Optional[str]) -> List[str]:
+    return [t for t in (text or "").replace(",", " ").split() if t]
+
+class TargetSet:
+    """Ensemble d'adresses IPv4 sous forme d'intervalles d'entiers triés et disjoints."""
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self.intervals = _merge(intervals)
+        self._starts = [a for a, _ in self.intervals]
+
+    @classmethod
+    def parse(cls, specs: Iterable[str], exclude: Iterable[str] = ()) -> "TargetSet":
+        inc = _merge(parse_spec(s) for s in specs)
+        exc = _merge(parse_spec(s, hosts_only=False) for s in exclude)
+        return cls(_subtract(inc, exc) if exc else inc)
+
+    def __len__(self):
+        return sum(b - a + 1 for a, b in self.intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def __contains__(self, ip) -> bool:
+        n = ip_to_int(ip) if isinstance(ip, str) else int(ip)
+        i = bisect.bisect_right(self._starts, n) - 1
+        return i >= 0 and n <= self.intervals[i][1]
+
+    def iter_ints(self) -> Iterator[int]:
+        for a, b in self.intervals:
+            yield from range(a, b + 1)
+
+    def iter_ips(self) -> Iterator[str]:
+        for n in self.iter_ints():
+            yield int_to_ip(n)
+
+    def shard(self, n: int, block: int = 256) -> List["TargetSet"]:
+        """
+        Découpe en n sous-ensembles : blocs de `block` adresses distribués en
+        round-robin, pour répartir les sous-réseaux denses entre les workers.
+        """
+        n = max(1, n)
+        parts: List[List[Interval]] = [[] for _ in range(n)]
+        k = 0
+        for a, b in self.intervals:
+            cur = a
+            while cur <= b:
+                end = min(b, cur + block - 1)
+                parts[k % n].append((cur, end))
+                k += 1
+                cur = end + 1
+        return [TargetSet(p) for p in parts]
+
+    def spec(self) -> str:
+        """Forme texte re-parsable (plages a-b)."""
+        return ",".join(int_to_ip(a) if a == b else f"{int_to_ip(a)}-{int_to_ip(b)}"
+                        for a, b in self.intervals)
+
+    def __str__(self):
+        if len(self.intervals) <= 4:
+            return self.spec()
+        return f"{len(self)} adresses en {len(self.intervals)} plages"
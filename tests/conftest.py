@@ -0,0 +1,8 @@
+# conftest.py : modules du dépôt à plat, importables depuis tests/
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# caches persistés (noms, OS, interfaces) hors du cache utilisateur
+os.environ.setdefault("SCAN_CACHE_DIR", tempfile.mkdtemp(prefix="scan-tests-"))
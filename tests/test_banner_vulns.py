@@ -0,0 +1,20 @@
+# test_banner_vulns.py
+from port_scan_win import check_vulns_from_banner
+
+DB = {
+    "Apache": {"vulnerable_versions": ["2.4.49-2.4.50"], "notes": "traversal"},
+    "OpenSSL": {"vulnerable_versions": ["<1.1.0"], "notes": "openssl"},
+}
+
+def test_service_and_banner_merged():
+    service = {"name": "http", "product": "Apache", "version": "2.4.49"}
+    found = check_vulns_from_banner("Server: Apache/2.4.49 OpenSSL/1.0.2k", DB, service)
+    assert [(v["product"], v["version"]) for v in found] == [
+        ("Apache", "2.4.49"), ("OpenSSL", "1.0.2")]
+
+def test_service_only_or_banner_only():
+    service = {"name": "http", "product": "Apache", "version": "2.4.50"}
+    assert check_vulns_from_banner(None, DB, service)[0]["notes"] == "traversal"
+    assert check_vulns_from_banner("OpenSSL/1.0.2k", DB)[0]["notes"] == "openssl"
+    assert check_vulns_from_banner("nginx/1.25.0", DB) is None
+    assert check_vulns_from_banner("Apache/2.4.49", {}) is None
@@ -0,0 +1,71 @@
+# test_baseline.py
+import pytest
+
+from result_export import export_results_flat
+from result_store import HostServices
+from scan_baseline import ScanBaseline, load_export
+
+def _host(ip, opened, closed=range(1, 1001)):
+    hs = HostServices(ip)
+    for p in closed:
+        if p not in opened:
+            hs.add({"ip": ip, "port": p, "state": "closed"})
+    for p, banner in opened.items():
+        hs.add({"ip": ip, "port": p, "state": "open", "banner": banner})
+    return {"ip": ip, "mac": None, "hostname": None, "os": None, "services": hs.compact()}
+
+@pytest.fixture
+def runs(tmp_path):
+    old = tmp_path / "old.json"
+    new = tmp_path / "new.ndjson"
+    export_results_flat([_host("10.0.0.1", {22: "SSH-2.0-OpenSSH_7.4", 80: "nginx"})],
+                        str(old), "json", skip_closed=True)
+    export_results_flat([_host("10.0.0.1", {22: "SSH-2.0-OpenSSH_7.4", 80: "nginx"}),
+                         _host("10.0.0.2", {443: "tls"})],
+                        str(new), "ndjson", skip_closed=True)
+    return [str(old), str(new)]
+
+def test_load_export_formats(runs, tmp_path):
+    old = load_export(runs[0])
+    assert old["10.0.0.1"].is_closed(25) and old["10.0.0.1"].get(22)["state"] == "open"
+    csv_path = tmp_path / "run.csv"
+    export_results_flat([_host("10.0.0.3", {8080: "http"}, closed=range(1, 10))], str(csv_path), "csv")
+    hs = load_export(str(csv_path))["10.0.0.3"]
+    assert hs.get(8080)["banner"] == "http" and hs.closed_count == 9
+
+def test_known_ports_first_and_stable_ports_skipped(runs):
+    base = ScanBaseline(runs, skip_stable=2)
+    assert base.plan_ports("10.0.0.1", [25, 5000, 80, 22]) == ([80, 22], [5000])
+    # fermé dans un seul run : pas encore stable
+    assert base.plan_ports("10.0.0.2", [25, 443]) == ([443], [25])
+    calls = []
+
+    def scan(ip, ports):
+        calls.append(list(ports))
+        return HostServices(ip, [{"ip": ip, "port": p, "state": "closed"} for p in ports])
+
+    base.wrap_scan(scan)("10.0.0.1", [25, 5000, 80, 22])
+    assert calls == [[80, 22], [5000]]
+    assert base.skipped == 2
+
+def test_known_hosts_probed_first(runs):
+    base = ScanBaseline(runs)
+    probe = lambda ip, ports: 1.0 if ip == "10.0.0.2" else None
+    ips = list(base.source({"10.0.0.1", "10.0.0.2"}, lambda: ["10.0.0.5", "10.0.0.2", "10.0.0.1"], probe))
+    assert ips == ["10.0.0.2", "10.0.0.5", "10.0.0.1"]
+
+def test_change_report(runs):
+    base = ScanBaseline(runs)
+    scan = base.wrap_scan(lambda ip, ports: HostServices(ip))
+    scan("10.0.0.1", [22, 80, 8080])
+    base.observe_host({"ip": "10.0.0.1", "services": [
+        {"ip": "10.0.0.1", "port": 22, "state": "open", "banner": "SSH-2.0-OpenSSH_9.6"},
+        {"ip": "10.0.0.1", "port": 80, "state": "filtered"},
+        {"ip": "10.0.0.1", "port": 8080, "state": "open", "banner": "jetty"}]})
+    base.observe_host({"ip": "10.0.0.9", "services": []})
+    report = base.report(targets={"10.0.0.1", "10.0.0.2", "10.0.0.9"})
+    assert report["new_hosts"] == ["10.0.0.9"] and report["gone_hosts"] == ["10.0.0.2"]
+    assert report["opened"] == [{"ip": "10.0.0.1", "port": 8080, "service": "jetty"}]
+    assert report["closed"] == [{"ip": "10.0.0.1", "port": 80, "state": "filtered", "was": "nginx"}]
+    assert report["changed"] == [{"ip": "10.0.0.1", "port": 22,
+                                  "before": "SSH-2.0-OpenSSH_7.4", "after": "SSH-2.0-OpenSSH_9.6"}]
@@ -0,0 +1,143 @@
+# test_daemon.py
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import scan_daemon
+
+@pytest.fixture(scope="module")
+def daemon():
+    d = scan_daemon.ScanDaemon(engine="thread", scan_workers=2, post_workers=2)
+    yield d
+    d.close()
+
+def _serve(daemon, **kw):
+    server = scan_daemon.make_server(daemon, "127.0.0.1", 0, **kw)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@pytest.fixture(scope="module")
+def server(daemon):
+    server = _serve(daemon)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+def _post_job(server, spec, ctype="application/json"):
+    return _request(server, "POST", "/jobs", json.dumps(spec), {"Content-Type": ctype})
+
+@pytest.fixture
+def listener():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    s.listen(16)
+    yield s.getsockname()[1]
+    s.close()
+
+def test_job_roundtrip(server, listener):
+    status, body = _post_job(server, {"target": "127.0.0.1", "ports": [listener], "discover": False})
+    assert status == 202
+    job = json.loads(body)
+    status, body = _request(server, "GET", f"/jobs/{job['id']}/results")
+    assert status == 200
+    hosts = [json.loads(ln) for ln in body.decode().splitlines()]
+    assert [(s["port"], s["state"]) for s in hosts[0]["services"]] == [(listener, "open")]
+    status, body = _request(server, "GET", f"/jobs/{job['id']}")
+    assert json.loads(body)["state"] == "done"
+
+def test_invalid_job_is_400(server):
+    status, body = _post_job(server, {"target": "10.0.0.250-300"})
+    assert status == 400 and "cible invalide" in json.loads(body)["error"]
+
+def test_cross_origin_simple_post_rejected(server):
+    # formulaire / fetch no-cors d'une page web : text/plain, pas de preflight
+    status, _ = _post_job(server, {"target": "127.0.0.1"}, ctype="text/plain")
+    assert status == 415
+    status, _ = _request(server, "POST", "/jobs", json.dumps({"target": "127.0.0.1"}))
+    assert status == 415
+
+@pytest.mark.parametrize("host", ["evil.example", "evil.example:8765", "10.0.0.1:8765", ""])
+def test_foreign_host_header_rejected(server, host):
+    # DNS rebinding : le navigateur envoie le nom du site attaquant
+    assert _request(server, "GET", "/jobs", headers={"Host": host})[0] == 403
+    status, _ = _request(server, "POST", "/jobs", json.dumps({"target": "127.0.0.1"}),
+                         {"Host": host, "Content-Type": "application/json"})
+    assert status == 403
+
+@pytest.mark.parametrize("host", ["localhost", "127.0.0.1:1234", "[::1]:8765", "LOCALHOST:80"])
+def test_loopback_host_header_accepted(server, host):
+    status, _ = _request(server, "GET", "/health", headers={"Host": host})
+    assert status == 200
+
+def test_malformed_content_length_is_400(server):
+    with socket.create_connection(("127.0.0.1", server.server_address[1]), timeout=10) as s:
+        s.sendall(b"POST /jobs HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                  b"Content-Length: abc\r\nConnection: close\r\n\r\n{}")
+        reply = b""
+        while True:
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    assert reply.startswith(b"HTTP/1.0 400") or reply.startswith(b"HTTP/1.1 400")
+
+def test_token_required_when_set(daemon):
+    server = _serve(daemon, token="s3cret")
+    try:
+        assert _request(server, "GET", "/health")[0] == 401
+        assert _request(server, "GET", "/health", headers={"Authorization": "Bearer nope"})[0] == 401
+        assert _request(server, "GET", "/health", headers={"Authorization": "Bearer s3cret"})[0] == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_non_loopback_listen_refused(daemon):
+    with pytest.raises(ValueError):
+        scan_daemon.make_server(daemon, "0.0.0.0", 0)
+    with pytest.raises(ValueError):
+        scan_daemon.make_server(daemon, "0.0.0.0", 0, allow_remote=True)
+
+def test_caches_saved_after_each_job(server, listener):
+    from name_resolution import get_resolver
+    cache = get_resolver().cache
+    cache.set("192.0.2.1", "dirty.example")
+    status, body = _post_job(server, {"target": "127.0.0.1", "ports": [listener], "discover": False})
+    job = json.loads(body)
+    _request(server, "GET", f"/jobs/{job['id']}/results")
+    with open(cache.path, encoding="utf-8") as f:
+        assert "192.0.2.1" in json.load(f)
+
+def test_sigterm_stops_daemon_cleanly(tmp_path):
+    import os
+    import signal
+    import subprocess
+    import sys
+    import time
+    cli = os.path.join(os.path.dirname(scan_daemon.__file__), "cli_scan_main.py")
+    env = dict(os.environ, SCAN_CACHE_DIR=str(tmp_path))
+    p = subprocess.Popen([sys.executable, "-u", cli, "daemon", "--listen", "127.0.0.1:0", "--engine", "thread"],
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+    try:
+        deadline = time.time() + 20
+        line = ""
+        while "à l'écoute" not in line and time.time() < deadline:
+            line = p.stdout.readline()
+        assert "à l'écoute" in line
+        p.send_signal(signal.SIGTERM)
+        out, _ = p.communicate(timeout=20)
+    finally:
+        if p.poll() is None:
+            p.kill()
+    assert p.returncode == 0
+    assert "Arrêt du démon" in out
@@ -0,0 +1,59 @@
+# test_export.py
+import csv
+import json
+
+import pytest
+
+import result_export
+from result_export import StreamingExporter, export_results_flat
+from result_store import HostServices
+
+def _host(i):
+    ip = f"10.0.0.{i}"
+    hs = HostServices(ip, [{"ip": ip, "port": p, "state": "closed"} for p in range(1, 101) if p != 22])
+    hs.add({"ip": ip, "port": 22, "state": "open", "banner": "SSH-2.0-OpenSSH_7.4",
+            "service": {"name": "ssh", "product": "OpenSSH", "version": "7.4"},
+            "vulns": [{"product": "OpenSSH", "version": "7.4", "notes": "ssh"}]})
+    return {"ip": ip, "mac": None, "hostname": f"h{i}", "os": {"ttl": 64, "os_guess": "Linux"},
+            "services": hs.compact()}
+
+def test_ndjson_one_line_per_host_flushed_while_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_export, "FLUSH_EVERY", 2)
+    path = tmp_path / "scan.ndjson"
+    with StreamingExporter(str(path), "ndjson", skip_closed=True) as exp:
+        for i in range(1, 4):
+            exp.write_host(_host(i))
+        # run interrompu ici : les lots déjà flushés sont lisibles
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    hosts = [json.loads(ln) for ln in path.read_text(encoding="utf-8").splitlines()]
+    assert [h["ip"] for h in hosts] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert [s["port"] for s in hosts[0]["services"]] == [22]
+    assert hosts[0]["closed"] == {"count": 99, "ranges": "1-21,23-100"}
+
+def test_ndjson_full_keeps_every_port(tmp_path):
+    path = tmp_path / "scan.ndjson"
+    with StreamingExporter(str(path), "ndjson") as exp:
+        exp.write_host(_host(1))
+    [host] = [json.loads(ln) for ln in path.read_text(encoding="utf-8").splitlines()]
+    assert len(host["services"]) == 100
+
+def test_csv_rows(tmp_path):
+    path = tmp_path / "scan.csv"
+    with StreamingExporter(str(path), "csv", skip_closed=True) as exp:
+        exp.write_host(_host(1))
+        exp.write_host(_host(2))
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["ip"], r["port"], r["state"]) for r in rows] == [("10.0.0.1", "22", "open"), ("10.0.0.2", "22", "open")]
+    assert rows[0]["service"] == "ssh OpenSSH 7.4"
+    assert json.loads(rows[0]["vulns"])[0]["notes"] == "ssh"
+
+def test_stream_rejects_json(tmp_path):
+    with pytest.raises(ValueError):
+        StreamingExporter(str(tmp_path / "scan.json"), "json")
+
+def test_flat_json_skip_closed(tmp_path):
+    path = tmp_path / "scan.json"
+    export_results_flat([_host(1)], str(path), "json", skip_closed=True)
+    [host] = json.loads(path.read_text(encoding="utf-8"))
+    assert host["closed"]["count"] == 99 and len(host["services"]) == 1
@@ -0,0 +1,76 @@
+# test_history.py
+import os
+import sqlite3
+import time
+
+import pytest
+
+import scan_history
+from scan_history import HistoryWriter, list_scans, parse_when, query
+
+def _host(ip, openssh="7.4", vulns=None):
+    services = [{"ip": ip, "port": p, "state": "closed"} for p in range(1, 21)]
+    services.append({"ip": ip, "port": 22, "state": "open", "rtt_ms": 1.5, "banner": f"SSH-2.0-OpenSSH_{openssh}",
+                     "service": {"name": "ssh", "product": "OpenSSH", "version": openssh}, "vulns": vulns})
+    return {"ip": ip, "mac": None, "hostname": f"h{ip.split('.')[-1]}", "os": {"ttl": 64, "os_guess": "Linux"},
+            "services": services}
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "history.db")
+    vuln = [{"product": "OpenSSH", "version": "7.4", "notes": "ssh"}]
+    with HistoryWriter(path, {"cmd": "scan", "target": "10.0.0.0/30", "ports": list(range(1, 21))}) as w:
+        for i in (1, 2, 3):
+            w.write_host(_host(f"10.0.0.{i}", vulns=vuln))
+    time.sleep(0.01)
+    with HistoryWriter(path, {"cmd": "scan", "target": "10.0.0.1", "ports": [22]}) as w:
+        w.write_host(_host("10.0.0.1", openssh="9.6"))
+    return path
+
+def test_runs_and_hosts_recorded(db):
+    scans = list_scans(db)
+    assert [(s["scan_id"], s["hosts"], s["open_ports"]) for s in scans] == [(2, 1, 1), (1, 3, 3)]
+    conn = sqlite3.connect(db)
+    try:
+        assert conn.execute("SELECT closed_count, closed_ranges FROM hosts WHERE id = 1").fetchone() == (20, "1-20")
+        assert conn.execute("SELECT ports FROM scans WHERE id = 1").fetchone()[0] == "1-20"
+        # bannière identique sur trois hôtes : une seule ligne
+        assert conn.execute("SELECT COUNT(*) FROM banners").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+def test_query_filters(db):
+    rows = list(query(db, ip="10.0.0.1"))
+    assert [(r["scan_id"], r["version"]) for r in rows] == [(2, "9.6"), (1, "7.4")]
+    assert [r["ip"] for r in query(db, ip="10.0.0.2-3", ports=[22])] == ["10.0.0.2", "10.0.0.3"]
+    assert len(list(query(db, product="openssh", version="<8"))) == 3
+    assert len(list(query(db, latest=True))) == 3
+    assert list(query(db, ports=[80])) == []
+    assert list(query(db, state="closed")) == []         # ports fermés gardés en plages seulement
+    assert len(list(query(db, banner="OpenSSH_9"))) == 1
+    assert len(list(query(db, limit=2))) == 2
+
+def test_query_vulns_batched(db, monkeypatch):
+    monkeypatch.setattr(scan_history, "QUERY_BATCH", 2)
+    rows = list(query(db, vulnerable=True))
+    assert len(rows) == 3
+    assert all(r["vulns"] == [{"product": "OpenSSH", "version": "7.4", "notes": "ssh"}] for r in rows)
+    assert [r["vulns"] for r in query(db, version="9.6")] == [None]
+
+def test_query_readonly_on_missing_db(tmp_path):
+    path = str(tmp_path / "typo.db")
+    with pytest.raises(FileNotFoundError):
+        list(query(path))
+    with pytest.raises(FileNotFoundError):
+        list_scans(path)
+    assert not os.path.exists(path)
+
+def test_bad_version_spec(db):
+    with pytest.raises(ValueError):
+        list(query(db, version="<x"))
+
+def test_parse_when():
+    assert abs(parse_when("2d") - (time.time() - 2 * 86400)) < 5
+    assert parse_when("2026-01-02") == time.mktime(time.strptime("2026-01-02", "%Y-%m-%d"))
+    with pytest.raises(ValueError):
+        parse_when("last tuesday")
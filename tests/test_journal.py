@@ -0,0 +1,57 @@
+# test_journal.py
+from result_store import HostServices
+from scan_journal import ScanJournal
+
+META = {"cmd": "full", "target": "10.0.0.0/29", "ports": "22,80,443"}
+
+def fake_scan(calls):
+    def scan(ip, ports, on_result=None):
+        calls.append((ip, list(ports)))
+        hs = HostServices(ip)
+        for p in ports:
+            r = {"ip": ip, "port": p, "state": "open" if p == 22 else "closed"}
+            if on_result:
+                on_result(r)
+            hs.add(r)
+        return hs.compact()
+    return scan
+
+def interrupted_run(path):
+    """Run coupé : 10.0.0.1 terminé, 10.0.0.2 scanné à moitié, 10.0.0.3 découvert."""
+    j = ScanJournal(str(path)).open(META)
+    for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+        j.record_discovered(ip)
+    scan = j.wrap_scan(fake_scan([]))
+    scan("10.0.0.1", [22, 80, 443])
+    j.record_host({"ip": "10.0.0.1", "mac": None, "hostname": "a", "os": {"ttl": 64}})
+    scan("10.0.0.2", [22])
+    j.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["P",{"ip":"10.0.0.2","po')      # ligne tronquée par le crash
+
+def test_load_skips_truncated_line(tmp_path):
+    path = tmp_path / "scan.journal"
+    interrupted_run(path)
+    j = ScanJournal.load(str(path))
+    assert j.meta == META
+    assert j.discovered == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert not j.discovery_done
+    [host] = list(j.finished_hosts())
+    assert host["hostname"] == "a" and host["services"].get(22)["state"] == "open"
+
+def test_resume_skips_finished_work(tmp_path):
+    path = tmp_path / "scan.journal"
+    interrupted_run(path)
+    j = ScanJournal.load(str(path)).open(META)
+    ips = list(j.source(lambda: ["10.0.0.1", "10.0.0.4"]))
+    assert ips == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    calls = []
+    scan = j.wrap_scan(fake_scan(calls))
+    merged = scan("10.0.0.2", [22, 80, 443])
+    assert calls == [("10.0.0.2", [80, 443])]
+    assert merged.port_set() == {22, 80, 443}
+    j.close()
+    # la découverte est maintenant marquée terminée : plus relancée
+    again = ScanJournal.load(str(path))
+    assert again.discovery_done and "10.0.0.4" in again.discovered
+    assert list(again.source(lambda: ["10.0.0.9"])) == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
@@ -0,0 +1,43 @@
+# test_name_resolution.py
+import socket
+import time
+
+import pytest
+
+from name_resolution import NameResolver
+from ttl_cache import MISS, TtlCache
+
+SLOW = {"10.0.0.1": 1.0, "10.0.0.2": 1.0, "10.0.0.9": 0.4}
+
+def fake_gethostbyaddr(ip):
+    time.sleep(SLOW.get(ip, 0.01))
+    if ip == "10.0.0.66":
+        raise socket.herror(1, "Unknown host")
+    return (f"host-{ip.split('.')[-1]}", [], [ip])
+
+@pytest.fixture
+def resolver(monkeypatch):
+    monkeypatch.setattr(socket, "gethostbyaddr", fake_gethostbyaddr)
+    r = NameResolver(workers=2, timeout=0.2, cache=TtlCache())
+    yield r
+    r.close()
+
+def test_resolve_and_cache(resolver):
+    assert resolver.resolve("10.0.0.5") == "host-5"
+    assert resolver.cache.get("10.0.0.5") == "host-5"
+    assert resolver.resolve("10.0.0.66") is None
+    assert resolver.cache.get("10.0.0.66") is None      # absence de nom : cache négatif
+
+def test_timeout_not_cached_as_no_name(resolver):
+    assert resolver.resolve("10.0.0.9") is None
+    assert resolver.cache.get("10.0.0.9") is MISS
+    time.sleep(0.4)
+    # la réponse tardive remplit le cache
+    assert resolver.cache.get("10.0.0.9") == "host-9"
+
+def test_queued_lookup_timeout_starts_when_it_runs(resolver):
+    # les deux lookups lents occupent le pool DNS bien au-delà du timeout
+    futures = [resolver.submit(ip) for ip in ("10.0.0.1", "10.0.0.2")]
+    time.sleep(0.05)
+    assert resolver.resolve("10.0.0.7") == "host-7"
+    assert [f.result() for f in futures] == [None, None]
@@ -0,0 +1,80 @@
+# test_pipeline.py
+import socket
+import threading
+import time
+
+from port_scan_win import scan_host_ports
+from scan_pipeline import ScanPipeline, run_pipeline
+
+def fake_scan(ip, ports):
+    if ip == "10.0.0.1":
+        time.sleep(0.5)       # hôte lent
+    if ip == "10.0.0.4":
+        raise OSError("boom")
+    return [{"port": p, "state": "open"} for p in ports]
+
+def fake_os(ip, mac):
+    return {"ttl": 64, "os_guess": "Linux/Unix (estimation)"}
+
+def fake_enrich(ip):
+    return {"ip": ip, "mac": "aa:bb:cc:dd:ee:ff", "hostname": f"h{ip.split('.')[-1]}"}
+
+KW = dict(os_fn=fake_os, enrich_fn=fake_enrich, prefetch_fn=None, scan_workers=4, post_workers=2)
+
+def test_slow_host_does_not_block_others():
+    ips = [f"10.0.0.{i}" for i in range(1, 9)]
+    order = [h["ip"] for h in ScanPipeline([80], scan_fn=fake_scan, **KW).run(ips)]
+    assert sorted(order) == sorted(ips)
+    assert order[-1] == "10.0.0.1"
+
+def test_entries_and_failures():
+    hosts = run_pipeline(["10.0.0.10", "10.0.0.4", "10.0.0.2"], [22, 80], scan_fn=fake_scan, **KW)
+    assert [h["ip"] for h in hosts] == ["10.0.0.2", "10.0.0.4", "10.0.0.10"]
+    assert hosts[0]["hostname"] == "h2" and hosts[0]["mac"] == "aa:bb:cc:dd:ee:ff"
+    assert hosts[0]["os"]["ttl"] == 64 and len(hosts[0]["services"]) == 2
+    assert hosts[1]["services"] == []       # scan en échec : hôte quand même rendu
+
+def test_discovered_host_not_enriched_again():
+    def no_enrich(ip):
+        raise AssertionError("enrich inattendu")
+
+    kw = dict(KW, enrich_fn=no_enrich)
+    host = {"ip": "10.0.0.3", "mac": "00:11:22:33:44:55", "hostname": "known"}
+    [entry] = run_pipeline([host], [80], scan_fn=fake_scan, **kw)
+    assert entry["hostname"] == "known"
+
+def test_streaming_without_keep_and_broken_source():
+    def source():
+        yield "10.0.0.2"
+        raise RuntimeError("découverte cassée")
+
+    seen = []
+    assert run_pipeline(source(), [80], on_host=seen.append, keep=False, scan_fn=fake_scan, **KW) == []
+    assert [h["ip"] for h in seen] == ["10.0.0.2"]
+
+def test_real_scan_on_loopback():
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(8)
+    port = srv.getsockname()[1]
+    stop = threading.Event()
+
+    def accept():
+        srv.settimeout(0.2)
+        while not stop.is_set():
+            try:
+                srv.accept()[0].close()
+            except OSError:
+                pass
+
+    t = threading.Thread(target=accept, daemon=True)
+    t.start()
+    try:
+        scan = lambda ip, ports: scan_host_ports(ip, ports, realtime_print=False)
+        [entry] = run_pipeline(["127.0.0.1"], [port], scan_fn=scan, **KW)
+    finally:
+        stop.set()
+        t.join()
+        srv.close()
+    states = {s["port"]: s["state"] for s in entry["services"]}
+    assert states[port] == "open"
@@ -0,0 +1,27 @@
+# test_ports.py
+import pytest
+
+from ports import MAX_PORT, order_by_frequency, parse_ports, top_ports
+
+def test_parse_ports():
+    assert parse_ports("22,80,1-3,80,2") == [22, 80, 1, 2, 3]
+    assert parse_ports("65530-") == list(range(65530, MAX_PORT + 1))
+    assert parse_ports("-3") == [1, 2, 3]
+    assert len(parse_ports("all")) == MAX_PORT
+
+@pytest.mark.parametrize("spec", ["0", "70000", "10-5", "abc", "", ","])
+def test_parse_ports_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_ports(spec)
+
+def test_top_ports():
+    top = top_ports(100)
+    assert len(top) == len(set(top)) == 100
+    assert 80 in top[:10] and 443 in top[:20]
+    assert len(set(top_ports(5000))) == 5000
+    assert 53 in top_ports(10, "udp")
+
+def test_order_by_frequency():
+    ordered = order_by_frequency([60001, 60000, 22, 80])
+    assert set(ordered[:2]) == {22, 80}
+    assert ordered[2:] == [60000, 60001]
@@ -0,0 +1,55 @@
+# test_rate_limit.py
+import argparse
+import time
+
+import pytest
+
+import rate_limit
+from cli_scan_main import check_rate_args
+from rate_limit import RateLimiter
+
+def test_disabled_by_default():
+    limiter = RateLimiter()
+    assert not limiter.enabled
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.5
+
+def test_token_bucket_paces_probes():
+    limiter = RateLimiter(max_rate=200, burst=1)
+    start = time.monotonic()
+    for _ in range(21):
+        limiter.acquire()
+    # 1 jeton de rafale puis 20 à 200/s
+    assert time.monotonic() - start >= 0.09
+
+def test_min_rate_clamped_to_max_rate():
+    limiter = RateLimiter(max_rate=100, min_rate=500, adaptive=True)
+    assert limiter.min_rate == 100
+
+def test_adaptive_backoff_and_recovery(monkeypatch):
+    monkeypatch.setattr(rate_limit, "report", lambda *a, **k: None)
+    limiter = RateLimiter(max_rate=1000, min_rate=400, adaptive=True)
+    for _ in range(5):
+        for _ in range(rate_limit.ADAPT_WINDOW):
+            limiter.record(False)
+    assert limiter.rate == 400
+    for _ in range(10):
+        for _ in range(rate_limit.ADAPT_WINDOW):
+            limiter.record(True)
+    assert limiter.rate == 1000
+
+def test_not_adaptive_without_max_rate():
+    limiter = RateLimiter(min_rate=10, adaptive=True)
+    assert not limiter.adaptive and not limiter.enabled
+
+@pytest.mark.parametrize("max_rate,adaptive", [(None, False), (100, False), (None, True)])
+def test_min_rate_requires_adaptive_rate(max_rate, adaptive):
+    args = argparse.Namespace(min_rate=10, max_rate=max_rate, adaptive_rate=adaptive)
+    with pytest.raises(SystemExit):
+        check_rate_args(args)
+
+def test_min_rate_accepted_with_adaptive_rate():
+    check_rate_args(argparse.Namespace(min_rate=10, max_rate=100, adaptive_rate=True))
+    check_rate_args(argparse.Namespace(min_rate=None, max_rate=None, adaptive_rate=False))
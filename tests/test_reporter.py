@@ -0,0 +1,79 @@
+# test_reporter.py
+import json
+import sys
+import threading
+
+from scan_reporter import Reporter, format_event
+
+HOST = {"ip": "10.0.0.1", "mac": None, "hostname": "h1", "os": {"ttl": 64, "os_guess": "Linux"},
+        "services": [{"ip": "10.0.0.1", "port": 22, "state": "open", "banner": "SSH-2.0"},
+                     {"ip": "10.0.0.1", "port": 23, "state": "closed"}]}
+
+def test_format_event():
+    assert format_event("info", {"msg": "[+] ok"}) == "[+] ok\n"
+    assert format_event("host_alive", {"ip": "10.0.0.1", "via": "arp"}) is None
+    line = format_event("port_open", {"ip": "10.0.0.1", "port": 22, "banner": "SSH-2.0",
+                                      "vulns": [{"product": "OpenSSH", "version": "7.4", "notes": "x"}]})
+    assert "10.0.0.1:22 OPEN" in line and "VULN: OpenSSH 7.4" in line
+    assert format_event("unknown", {}) is None
+
+def test_emit_prints_directly_when_not_started(capsys):
+    Reporter().emit("info", msg="[+] direct")
+    assert capsys.readouterr().out == "[+] direct\n"
+
+def test_events_file_and_console(tmp_path, capsys):
+    events = tmp_path / "events.ndjson"
+    stdout = sys.stdout
+    r = Reporter().start(progress=False, events=str(events))
+    r.emit("host_queued", ip="10.0.0.1")
+    print("[+] via print")
+    r.emit("host_done", host=HOST)
+    r.stop()
+    assert sys.stdout is stdout
+    out = capsys.readouterr().out
+    assert "[+] via print" in out and "10.0.0.1" in out
+    lines = [json.loads(ln) for ln in events.read_text(encoding="utf-8").splitlines()]
+    kinds = [ev["event"] for ev in lines]
+    assert kinds[:2] == ["host_queued", "host_done"] and kinds[-1] == "progress"
+    # ports fermés résumés, pas un objet par port
+    assert lines[1]["host"]["services"] == [HOST["services"][0]]
+    assert lines[-1]["hosts_done"] == 1
+
+def test_events_on_stdout_keep_human_text_on_stderr(capsys):
+    r = Reporter().start(events="-")
+    assert r.owns_console and not r.progress
+    r.emit("info", msg="[+] humain")
+    print("[+] aussi")
+    r.stop()
+    captured = capsys.readouterr()
+    events = [json.loads(ln) for ln in captured.out.splitlines()]
+    assert events[0] == {"t": events[0]["t"], "event": "info", "msg": "[+] humain"}
+    assert "[+] aussi" in captured.err and "[+] humain" not in captured.err
+
+def test_progress_mode_hides_per_port_lines(capsys):
+    r = Reporter().start(progress=True, targets=1, ports_per_host=2)
+    r.emit("port_open", ip="10.0.0.1", port=22)
+    r.emit("error", msg="[!] visible")
+    r.stop()
+    out = capsys.readouterr().out
+    assert "OPEN" not in out and "[!] visible" in out
+    assert out.rstrip("\n").splitlines()[-1].startswith("[~]")
+
+def test_no_event_lost_across_threads(tmp_path, capsys):
+    events = tmp_path / "events.ndjson"
+    r = Reporter().start(progress=False, events=str(events))
+
+    def worker(i):
+        for n in range(200):
+            r.emit("host_queued", ip=f"10.{i}.0.{n}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    r.flush()
+    r.stop()
+    capsys.readouterr()
+    kinds = [json.loads(ln)["event"] for ln in events.read_text(encoding="utf-8").splitlines()]
+    assert kinds.count("host_queued") == 1600 and r.hosts_queued == 1600
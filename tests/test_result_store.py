@@ -0,0 +1,54 @@
+# test_result_store.py
+import json
+import pickle
+
+from result_store import HostServices, format_ranges, iter_services, json_default, parse_ranges
+
+def _host(closed=range(1, 1001), opened=(22, 80)) -> HostServices:
+    hs = HostServices("10.0.0.1")
+    for p in closed:
+        if p not in opened:
+            hs.add({"ip": "10.0.0.1", "port": p, "state": "closed"})
+    for p in opened:
+        hs.add({"ip": "10.0.0.1", "port": p, "state": "open", "rtt_ms": 1.234, "banner": f"b{p}"})
+    hs.add({"ip": "10.0.0.1", "port": 5000, "state": "filtered"})
+    return hs.compact()
+
+def test_ranges_roundtrip():
+    ranges = [(1, 21), (23, 79), (81, 1000)]
+    assert format_ranges(ranges) == "1-21,23-79,81-1000"
+    assert parse_ranges("81-1000,1-21,23-79,5,6") == [(1, 21), (23, 79), (81, 1000)]
+    assert parse_ranges("") == []
+
+def test_closed_ports_folded_into_ranges():
+    hs = _host()
+    assert hs.closed_ranges() == [(1, 21), (23, 79), (81, 1000)]
+    assert hs.closed_count == 998
+    assert len(hs) == 1001
+    assert hs.is_closed(500) and not hs.is_closed(22) and not hs.is_closed(1001)
+    assert hs.get(22)["banner"] == "b22" and hs.get(22)["rtt_ms"] == 1.23
+    assert hs.get(7)["state"] == "closed" and hs.get(4242) is None
+    assert [s["port"] for s in hs.open_services()] == [22, 80]
+    assert [s["state"] for s in hs.interesting()] == ["open", "open", "filtered"]
+
+def test_summary_and_from_export_roundtrip():
+    hs = _host()
+    summary = json.loads(json.dumps(hs.summary()))
+    back = HostServices.from_export(hs.ip, summary["services"], summary["closed"])
+    assert back.closed_ranges() == hs.closed_ranges()
+    assert list(back) == list(hs)
+
+def test_json_default_expands_full_list():
+    hs = _host(closed=range(1, 4), opened=(2,))
+    assert json.loads(json.dumps(hs, default=json_default)) == hs.to_list()
+    assert len(hs.to_list()) == 4
+
+def test_pickle_keeps_compact_state():
+    hs = _host()
+    back = pickle.loads(pickle.dumps(hs))
+    assert list(back) == list(hs)
+
+def test_iter_services_accepts_lists():
+    services = [{"port": 1, "state": "closed"}, {"port": 2, "state": "open"}]
+    assert [s["port"] for s in iter_services(services, include_closed=False)] == [2]
+    assert len(list(iter_services(_host(), include_closed=False))) == 3
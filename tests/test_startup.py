@@ -0,0 +1,20 @@
+# test_startup.py
+"""Budget de démarrage du CLI (mêmes mesures que `bench_scan.py --only startup`)."""
+import os
+
+import pytest
+
+import bench_scan
+
+CLI = os.path.join(bench_scan.HERE, "cli_scan_main.py")
+
+@pytest.mark.parametrize("cli_args", [["--help"], ["scan", "--help"], ["query", "--help"],
+                                      ["build-vuln-index", "--help"]])
+def test_help_imports_no_lazy_module(cli_args):
+    assert bench_scan._eager_modules(CLI, cli_args) == []
+
+# chronométrage sensible à la charge de la machine : seulement sur demande (SCAN_BENCH_STARTUP=1)
+@pytest.mark.skipif(not os.environ.get("SCAN_BENCH_STARTUP"), reason="SCAN_BENCH_STARTUP non défini")
+def test_help_overhead_within_budget():
+    result = bench_scan.bench_startup(0.5)
+    assert result["help_overhead_s"] * 1000 <= bench_scan.STARTUP_BUDGET_MS
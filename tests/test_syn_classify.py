@@ -0,0 +1,84 @@
+# test_syn_classify.py
+"""Tri des paquets reçus par le moteur SYN (sans socket brut ni privilèges)."""
+import socket
+import struct
+import threading
+
+import pytest
+
+import os_detection
+from syn_scan import SynScanEngine, _HostScan, _Probe
+
+TARGET = "127.0.0.1"
+SPORT = 45000
+SEQ = 0xfffffff0
+
+def _ip(proto, payload, src=TARGET, dst=TARGET, ttl=57):
+    return struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 0, 0, ttl, proto, 0,
+                       socket.inet_aton(src), socket.inet_aton(dst)) + payload
+
+def _tcp(sport, dport, ack, flags):
+    return struct.pack("!HHIIBBHHH", sport, dport, 0, ack, 5 << 4, flags, 1024, 0, 0)
+
+def _icmp_unreach(code, dport, sport=SPORT):
+    inner = _ip(socket.IPPROTO_TCP, struct.pack("!HHI", sport, dport, SEQ))
+    return _ip(socket.IPPROTO_ICMP, struct.pack("!BBHI", 3, code, 0, 0) + inner, src="10.9.9.9")
+
+@pytest.fixture
+def engine(monkeypatch):
+    observed = []
+
+    class Detector:
+        def observe(self, ip, ttl, mac=None):
+            observed.append((ip, ttl))
+
+    monkeypatch.setattr(os_detection, "get_detector", lambda: Detector())
+    e = object.__new__(SynScanEngine)
+    e.sport = SPORT
+    e._lock = threading.Lock()
+    e._pending = {}
+    e._slots = threading.Semaphore(16)
+    e.host = _HostScan(TARGET, 1, False, None)
+    e.observed = observed
+    for port in (22, 80, 443):
+        e._pending[(TARGET, port)] = _Probe(e.host, port, SEQ)
+    return e
+
+def _state(engine, port):
+    r = engine.host.results.get(port)
+    return r["state"] if r else None
+
+def test_syn_ack_is_open(engine):
+    engine._on_datagram(_ip(socket.IPPROTO_TCP, _tcp(22, SPORT, (SEQ + 1) & 0xffffffff, 0x12)))
+    assert _state(engine, 22) == "open"
+    assert (TARGET, 22) not in engine._pending
+    assert engine.observed == [(TARGET, 57)]
+
+def test_rst_is_closed(engine):
+    engine._on_datagram(_ip(socket.IPPROTO_TCP, _tcp(80, SPORT, (SEQ + 1) & 0xffffffff, 0x14)))
+    assert _state(engine, 80) == "closed"
+
+@pytest.mark.parametrize("packet", [
+    _ip(socket.IPPROTO_TCP, _tcp(22, SPORT, SEQ, 0x12)),                          # mauvais ack
+    _ip(socket.IPPROTO_TCP, _tcp(22, SPORT + 1, (SEQ + 1) & 0xffffffff, 0x12)),   # autre port source
+    _ip(socket.IPPROTO_TCP, _tcp(22, SPORT, (SEQ + 1) & 0xffffffff, 0x10)),       # ACK seul
+    _ip(socket.IPPROTO_TCP, _tcp(8080, SPORT, (SEQ + 1) & 0xffffffff, 0x12)),     # port non sondé
+    _ip(socket.IPPROTO_TCP, b"\x00" * 6),                                         # tronqué
+    b"\x45" * 12,
+])
+def test_foreign_or_late_packets_ignored(engine, packet):
+    engine._on_datagram(packet)
+    assert len(engine._pending) == 3 and len(engine.host.results) == 0
+
+def test_icmp_unreachable_is_filtered(engine):
+    engine._on_datagram(_icmp_unreach(13, 443))
+    assert _state(engine, 443) == "filtered"
+
+@pytest.mark.parametrize("packet", [
+    _icmp_unreach(4, 443),                  # fragmentation nécessaire : pas un filtrage
+    _icmp_unreach(13, 443, sport=SPORT + 1),
+    _icmp_unreach(13, 443)[:40],
+])
+def test_other_icmp_ignored(engine, packet):
+    engine._on_datagram(packet)
+    assert (TARGET, 443) in engine._pending
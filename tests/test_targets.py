@@ -0,0 +1,50 @@
+# test_targets.py
+import pytest
+
+from targets import TargetSet, int_to_ip, ip_to_int, parse_spec, split_specs
+
+def test_cidr_excludes_network_and_broadcast():
+    assert parse_spec("10.0.0.0/24") == (ip_to_int("10.0.0.1"), ip_to_int("10.0.0.254"))
+    assert parse_spec("10.0.0.0/24", hosts_only=False) == (ip_to_int("10.0.0.0"), ip_to_int("10.0.0.255"))
+    assert parse_spec("10.0.0.0/31") == (ip_to_int("10.0.0.0"), ip_to_int("10.0.0.1"))
+
+def test_ranges():
+    assert parse_spec("10.0.0.1-10.0.1.5") == (ip_to_int("10.0.0.1"), ip_to_int("10.0.1.5"))
+    assert parse_spec("10.0.0.1-50") == (ip_to_int("10.0.0.1"), ip_to_int("10.0.0.50"))
+    assert parse_spec("10.0.0.7") == (ip_to_int("10.0.0.7"),) * 2
+
+@pytest.mark.parametrize("spec", ["10.0.0.50-10.0.0.1", "10.0.0.250-300", "10.0.0.1-x", "10.0.0.9-5"])
+def test_invalid_ranges(spec):
+    with pytest.raises(ValueError):
+        parse_spec(spec)
+
+def test_split_specs():
+    assert split_specs("10.0.0.1, 10.0.0.2  10.0.0.0/30,") == ["10.0.0.1", "10.0.0.2", "10.0.0.0/30"]
+    assert split_specs(None) == []
+
+def test_merge_exclude_and_contains():
+    ts = TargetSet.parse(["10.0.0.1-10", "10.0.0.5-20", "10.0.0.30"], exclude=["10.0.0.8-12"])
+    assert ts.intervals == [(ip_to_int("10.0.0.1"), ip_to_int("10.0.0.7")),
+                            (ip_to_int("10.0.0.13"), ip_to_int("10.0.0.20")),
+                            (ip_to_int("10.0.0.30"),) * 2]
+    assert len(ts) == 7 + 8 + 1
+    assert "10.0.0.13" in ts and "10.0.0.8" not in ts and ip_to_int("10.0.0.30") in ts
+    assert list(ts.iter_ips())[:2] == ["10.0.0.1", "10.0.0.2"]
+
+def test_exclude_cidr_keeps_boundaries_out():
+    ts = TargetSet.parse(["10.0.0.0/23"], exclude=["10.0.1.0/24"])
+    assert ts.spec() == "10.0.0.1-10.0.0.255"
+
+def test_spec_roundtrip():
+    ts = TargetSet.parse(["192.168.1.0/24", "10.0.0.5"])
+    assert TargetSet.parse(split_specs(ts.spec())).intervals == ts.intervals
+
+def test_shard_partitions_every_address_once():
+    ts = TargetSet.parse(["10.0.0.0/22"])
+    shards = ts.shard(3, block=256)
+    assert len(shards) == 3
+    seen = [n for s in shards for n in s.iter_ints()]
+    assert sorted(seen) == list(ts.iter_ints())
+
+def test_int_ip_roundtrip():
+    assert int_to_ip(ip_to_int("172.16.254.3")) == "172.16.254.3"
@@ -0,0 +1,54 @@
+# test_timing.py
+import pytest
+
+import port_scan_win
+from timing import K, HostTimings, RttEstimator
+
+def test_initial_timeout_before_samples():
+    est = RttEstimator(initial=2.0)
+    assert est.timeout() == 2.0 and est.timeout(3) == 2.0
+
+def test_rfc6298_update():
+    est = RttEstimator(min_timeout=0.0, max_timeout=10.0)
+    est.update(0.1)
+    assert est.srtt == pytest.approx(0.1) and est.rttvar == pytest.approx(0.05)
+    assert est.timeout() == pytest.approx(0.1 + K * 0.05)
+    est.update(0.3)
+    assert est.rttvar == pytest.approx(0.75 * 0.05 + 0.25 * 0.2)
+    assert est.srtt == pytest.approx(0.875 * 0.1 + 0.125 * 0.3)
+
+def test_timeout_bounds_and_backoff():
+    est = RttEstimator(min_timeout=0.1, max_timeout=1.0)
+    for _ in range(20):
+        est.update(0.001)
+    assert est.timeout() == 0.1
+    assert est.timeout(1) == pytest.approx(0.2) and est.timeout(5) == 1.0
+
+def test_host_timings_lru():
+    timings = HostTimings(max_hosts=2)
+    timings.observe("10.0.0.1", 0.05)
+    timings.observe("10.0.0.2", 0.05)
+    timings.get("10.0.0.1")
+    timings.observe("10.0.0.3", 0.05)
+    assert len(timings) == 2
+    # 10.0.0.2, le moins récemment utilisé, repart de zéro
+    assert timings.get("10.0.0.2").samples == 0
+    assert timings.get("10.0.0.3").samples == 1
+
+def test_configure_applies_to_known_hosts():
+    timings = HostTimings()
+    timings.observe("10.0.0.1", 0.001)
+    timings.configure(min_timeout=0.3, max_timeout=0.5)
+    assert timings.timeout("10.0.0.1") == 0.3
+    assert timings.timeout("10.0.0.9") == 0.5
+
+def test_connect_timeout_adaptive_or_fixed(monkeypatch):
+    timings = HostTimings(min_timeout=0.05)
+    monkeypatch.setattr(port_scan_win, "HOST_TIMINGS", timings)
+    monkeypatch.setattr(port_scan_win, "CONNECT_TIMEOUT", 1.5)
+    timings.observe("10.0.0.1", 0.01)
+    monkeypatch.setattr(port_scan_win, "ADAPTIVE_TIMEOUT", True)
+    assert port_scan_win.connect_timeout("10.0.0.1") == pytest.approx(0.05)
+    assert port_scan_win.connect_timeout("10.0.0.2") == 1.5
+    monkeypatch.setattr(port_scan_win, "ADAPTIVE_TIMEOUT", False)
+    assert port_scan_win.connect_timeout("10.0.0.1") == 1.5
@@ -0,0 +1,86 @@
+# test_ttl_cache.py
+import json
+import os
+import threading
+import time
+
+import ttl_cache
+from os_detection import OsDetector, guess_os_from_ttl, parse_ping_ttl
+from ttl_cache import MISS, TtlCache
+
+def test_expiry_and_negative_ttl():
+    cache = TtlCache(ttl=60, negative_ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", None)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    time.sleep(0.1)
+    assert cache.get("b") is MISS
+    assert cache.get("a") == 1
+
+def test_purge_when_full():
+    cache = TtlCache(max_entries=8)
+    for i in range(20):
+        cache.set(str(i), i)
+    assert len(cache) <= 8
+    assert cache.get("19") == 19
+
+def test_save_load_roundtrip(tmp_path):
+    path = str(tmp_path / "c.json")
+    cache = TtlCache(path)
+    cache.set("k", {"v": 1})
+    cache.save()
+    assert TtlCache(path).get("k") == {"v": 1}
+
+def test_concurrent_writers_same_file(tmp_path):
+    path = str(tmp_path / "shared.json")
+    caches = [TtlCache(path) for _ in range(8)]
+
+    def writer(i, cache):
+        for n in range(25):
+            cache.set(f"{i}-{n}", n)
+            cache.save()
+
+    threads = [threading.Thread(target=writer, args=(i, c)) for i, c in enumerate(caches)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with open(path, encoding="utf-8") as f:
+        json.load(f)
+    assert os.listdir(tmp_path) == ["shared.json"]
+
+def test_default_dir_is_user_cache(monkeypatch, tmp_path):
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    assert ttl_cache._default_cache_dir().startswith(str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    if os.name != "nt":
+        assert ttl_cache._default_cache_dir() == str(tmp_path / "xdg" / ttl_cache.CACHE_APP)
+
+def test_parse_ping_ttl():
+    assert parse_ping_ttl("64 bytes from 10.0.0.1: icmp_seq=1 ttl=63 time=0.4 ms") == 63
+    assert parse_ping_ttl("Réponse de 10.0.0.1 : octets=32 temps<1ms TTL=128") == 128
+    assert parse_ping_ttl("Request timed out.") is None
+
+def test_guess_os_from_ttl():
+    assert guess_os_from_ttl(None) == {"ttl": None, "os_guess": None}
+    assert guess_os_from_ttl(128)["os_guess"].startswith("Windows")
+    assert guess_os_from_ttl(64)["os_guess"].startswith("Linux")
+    assert guess_os_from_ttl(30)["ttl"] == 30
+
+def test_detector_uses_cache_without_ping(monkeypatch):
+    async def no_ping(*args, **kwargs):
+        raise AssertionError("ping inattendu")
+
+    monkeypatch.setattr("os_detection.ping_ttl_async", no_ping)
+    detector = OsDetector(cache=TtlCache())
+    try:
+        detector.observe("10.0.0.5", 64)
+        # TTL vu sans MAC (scan SYN) : réutilisé pour la clé ip|mac
+        assert detector.detect("10.0.0.5", "AA:BB:CC:DD:EE:FF")["ttl"] == 64
+        detector.observe("10.0.0.6", None, "aa:bb:cc:dd:ee:01")
+        assert detector.detect("10.0.0.6", "AA:BB:CC:DD:EE:01") == {"ttl": None, "os_guess": None}
+    finally:
+        detector.close()
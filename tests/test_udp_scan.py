@@ -0,0 +1,83 @@
+# test_udp_scan.py
+import socket
+import sys
+import threading
+
+import pytest
+
+import udp_scan
+from udp_scan import UdpScanEngine, udp_banner
+
+@pytest.fixture
+def echo():
+    """Serveur UDP loopback qui répond à chaque datagramme."""
+    srv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                _, addr = srv.recvfrom(2048)
+            except OSError:
+                continue
+            srv.sendto(b"\x00\x01hello from udp\x00", addr)
+
+    t = threading.Thread(target=serve, daemon=True)
+    t.start()
+    yield srv.getsockname()[1]
+    stop.set()
+    t.join()
+    srv.close()
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(udp_scan, "connect_timeout", lambda ip, attempt=0: 0.3)
+    with UdpScanEngine(sockets=2, retries=1) as e:
+        yield e
+
+def _free_port(kind=socket.SOCK_DGRAM):
+    s = socket.socket(socket.AF_INET, kind)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def test_udp_banner():
+    assert udp_banner(b"SSH-like text\r\n") == "SSH-like text"
+    assert udp_banner(b"\x00\x01\x02version.bind\x00\xffabc\x00") == "version.bind"
+    assert udp_banner(b"") is None
+
+def test_open_port_answers(engine, echo):
+    [r] = list(engine.scan_host_ports("127.0.0.1", [echo], realtime_print=False))
+    assert r["state"] == "open" and r["banner"] == "hello from udp"
+    assert r["rtt_ms"] is not None
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="ICMP via IP_RECVERR (Linux)")
+def test_closed_port_from_icmp(engine):
+    port = _free_port()
+    [r] = list(engine.scan_host_ports("127.0.0.1", [port], realtime_print=False))
+    assert r["state"] == "closed"
+
+def test_silent_port_open_filtered(engine):
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    try:
+        [r] = list(engine.scan_host_ports("127.0.0.1", [silent.getsockname()[1]], realtime_print=False))
+    finally:
+        silent.close()
+    assert r["state"] == "open|filtered" and r["rtt_ms"] is None
+
+def test_concurrent_callers_share_engine(engine, echo):
+    results = {}
+
+    def scan(i):
+        results[i] = engine.scan_host_ports("127.0.0.1", [echo], realtime_print=False)
+
+    threads = [threading.Thread(target=scan, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(next(iter(hs))["state"] == "open" for hs in results.values())
@@ -0,0 +1,75 @@
+# test_vuln_index.py
+import gzip
+import json
+
+import pytest
+
+import vuln_index
+from vuln_match import get_matcher
+
+DB = {
+    "OpenSSH": {"vulnerable_versions": ["7.2", "7.4"], "notes": "ssh"},
+    "Apache": {"vulnerable_versions": ["2.4.49-2.4.50"], "notes": "traversal"},
+    "Apache Tomcat": {"vulnerable_versions": [">=9.0.0,<9.0.31"], "notes": "ghostcat"},
+}
+
+NVD11 = {"CVE_Items": [
+    {"cve": {"CVE_data_meta": {"ID": "CVE-2021-41773"},
+             "description": {"description_data": [{"lang": "en", "value": "Path traversal"}]}},
+     "configurations": {"nodes": [{"cpe_match": [
+         {"vulnerable": True, "cpe23Uri": "cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*"},
+         {"vulnerable": False, "cpe23Uri": "cpe:2.3:o:linux:linux_kernel:*:*:*:*:*:*:*:*"}]}]}},
+    {"cve": {"CVE_data_meta": {"ID": "CVE-2016-6210"},
+             "description": {"description_data": [{"lang": "en", "value": "User enumeration"}]}},
+     "configurations": {"nodes": [{"children": [{"cpe_match": [
+         {"vulnerable": True, "cpe23Uri": "cpe:2.3:a:openbsd:openssh:*:*:*:*:*:*:*:*",
+          "versionEndIncluding": "7.2p2"}]}]}]}},
+]}
+NVD20 = {"vulnerabilities": [{"cve": {
+    "id": "CVE-2019-0001", "descriptions": [{"lang": "en", "value": "nginx issue"}],
+    "configurations": [{"nodes": [{"cpeMatch": [
+        {"vulnerable": True, "criteria": "cpe:2.3:a:f5:nginx:*:*:*:*:*:*:*:*",
+         "versionStartIncluding": "1.17.0", "versionEndExcluding": "1.19.0"}]}]}]}}]}
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / "legacy.json").write_text(json.dumps(DB), encoding="utf-8")
+    with gzip.open(tmp_path / "nvd.json.gz", "wt", encoding="utf-8") as f:
+        json.dump(NVD11, f)
+    (tmp_path / "nvd2.json").write_text(json.dumps(NVD20), encoding="utf-8")
+    (tmp_path / "ranges.ndjson").write_text(
+        json.dumps({"product": "vsftpd", "versions": ["2.3.4"], "id": "CVE-2011-2523", "notes": "backdoor"}) + "\n"
+        + json.dumps({"cpe": "cpe:2.3:a:proftpd:proftpd:1.3.5:*:*:*:*:*:*:*", "id": "CVE-2015-3306"}) + "\n"
+        + json.dumps({"product": "broken", "versions": ["not a spec"]}) + "\n", encoding="utf-8")
+    path = str(tmp_path / "vuln.idx")
+    feeds = [str(tmp_path / n) for n in ("legacy.json", "nvd.json.gz", "nvd2.json", "ranges.ndjson")]
+    stats = vuln_index.build_index(feeds, path)
+    assert stats["skipped"] == 1
+    idx = vuln_index.VulnIndex(path)
+    yield idx
+    idx.close()
+
+def test_index_banner_lookup(index):
+    notes = {v["notes"] for v in index.match("Server: Apache/2.4.49 (Unix)")}
+    assert notes == {"traversal", "CVE-2021-41773: Path traversal"}
+    assert [v["notes"] for v in index.match("SSH-2.0-OpenSSH_7.2p2 Ubuntu")
+            if v["notes"].startswith("CVE")] == ["CVE-2016-6210: User enumeration"]
+    assert index.match("nginx/1.18.0")[0]["product"] == "f5 nginx"
+    assert index.match("nginx/1.19.0") is None
+    assert index.match("220 (vsFTPd 2.3.4)")[0]["notes"] == "CVE-2011-2523: backdoor"
+    assert index.match("ProFTPD 1.3.5 Server")[0]["product"] == "proftpd"
+    assert index.match("Linux 5.10 box") is None
+
+def test_index_service_lookup_and_matcher(index):
+    products = {v["product"] for v in index.match_service("Apache httpd", "2.4.49")}
+    assert products == {"Apache", "apache http server"}
+    assert index.match_service("OpenSSH", "8.0") is None
+    assert get_matcher(index) is index
+    assert len(index) >= 6
+
+def test_index_rejects_garbage(tmp_path):
+    bad = tmp_path / "bad.idx"
+    bad.write_bytes(b"not an index at all, definitely not")
+    with pytest.raises(ValueError):
+        vuln_index.VulnIndex(str(bad))
+    assert vuln_index.open_index(str(tmp_path / "missing.idx")) is None
@@ -0,0 +1,37 @@
+# test_vuln_match.py
+import pytest
+
+from vuln_match import VulnMatcher, compile_spec, get_matcher, parse_version
+
+DB = {
+    "OpenSSH": {"vulnerable_versions": ["7.2", "7.4"], "notes": "ssh"},
+    "Apache": {"vulnerable_versions": ["2.4.49-2.4.50"], "notes": "traversal"},
+    "Apache Tomcat": {"vulnerable_versions": [">=9.0.0,<9.0.31"], "notes": "ghostcat"},
+}
+
+@pytest.mark.parametrize("spec,version,expected", [
+    ("7.4", "7.4", True), ("7.4", "7.4.1", True), ("7.4", "7.40", False),
+    ("<7.6", "7.5.9", True), ("<7.6", "7.6", False), ("<=1.18.0", "1.18", True),
+    (">2.4", "2.4.1", True), (">=2.4.49", "2.4.48", False), ("==1.14.0", "1.14", True),
+    ("2.4.49-2.4.50", "2.4.50", True), ("2.4.49-2.4.50", "2.4.51", False),
+    (">=2.4.0,<2.4.51", "2.4.50", True), (">=2.4.0,<2.4.51", "2.3.9", False),
+])
+def test_compile_spec(spec, version, expected):
+    assert compile_spec(spec)(parse_version(version)) is expected
+
+@pytest.mark.parametrize("spec", ["", "abc", "<x", "1.0-y", "7.4,bad"])
+def test_compile_spec_invalid(spec):
+    assert compile_spec(spec) is None
+
+def test_matcher_banner_and_service():
+    m = VulnMatcher(DB)
+    found = m.match("SSH-2.0-OpenSSH_7.4p1 Debian")
+    assert [(v["product"], v["version"]) for v in found] == [("OpenSSH", "7.4")]
+    assert m.match("SSH-2.0-OpenSSH_8.9") is None
+    assert m.match(None) is None
+    names = {v["product"] for v in m.match("Apache Tomcat/9.0.30 Apache/2.4.49")}
+    assert names == {"Apache", "Apache Tomcat"}
+    assert m.match_service("OpenSSH", "7.2")[0]["notes"] == "ssh"
+
+def test_get_matcher_reuses_compiled_db():
+    assert get_matcher(DB) is get_matcher(DB)
@@ -0,0 +1,100 @@
+# timing.py
+"""
+Estimation adaptative des timeouts par hôte, façon TCP (RFC 6298) :
+SRTT/RTTVAR mis à jour à chaque RTT observé (connect ouvert, RST, probe de
+découverte) ; timeout = SRTT + K*RTTVAR borné à [MIN_TIMEOUT, MAX_TIMEOUT].
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+INITIAL_TIMEOUT = 2.0   # avant le premier échantillon (= ancien CONNECT_TIMEOUT)
+MIN_TIMEOUT = 0.1
+MAX_TIMEOUT = 2.0
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+MAX_HOSTS = 65536       # estimateurs gardés (LRU) ; un hôte oublié repart de INITIAL_TIMEOUT
+
+class RttEstimator:
+    """SRTT/RTTVAR d'un hôte (secondes)."""
+
+    def __init__(self, initial: float = INITIAL_TIMEOUT, min_timeout: float = MIN_TIMEOUT,
+                 max_timeout: float = MAX_TIMEOUT):
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.samples = 0
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+
+    def update(self, rtt: float):
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+            self.samples += 1
+
+    def timeout(self, attempt: int = 0) -> float:
+        """Timeout courant ; doublé à chaque retransmission (attempt > 0)."""
+        with self._lock:
+            if self.srtt is None:
+                base = self.initial
+            else:
+                base = max(self.min_timeout, self.srtt + K * self.rttvar)
+        return min(self.max_timeout, base * (2 ** attempt))
+
+class HostTimings:
+    """
+    Table thread-safe ip -> RttEstimator, partagée découverte / scan.
+    LRU bornée à max_hosts : le démon la garde d'un job à l'autre.
+    """
+
+    def __init__(self, initial: float = INITIAL_TIMEOUT, min_timeout: float = MIN_TIMEOUT,
+                 max_timeout: float = MAX_TIMEOUT, max_hosts: int = MAX_HOSTS):
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, RttEstimator]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ip: str) -> RttEstimator:
+        with self._lock:
+            est = self._hosts.get(ip)
+            if est is not None:
+                self._hosts.move_to_end(ip)
+                return est
+            est = self._hosts[ip] = RttEstimator(self.initial, self.min_timeout, self.max_timeout)
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        return est
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def observe(self, ip: str, rtt: float):
+        self.get(ip).update(rtt)
+
+    def timeout(self, ip: str, attempt: int = 0) -> float:
+        return self.get(ip).timeout(attempt)
+
+    def configure(self, min_timeout: Optional[float] = None, max_timeout: Optional[float] = None):
+        with self._lock:
+            if min_timeout is not None:
+                self.min_timeout = min_timeout
+            if max_timeout is not None:
+                self.max_timeout = max_timeout
+                self.initial = max_timeout
+            for est in self._hosts.values():
+                est.min_timeout, est.max_timeout, est.initial = self.min_timeout, self.max_timeout, self.initial
+
+    def clear(self):
+        with self._lock:
+            self._hosts.clear()
+
+HOST_TIMINGS = HostTimings()
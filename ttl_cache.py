@@ -0,0 +1,111 @@
+# ttl_cache.py
+"""
+Cache clé -> valeur avec expiration, thread-safe, optionnellement persisté en
+JSON (écriture atomique) pour être réutilisé d'un run à l'autre.
+Les fichiers vivent dans le cache utilisateur (~/.cache/nmap-func-scan,
+%LOCALAPPDATA% sous Windows) quel que soit le dossier courant, sauf $SCAN_CACHE_DIR.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_APP = "nmap-func-scan"
+
+def _default_cache_dir() -> str:
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], CACHE_APP, "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, CACHE_APP)
+
+CACHE_DIR = os.environ.get("SCAN_CACHE_DIR") or _default_cache_dir()
+
+MISS = object()
+
+def cache_path(name: str) -> str:
+    return os.path.join(CACHE_DIR, name)
+
+class TtlCache:
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 3600.0,
+                 negative_ttl: Optional[float] = None, max_entries: int = 100000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self._data: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, key: str) -> Any:
+        """Valeur en cache, ou MISS si absente/expirée."""
+        item = self._data.get(key)
+        if item is None:
+            return MISS
+        expires, value = item
+        if expires < time.time():
+            with self._lock:
+                self._data.pop(key, None)
+            return MISS
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._purge()
+            self._data[key] = (time.time() + ttl, value)
+            self._dirty = True
+
+    def _purge(self):
+        now = time.time()
+        self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+        if len(self._data) >= self.max_entries:
+            # encore plein : on retire les entrées qui expirent le plus tôt
+            keep = sorted(self._data.items(), key=lambda kv: kv[1][0])[len(self._data) // 4:]
+            self._data = dict(keep)
+
+    def __len__(self):
+        return len(self._data)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception:
+            return
+        now = time.time()
+        with self._lock:
+            for k, (expires, value) in raw.items():
+                if expires >= now:
+                    self._data[k] = (expires, value)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            now = time.time()
+            data = {k: [e, v] for k, (e, v) in self._data.items() if e >= now}
+            self._dirty = False
+        tmp = None
+        try:
+            folder = os.path.dirname(self.path) or "."
+            os.makedirs(folder, exist_ok=True)
+            # fichier temporaire propre à chaque écrivain : les shards sauvegardent en même temps
+            fd, tmp = tempfile.mkstemp(dir=folder, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True      # réessayé à la prochaine sauvegarde
+            if tmp and os.path.exists(tmp):
+                os.unlink(tmp)
+            print(f"[!] Sauvegarde du cache {self.path} échouée: {e}")
@@ -0,0 +1,295 @@
+# udp_scan.py
+"""
+Scan UDP multiplexé : quelques sockets datagramme non bloquants (UDP_SOCKETS)
+servent toutes les probes de tous les hôtes, dans une boucle asyncio dédiée
+(comme AsyncScanEngine) — pas de thread ni de socket par probe.
+  - payload protocolaire selon le port (udp_probes.json : DNS, NTP, SNMP,
+    NetBIOS...), datagramme vide sinon
+  - réponse rattachée à sa probe par (ip, port) source
+  - ICMP port unreachable -> "closed" (IP_RECVERR, Linux) ; autre
+    unreachable -> "filtered" ; pas de réponse après retransmissions
+    -> "open|filtered"
+Les résultats sont les mêmes dicts que scan_port (HostServices, exports).
+"""
+import asyncio
+import concurrent.futures
+import errno
+import itertools
+import json
+import os
+import re
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from port_scan_win import apply_banner, connect_timeout, report_result
+from service_probes import ServiceProbes, Probe, banner_text, BANNER_MAX_CHARS
+from ports import order_by_frequency
+from result_store import HostServices
+from rate_limit import RATE_LIMITER
+from timing import HOST_TIMINGS
+from scan_metrics import METRICS
+
+UDP_PROBES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "udp_probes.json")
+UDP_SOCKETS = 4             # sockets datagramme partagés par toutes les probes
+UDP_MAX_IN_FLIGHT = 2000    # probes en attente de réponse (tous hôtes)
+UDP_HOST_CONCURRENCY = 256  # probes en vol par hôte (au-delà, les ICMP sont limités par la cible)
+UDP_RETRIES = 2             # retransmissions d'une probe sans réponse (UDP perd sans prévenir)
+UDP_RCVBUF = 1 << 20        # tampon de réception par socket
+MAX_DATAGRAM = 65535
+SEND_ATTEMPTS = 100         # sendto retentés (tampon plein, erreur ICMP en attente)
+
+# Linux : erreurs ICMP lues dans la file d'erreurs du socket (non connecté)
+IP_RECVERR = getattr(socket, "IP_RECVERR", 11 if os.name == "posix" else None)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", None)
+SO_EE_ORIGIN_ICMP = 2
+ICMP_UNREACH = 3
+ICMP_PORT_UNREACH = 3
+# erreurs laissées sur le socket par un ICMP reçu, rapportées par l'appel suivant
+_ICMP_ERRNOS = {errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH, errno.ECONNRESET,
+                getattr(errno, "EHOSTDOWN", errno.EHOSTUNREACH), getattr(errno, "EPROTO", errno.EHOSTUNREACH)}
+
+_lock = threading.Lock()
+_db: Optional[ServiceProbes] = None
+
+def get_udp_probes() -> ServiceProbes:
+    """Payloads UDP et règles de reconnaissance, chargés une seule fois."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                try:
+                    with open(UDP_PROBES_FILE, "r", encoding="utf-8") as f:
+                        _db = ServiceProbes(json.load(f))
+                except Exception as e:
+                    print(f"[!] Payloads UDP illisibles ({e}) : datagrammes vides seulement")
+                    _db = ServiceProbes({})
+    return _db
+
+def probe_for(port: int) -> Optional[Probe]:
+    return next((p for p in get_udp_probes().probes if port in p.ports), None)
+
+def udp_banner(data: bytes) -> Optional[str]:
+    """Texte d'une réponse : telle quelle si imprimable, sinon ses chaînes lisibles (à la `strings`)."""
+    if not data:
+        return None
+    printable = sum(32 <= b < 127 or b in (9, 10, 13) for b in data)
+    if printable >= 0.9 * len(data):
+        return banner_text(data)
+    text = " ".join(s.decode("ascii") for s in re.findall(rb"[\x20-\x7e]{4,}", data))
+    return text[:BANNER_MAX_CHARS] or None
+
+def identify_udp(data: bytes, probe: Optional[Probe]) -> Tuple[Optional[str], Optional[Dict]]:
+    """(bannière, service) d'une réponse ; le service de la probe à défaut de règle."""
+    service = get_udp_probes().match(data)
+    if service is None and probe is not None:
+        service = {"name": probe.name}
+    if service is not None and probe is not None:
+        service["probe"] = probe.name
+    return udp_banner(data), service
+
+def _open_socket() -> socket.socket:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setblocking(False)
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+    except OSError:
+        pass
+    if IP_RECVERR is not None and MSG_ERRQUEUE is not None:
+        try:
+            s.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        except OSError:
+            pass
+    if hasattr(socket, "SIO_UDP_CONNRESET"):
+        # Windows : un ICMP ne doit pas faire échouer le recvfrom suivant (adresse inconnue)
+        try:
+            s.ioctl(socket.SIO_UDP_CONNRESET, False)
+        except OSError:
+            pass
+    return s
+
+class UdpScanEngine:
+    """
+    Boucle asyncio (sélecteur) dans un thread dédié. `scan_host_ports` a la
+    même signature que la version TCP et peut être appelée depuis plusieurs
+    threads : toutes les probes partagent les mêmes sockets et le même budget.
+    """
+
+    def __init__(self, sockets: int = UDP_SOCKETS, max_in_flight: int = UDP_MAX_IN_FLIGHT,
+                 retries: int = UDP_RETRIES):
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = max(0, retries)
+        self._socks = [_open_socket() for _ in range(max(1, sockets))]
+        self._next_sock = itertools.cycle(self._socks)
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        # sélecteur explicite : add_reader n'existe pas dans la boucle Proactor (Windows)
+        self._loop = asyncio.SelectorEventLoop()
+        self._sem = None
+        self._thread = threading.Thread(target=self._run, name="udp-scan", daemon=True)
+        self._ready = threading.Event()
+        self._thread.start()
+        self._ready.wait()
+        get_udp_probes()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._sem = asyncio.Semaphore(self.max_in_flight)
+        for s in self._socks:
+            self._loop.add_reader(s.fileno(), self._on_readable, s)
+        self._ready.set()
+        self._loop.run_forever()
+
+    # -- réception -----------------------------------------------------------
+
+    def _resolve(self, key: Tuple[str, int], state: str, data: Optional[bytes] = None):
+        fut = self._pending.pop(key, None)
+        if fut is None or fut.done():
+            METRICS.inc("udp_unmatched")
+            return
+        fut.set_result((state, data, time.monotonic()))
+
+    def _on_readable(self, sock: socket.socket):
+        for _ in range(self.max_in_flight):
+            try:
+                data, addr = sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # ICMP signalé par l'erreur du socket : le détail est dans la file d'erreurs
+                self._read_errors(sock)
+                continue
+            METRICS.inc("udp_responses")
+            self._resolve(addr[:2], "open", data)
+        self._read_errors(sock)
+
+    def _read_errors(self, sock: socket.socket):
+        if MSG_ERRQUEUE is None or IP_RECVERR is None:
+            return
+        for _ in range(self.max_in_flight):
+            try:
+                _, ancdata, _, addr = sock.recvmsg(1, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            for level, kind, data in ancdata:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(data) < 8 or not addr:
+                    continue
+                _, origin, icmp_type, icmp_code = struct.unpack_from("=IBBB", data)
+                if origin != SO_EE_ORIGIN_ICMP or icmp_type != ICMP_UNREACH:
+                    continue
+                METRICS.inc("udp_icmp")
+                self._resolve(addr[:2], "closed" if icmp_code == ICMP_PORT_UNREACH else "filtered")
+
+    # -- probes --------------------------------------------------------------
+
+    async def _send(self, payload: bytes, key: Tuple[str, int]):
+        sock = next(self._next_sock)
+        for _ in range(SEND_ATTEMPTS):
+            try:
+                sock.sendto(payload, key)
+                return
+            except (BlockingIOError, InterruptedError):
+                # tampon d'envoi plein : on laisse la boucle tourner
+                await asyncio.sleep(0.005)
+            except OSError as e:
+                if e.errno not in _ICMP_ERRNOS:
+                    raise
+                # erreur ICMP d'une probe précédente, remontée par ce sendto : elle est dans la file d'erreurs
+                self._read_errors(sock)
+        raise OSError(f"envoi impossible vers {key[0]}:{key[1]}")
+
+    async def probe(self, ip: str, port: int) -> Dict:
+        out = {"ip": ip, "port": port, "state": "open|filtered", "banner": None, "rtt_ms": None, "vulns": None}
+        key = (ip, port)
+        probe = probe_for(port)
+        payload = probe.data(ip) if probe else b""
+        # même (ip, port) déjà en vol (autre job, hôte rescanné) : les réponses seraient confondues
+        while key in self._pending:
+            await asyncio.wait([self._pending[key]])
+        for attempt in range(self.retries + 1):
+            timeout = connect_timeout(ip, attempt)
+            await RATE_LIMITER.acquire_async()
+            fut = self._loop.create_future()
+            self._pending[key] = fut
+            METRICS.inc("udp_probes")
+            start = time.monotonic()
+            try:
+                await self._send(payload, key)
+                state, data, t = await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                RATE_LIMITER.record(False)
+                METRICS.inc("udp_timeouts")
+                continue
+            except Exception as e:
+                out["state"] = "error"
+                out["error"] = str(e)
+                METRICS.inc("udp_errors")
+                return out
+            finally:
+                if self._pending.get(key) is fut:
+                    del self._pending[key]
+            elapsed = t - start
+            HOST_TIMINGS.observe(ip, elapsed)
+            RATE_LIMITER.record(True)
+            METRICS.observe("udp", elapsed)
+            out["state"] = state
+            out["rtt_ms"] = round(elapsed * 1000, 2)
+            if state == "open":
+                with METRICS.timer("banner"):
+                    apply_banner(out, *identify_udp(data, probe))
+            return out
+        return out
+
+    async def scan_host_ports_async(self, ip: str, ports: List[int], realtime_print: bool = True,
+                                    on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
+        results = HostServices(ip)
+        it = iter(order_by_frequency(ports, "udp"))
+
+        async def worker():
+            for p in it:
+                async with self._sem:
+                    r = await self.probe(ip, p)
+                results.add(r)
+                if on_result:
+                    on_result(r)
+                report_result(r, realtime_print)
+
+        n = min(len(ports), UDP_HOST_CONCURRENCY)
+        with METRICS.timer("udp_scan"):
+            await asyncio.gather(*(worker() for _ in range(n)))
+        return results.compact()
+
+    def submit(self, ip: str, ports: List[int], realtime_print: bool = True,
+               on_result: Optional[Callable[[Dict], None]] = None) -> concurrent.futures.Future:
+        coro = self.scan_host_ports_async(ip, ports, realtime_print, on_result)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def scan_host_ports(self, ip: str, ports: List[int], realtime_print: bool = True,
+                        on_result: Optional[Callable[[Dict], None]] = None) -> HostServices:
+        return self.submit(ip, ports, realtime_print, on_result).result()
+
+    def close(self):
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        for s in self._socks:
+            try:
+                self._loop.remove_reader(s.fileno())
+            except Exception:
+                pass
+            s.close()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def scan_udp(ip: str, ports: List[int], realtime_print: bool = True) -> HostServices:
+    """Scan UDP ponctuel d'un hôte (moteur créé et fermé pour l'appel)."""
+    with UdpScanEngine() as engine:
+        return engine.scan_host_ports(ip, ports, realtime_print)
@@ -0,0 +1,373 @@
+# vuln_index.py
+"""
+Index binaire de vulnérabilités, construit une fois (`build-vuln-index`) à partir
+de gros flux locaux, ouvert en mmap par le scanner en quelques millisecondes.
+
+Flux acceptés (.json, .ndjson/.jsonl, éventuellement .gz) :
+  - NVD JSON 1.1 ("CVE_Items") et NVD API 2.0 ("vulnerabilities") : configurations CPE
+  - liste (ou NDJSON) d'entrées { "product" | "cpe", "versions": [spec, ...] ou
+    versionStartIncluding/versionEndExcluding/..., "id", "notes" }
+  - format de vuln_db.json ({ "Produit": { "vulnerable_versions": [...], "notes": ... } })
+Les intervalles CPE deviennent des specs de vuln_match (">=2.4.0,<2.4.51", "==7.4"),
+compilées seulement pour les produits vus dans les bannières.
+
+Format (petit-boutiste) :
+  en-tête  | hachages des clés triés (u64) | répertoire (clé, offset, n) par hachage
+  | entrées (produit affiché, spec, id, notes : indices de chaînes) | table de chaînes
+"""
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from vuln_match import compile_spec, parse_version
+
+MAGIC = b"VIDX"
+FORMAT_VERSION = 1
+NOTES_MAX = 200         # description CVE tronquée (caractères)
+MAX_NGRAM = 3           # mots max d'un nom de produit cherché dans une bannière
+KEY_CACHE_SIZE = 4096   # produits dont les specs compilées restent en mémoire
+BANNER_CACHE_SIZE = 4096
+
+_HEADER = struct.Struct("<4sHHIIIIIQ")  # magic, version, -, clés, entrées, chaînes, off entrées, off chaînes, date
+_DIR = struct.Struct("<III")            # chaîne de la clé, première entrée, nombre d'entrées
+_ENTRY = struct.Struct("<IIII")         # produit affiché, spec, id, notes
+_STR = struct.Struct("<II")             # offset, longueur dans le blob
+
+# noms vus dans les bannières / probes -> nom de produit CPE normalisé
+PRODUCT_ALIASES = {
+    "apache": "http server",
+    "apache httpd": "http server",
+    "microsoft iis": "internet information services",
+    "microsoft iis httpd": "internet information services",
+    "iis": "internet information services",
+    "isc bind": "bind",
+    "microsoft sql server": "sql server",
+    "postfix smtpd": "postfix",
+    "exim smtpd": "exim",
+    "openbsd openssh": "openssh",
+}
+
+_NORM_RE = re.compile(r"[^a-z0-9+]+")
+_NUMERIC_RE = re.compile(r"\d+(?:\.\d+)*")
+_TOKEN_RE = re.compile(r"(\d+\.\d+(?:\.\d+)*)|([A-Za-z][A-Za-z0-9+]*)")
+_RANGE_KEYS = (("versionStartIncluding", ">="), ("versionStartExcluding", ">"),
+               ("versionEndIncluding", "<="), ("versionEndExcluding", "<"))
+
+def normalize_product(name: str) -> str:
+    """'Apache_Tomcat' / 'apache-tomcat' -> 'apache tomcat'."""
+    return _NORM_RE.sub(" ", name.lower()).strip()
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def _numeric(v: str) -> Optional[str]:
+    """Partie numérique d'une version CPE ('7.4p1' -> '7.4', '1.0.2k' -> '1.0.2')."""
+    m = _NUMERIC_RE.match(v.strip())
+    return m.group(0) if m else None
+
+# -- lecture des flux ---------------------------------------------------------
+
+Entry = Tuple[str, str, str, str]   # (produit affiché, spec, id, notes)
+
+def _unescape_cpe(s: str) -> str:
+    return re.sub(r"\\(.)", r"\1", s)
+
+def _parse_cpe(cpe: str) -> Optional[Tuple[str, str, str]]:
+    """cpe:2.3:a:vendor:product:version:... -> (vendor, product, version) ; matériel ignoré."""
+    parts = re.split(r"(?<!\\):", cpe)
+    if len(parts) < 6 or parts[2] not in ("a", "o"):
+        return None
+    return _unescape_cpe(parts[3]), _unescape_cpe(parts[4]), _unescape_cpe(parts[5])
+
+def _display(vendor: str, product: str) -> str:
+    vendor, product = vendor.replace("_", " "), product.replace("_", " ")
+    if not vendor or vendor in ("*", "-") or product.lower().startswith(vendor.lower()):
+        return product
+    return f"{vendor} {product}"
+
+def _range_spec(match: Dict, version: Optional[str]) -> Optional[str]:
+    """Spec vuln_match d'une entrée CPE (bornes versionStart*/versionEnd* ou version exacte)."""
+    conds = []
+    for key, op in _RANGE_KEYS:
+        if match.get(key):
+            v = _numeric(str(match[key]))
+            if v is None:
+                return None
+            conds.append(op + v)
+    if conds:
+        return ",".join(conds)
+    if version in (None, "", "*"):
+        return ">=0"
+    if version == "-":
+        return None
+    v = _numeric(version)
+    return "==" + v if v else None
+
+def _cpe_entries(match: Dict, cve_id: str, notes: str) -> Iterator[Tuple[str, Entry]]:
+    if not match.get("vulnerable", True):
+        return
+    cpe = _parse_cpe(match.get("cpe23Uri") or match.get("criteria") or "")
+    if cpe is None:
+        return
+    vendor, product, version = cpe
+    spec = _range_spec(match, version)
+    if spec:
+        yield product, (_display(vendor, product), spec, cve_id, notes)
+
+def _nvd_nodes(nodes: List[Dict]) -> Iterator[Dict]:
+    for node in nodes or []:
+        yield from node.get("cpe_match") or node.get("cpeMatch") or []
+        yield from _nvd_nodes(node.get("children"))
+
+def _english(descriptions: List[Dict]) -> str:
+    for d in descriptions or []:
+        if d.get("lang") == "en":
+            return d.get("value", "")[:NOTES_MAX]
+    return ""
+
+def _nvd11_entries(doc: Dict) -> Iterator[Tuple[str, Entry]]:
+    for item in doc.get("CVE_Items") or []:
+        cve = item.get("cve", {})
+        cve_id = cve.get("CVE_data_meta", {}).get("ID", "")
+        notes = _english(cve.get("description", {}).get("description_data"))
+        for match in _nvd_nodes(item.get("configurations", {}).get("nodes")):
+            yield from _cpe_entries(match, cve_id, notes)
+
+def _nvd20_entries(doc: Dict) -> Iterator[Tuple[str, Entry]]:
+    for item in doc.get("vulnerabilities") or []:
+        cve = item.get("cve", {})
+        notes = _english(cve.get("descriptions"))
+        for conf in cve.get("configurations") or []:
+            for match in _nvd_nodes(conf.get("nodes")):
+                yield from _cpe_entries(match, cve.get("id", ""), notes)
+
+def _record_entries(rec: Dict) -> Iterator[Tuple[str, Entry]]:
+    """Entrée 'plate' : produit ou CPE + specs ou bornes."""
+    cve_id, notes = str(rec.get("id") or rec.get("cve") or ""), str(rec.get("notes") or "")[:NOTES_MAX]
+    if rec.get("product"):
+        specs = rec.get("versions") or rec.get("vulnerable_versions")
+        if specs:
+            for spec in specs:
+                yield rec["product"], (rec["product"], str(spec), cve_id, notes)
+            return
+        spec = _range_spec(rec, rec.get("version"))
+        if spec:
+            yield rec["product"], (rec["product"], spec, cve_id, notes)
+    elif rec.get("cpe"):
+        yield from _cpe_entries(dict(rec, cpe23Uri=rec["cpe"]), cve_id, notes)
+
+def _legacy_entries(doc: Dict) -> Iterator[Tuple[str, Entry]]:
+    for product, info in doc.items():
+        if isinstance(info, dict):
+            for spec in info.get("vulnerable_versions", []):
+                yield product, (product, str(spec), "", str(info.get("notes") or "")[:NOTES_MAX])
+
+def _open_feed(path: str):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, "r", encoding="utf-8")
+
+def iter_feed(path: str) -> Iterator[Tuple[str, Entry]]:
+    """(produit, entrée) d'un flux, format détecté d'après le contenu."""
+    base = path[:-3] if path.endswith(".gz") else path
+    with _open_feed(path) as f:
+        if base.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield from _record_entries(json.loads(line))
+            return
+        doc = json.load(f)
+    if isinstance(doc, list):
+        for rec in doc:
+            yield from _record_entries(rec)
+    elif "CVE_Items" in doc:
+        yield from _nvd11_entries(doc)
+    elif "vulnerabilities" in doc:
+        yield from _nvd20_entries(doc)
+    else:
+        yield from _legacy_entries(doc)
+
+# -- construction -------------------------------------------------------------
+
+def build_index(feeds: Iterable[str], out_path: str) -> Dict:
+    """Lit les flux et écrit l'index (remplacement atomique : un scanner peut l'avoir ouvert)."""
+    start = time.time()
+    by_key: Dict[str, Dict[Entry, None]] = {}
+    read = skipped = 0
+    for path in feeds:
+        for product, entry in iter_feed(path):
+            read += 1
+            key = normalize_product(product)
+            if not key or compile_spec(entry[1]) is None:
+                skipped += 1
+                continue
+            by_key.setdefault(key, {})[entry] = None
+
+    strings: Dict[str, int] = {}
+    def sid(s: str) -> int:
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    keys = sorted(by_key, key=_key_hash)
+    hashes = array("Q", (_key_hash(k) for k in keys))
+    directory, entries = bytearray(), bytearray()
+    n_entries = 0
+    for key in keys:
+        directory += _DIR.pack(sid(key), n_entries, len(by_key[key]))
+        for display, spec, cve_id, notes in by_key[key]:
+            entries += _ENTRY.pack(sid(display), sid(spec), sid(cve_id), sid(notes))
+            n_entries += 1
+    table, blob = bytearray(), bytearray()
+    for s in strings:
+        b = s.encode("utf-8")
+        table += _STR.pack(len(blob), len(b))
+        blob += b
+    if sys.byteorder != "little":
+        hashes.byteswap()
+
+    entries_off = _HEADER.size + len(hashes) * 8 + len(directory)
+    strings_off = entries_off + len(entries)
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(keys), n_entries, len(strings),
+                             entries_off, strings_off, int(time.time())))
+        f.write(hashes.tobytes())
+        f.write(directory)
+        f.write(entries)
+        f.write(table)
+        f.write(blob)
+    os.replace(tmp, out_path)
+    return {"products": len(keys), "entries": n_entries, "read": read, "skipped": skipped,
+            "bytes": os.path.getsize(out_path), "seconds": time.time() - start}
+
+# -- lecture ------------------------------------------------------------------
+
+class VulnIndex:
+    """
+    Index ouvert en mmap : seuls l'en-tête et les hachages des clés sont lus à
+    l'ouverture, les entrées d'un produit sont décodées au premier passage.
+    Même interface que VulnMatcher (match, match_service, cache_info).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, _, self.n_keys, self.n_entries, n_strings,
+             self._entries_off, strings_off, self.built) = _HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic, version = b"", 0
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"index de vulnérabilités invalide: {path}")
+        self._hashes = array("Q")
+        self._hashes.frombytes(self._mm[_HEADER.size:_HEADER.size + self.n_keys * 8])
+        if sys.byteorder != "little":
+            self._hashes.byteswap()
+        self._dir_off = _HEADER.size + self.n_keys * 8
+        self._table_off = strings_off
+        self._blob_off = strings_off + n_strings * _STR.size
+        self._entries = lru_cache(maxsize=KEY_CACHE_SIZE)(self._load_entries)
+        self._cached = lru_cache(maxsize=BANNER_CACHE_SIZE)(self._match)
+
+    def __len__(self) -> int:
+        return self.n_keys
+
+    def close(self):
+        self._mm.close()
+
+    def _string(self, i: int) -> str:
+        off, n = _STR.unpack_from(self._mm, self._table_off + i * _STR.size)
+        start = self._blob_off + off
+        return self._mm[start:start + n].decode("utf-8")
+
+    def _load_entries(self, key: str) -> Tuple:
+        """((produit, prédicat, notes), ...) d'une clé normalisée ; () si absente."""
+        h = _key_hash(key)
+        i = bisect_left(self._hashes, h)
+        while i < self.n_keys and self._hashes[i] == h:
+            key_sid, first, n = _DIR.unpack_from(self._mm, self._dir_off + i * _DIR.size)
+            if self._string(key_sid) == key:
+                out = []
+                for j in range(first, first + n):
+                    display, spec, cve_id, notes = (self._string(s) for s in
+                                                    _ENTRY.unpack_from(self._mm, self._entries_off + j * _ENTRY.size))
+                    pred = compile_spec(spec)
+                    if pred:
+                        out.append((display, pred, f"{cve_id}: {notes}" if cve_id else notes))
+                return tuple(out)
+            i += 1
+        return ()
+
+    def lookup(self, product: str) -> Tuple:
+        """Entrées d'un nom de produit (normalisé, alias compris)."""
+        key = normalize_product(product)
+        found = self._entries(key)
+        alias = PRODUCT_ALIASES.get(key)
+        if alias:
+            found += self._entries(alias)
+        return found
+
+    def _versions_hits(self, names: Iterable[str], version: str) -> List[Tuple[str, str, Optional[str]]]:
+        pv = parse_version(version)
+        if pv is None:
+            return []
+        hits = []
+        for name in names:
+            for display, pred, notes in self.lookup(name):
+                if pred(pv):
+                    hits.append((display, version, notes))
+        return hits
+
+    def _match(self, banner: str) -> Tuple[Tuple[str, str, Optional[str]], ...]:
+        # produit = les 1..MAX_NGRAM mots qui précèdent une version ("Apache/2.4.49", "OpenSSH_7.4p1")
+        found, words = [], []
+        for version, word in _TOKEN_RE.findall(banner):
+            if word:
+                words.append(word)
+                continue
+            names = [" ".join(words[-n:]) for n in range(1, min(MAX_NGRAM, len(words)) + 1)]
+            found += self._versions_hits(names, version)
+            words = []
+        return tuple(dict.fromkeys(found))
+
+    def match(self, banner: Optional[str]) -> Optional[List[Dict]]:
+        if not banner:
+            return None
+        found = self._cached(banner)
+        if not found:
+            return None
+        return [{"product": p, "version": v, "notes": n} for p, v, n in found]
+
+    def match_service(self, product: str, version: str) -> Optional[List[Dict]]:
+        """Vulns pour un service identifié par les probes (produit + version)."""
+        num = _numeric(version or "")
+        words = normalize_product(product).split()
+        # "Apache httpd" : "apache", puis "apache httpd"
+        names = [" ".join(words[:n]) for n in range(1, len(words) + 1)]
+        found = dict.fromkeys(self._versions_hits(names, num)) if num else ()
+        return [{"product": p, "version": v, "notes": n} for p, v, n in found] or None
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+def open_index(path: str) -> Optional[VulnIndex]:
+    """Index de `path`, None s'il n'existe pas ou est illisible (le scanner retombe sur le JSON)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return VulnIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"[!] Index vuln ignoré ({e})")
+        return None
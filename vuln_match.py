@@ -0,0 +1,135 @@
+# vuln_match.py
+"""
+Matcher de vulnérabilités précompilé à partir de VULN_DB.
+
+Format d'une entrée : { "Produit": { "vulnerable_versions": [spec, ...], "notes": "..." } }
+Une spec de version peut être :
+  "7.4"                 -> série 7.4 (7.4, 7.4.1, ... mais pas 7.40)
+  "<7.6", "<=1.18.0", ">2.4", ">=2.4.49", "==1.14.0"
+  "2.4.49-2.4.50"       -> intervalle inclusif
+  ">=2.4.0,<2.4.51"     -> conditions combinées (ET)
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Callable
+
+VERSION_RE = re.compile(r"(\d+\.\d+(?:\.\d+)*)")
+_OP_RE = re.compile(r"^(<=|>=|==|<|>)\s*(.+)$")
+BANNER_CACHE_SIZE = 4096
+
+Version = Tuple[int, ...]
+
+def parse_version(v: str) -> Optional[Version]:
+    try:
+        return tuple(int(x) for x in v.strip().split("."))
+    except ValueError:
+        return None
+
+def _cmp(a: Version, b: Version) -> int:
+    n = max(len(a), len(b))
+    a = a + (0,) * (n - len(a))
+    b = b + (0,) * (n - len(b))
+    return (a > b) - (a < b)
+
+def _compile_condition(cond: str) -> Optional[Callable[[Version], bool]]:
+    cond = cond.strip()
+    m = _OP_RE.match(cond)
+    if m:
+        op, ref = m.group(1), parse_version(m.group(2))
+        if ref is None:
+            return None
+        if op == "<":
+            return lambda v: _cmp(v, ref) < 0
+        if op == "<=":
+            return lambda v: _cmp(v, ref) <= 0
+        if op == ">":
+            return lambda v: _cmp(v, ref) > 0
+        if op == ">=":
+            return lambda v: _cmp(v, ref) >= 0
+        return lambda v: _cmp(v, ref) == 0
+    if "-" in cond:
+        lo, hi = (parse_version(x) for x in cond.split("-", 1))
+        if lo is None or hi is None:
+            return None
+        return lambda v: _cmp(v, lo) >= 0 and _cmp(v, hi) <= 0
+    prefix = parse_version(cond)
+    if prefix is None:
+        return None
+    return lambda v: v[:len(prefix)] == prefix
+
+def compile_spec(spec: str) -> Optional[Callable[[Version], bool]]:
+    """Compile une spec (conditions séparées par des virgules = ET) en prédicat."""
+    conds = [_compile_condition(c) for c in spec.split(",") if c.strip()]
+    if not conds or any(c is None for c in conds):
+        return None
+    return lambda v: all(c(v) for c in conds)
+
+class VulnMatcher:
+    """
+    Construit une seule fois par DB : une regex combinée sur tous les noms de
+    produits, les specs de versions compilées, et un cache LRU par bannière.
+    """
+
+    def __init__(self, vuln_db: Dict, cache_size: int = BANNER_CACHE_SIZE):
+        self.products: Dict[str, Tuple[str, List[Callable[[Version], bool]], Optional[str]]] = {}
+        for product, info in (vuln_db or {}).items():
+            preds = [p for p in (compile_spec(str(s)) for s in info.get("vulnerable_versions", [])) if p]
+            self.products[product.lower()] = (product, preds, info.get("notes"))
+        names = sorted(self.products, key=len, reverse=True)
+        # lookahead : trouve aussi les noms qui se chevauchent ("apache" / "apache tomcat")
+        self._product_re = re.compile("(?=(" + "|".join(re.escape(n) for n in names) + "))",
+                                      re.IGNORECASE) if names else None
+        self._cached = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, banner: str) -> Tuple[Tuple[str, str, Optional[str]], ...]:
+        if self._product_re is None:
+            return ()
+        seen = dict.fromkeys(m.group(1).lower() for m in self._product_re.finditer(banner))
+        if not seen:
+            return ()
+        versions = []
+        for v in VERSION_RE.findall(banner):
+            pv = parse_version(v)
+            if pv is not None and (v, pv) not in versions:
+                versions.append((v, pv))
+        found = []
+        for key in seen:
+            product, preds, notes = self.products[key]
+            for v, pv in versions:
+                if any(p(pv) for p in preds):
+                    found.append((product, v, notes))
+        return tuple(found)
+
+    def match(self, banner: Optional[str]) -> Optional[List[Dict]]:
+        if not banner:
+            return None
+        found = self._cached(banner)
+        if not found:
+            return None
+        return [{"product": p, "version": v, "notes": n} for p, v, n in found]
+
+    def match_service(self, product: str, version: str) -> Optional[List[Dict]]:
+        """Vulns pour un service identifié par les probes (produit + version)."""
+        return self.match(f"{product} {version}")
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+_lock = threading.Lock()
+_current: Tuple = (None, None)  # (vuln_db, matcher), remplacé d'un bloc
+
+def get_matcher(vuln_db: Dict) -> VulnMatcher:
+    """Retourne le matcher compilé de `vuln_db` (reconstruit seulement si la DB change)."""
+    global _current
+    if hasattr(vuln_db, "match_service"):
+        return vuln_db      # vuln_index.VulnIndex : déjà un matcher
+    db, matcher = _current
+    if db is vuln_db and matcher is not None:
+        return matcher
+    with _lock:
+        db, matcher = _current
+        if db is not vuln_db or matcher is None:
+            matcher = VulnMatcher(vuln_db)
+            _current = (vuln_db, matcher)
+        return matcher